@@ -0,0 +1,111 @@
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Request
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_openai import ChatOpenAI
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.arxiv_sync import ArxivSyncScheduler
+from app.core.context_builder import ContextBuilder
+from app.core.jobs import IngestionJobManager
+from app.core.kg_graph import KGGraph
+from app.core.reranker import CrossEncoderReranker
+from app.core.resources import ResourceRegistry
+from app.core.sparse_index import BM25Index
+from app.core.streaming import LatencyTracker
+from app.utils.db import get_async_db, get_db
+
+
+def get_resources(request: Request) -> ResourceRegistry:
+    return request.app.state.resources
+
+
+ResourcesDep = Annotated[ResourceRegistry, Depends(get_resources)]
+
+
+def get_vector_store(resources: ResourcesDep) -> VectorStore:
+    if resources.vector_store is None:
+        raise HTTPException(status_code=503, detail="Vector store is not ready")
+    return resources.vector_store
+
+
+def get_embedder(resources: ResourcesDep) -> Embeddings:
+    if resources.embedder is None:
+        raise HTTPException(status_code=503, detail="Embedding model is not ready")
+    return resources.embedder
+
+
+def get_llm(resources: ResourcesDep) -> ChatOpenAI:
+    if resources.llm is None:
+        raise HTTPException(status_code=503, detail="LLM client is not ready")
+    return resources.llm
+
+
+def get_context_builder(resources: ResourcesDep) -> ContextBuilder:
+    if resources.context_builder is None:
+        raise HTTPException(status_code=503, detail="Context builder is not ready")
+    return resources.context_builder
+
+
+def get_ingestion_jobs(resources: ResourcesDep) -> IngestionJobManager:
+    return resources.jobs
+
+
+def get_arxiv_sync(resources: ResourcesDep) -> ArxivSyncScheduler:
+    return resources.arxiv_sync
+
+
+def get_answer_cache(resources: ResourcesDep) -> SemanticAnswerCache | None:
+    return resources.answer_cache
+
+
+def get_sparse_index(resources: ResourcesDep) -> BM25Index:
+    return resources.sparse_index
+
+
+async def get_kg_graph(resources: ResourcesDep) -> KGGraph:
+    if not resources.db_ready:
+        raise HTTPException(status_code=503, detail="Database is not ready")
+    await resources.kg_graph.refresh_if_stale(settings.KG_CACHE_REFRESH_SECONDS)
+    return resources.kg_graph
+
+
+async def get_optional_kg_graph(resources: ResourcesDep) -> KGGraph | None:
+    """The graph when the database is up, for endpoints that can do without it."""
+    if not resources.db_ready:
+        return None
+    try:
+        await resources.kg_graph.refresh_if_stale(settings.KG_CACHE_REFRESH_SECONDS)
+    except Exception as e:
+        logger.warning(f"Serving a stale knowledge graph, refresh failed: {e}")
+    return resources.kg_graph
+
+
+def get_stream_latency(resources: ResourcesDep) -> LatencyTracker:
+    return resources.stream_latency
+
+
+def get_reranker(resources: ResourcesDep) -> CrossEncoderReranker | None:
+    return resources.reranker
+
+
+VectorStoreDep = Annotated[VectorStore, Depends(get_vector_store)]
+EmbedderDep = Annotated[Embeddings, Depends(get_embedder)]
+LLMDep = Annotated[ChatOpenAI, Depends(get_llm)]
+ContextBuilderDep = Annotated[ContextBuilder, Depends(get_context_builder)]
+IngestionJobsDep = Annotated[IngestionJobManager, Depends(get_ingestion_jobs)]
+ArxivSyncDep = Annotated[ArxivSyncScheduler, Depends(get_arxiv_sync)]
+AnswerCacheDep = Annotated[SemanticAnswerCache | None, Depends(get_answer_cache)]
+SparseIndexDep = Annotated[BM25Index, Depends(get_sparse_index)]
+KGGraphDep = Annotated[KGGraph, Depends(get_kg_graph)]
+OptionalKGGraphDep = Annotated[KGGraph | None, Depends(get_optional_kg_graph)]
+StreamLatencyDep = Annotated[LatencyTracker, Depends(get_stream_latency)]
+RerankerDep = Annotated[CrossEncoderReranker | None, Depends(get_reranker)]
+# One session per request, closed (and its connection returned to the pool) after the response
+DbSessionDep = Annotated[Session, Depends(get_db)]
+AsyncDbSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
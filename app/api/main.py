@@ -2,7 +2,15 @@ from fastapi import APIRouter
 
 from app.api.routes import rag
 from app.api.routes import data_fetcher
+from app.api.routes import health
+from app.api.routes import jobs
+from app.api.routes import metrics
+from app.api.routes import kg
 
 api_router = APIRouter()
 api_router.include_router(rag.router)
 api_router.include_router(data_fetcher.router)
+api_router.include_router(jobs.router)
+api_router.include_router(health.router)
+api_router.include_router(metrics.router)
+api_router.include_router(kg.router)
@@ -1,11 +1,13 @@
-import asyncio
+from datetime import datetime
+from typing import Annotated
 
-from fastapi import APIRouter
-from app.core.rag import index_arxiv_articles
-from app.schemas.data_fetcher import ArticleInDB, FetchArxivArticleRequest, FetchArxivArticleResponse
-from app.core.data_fetcher import fetch_articles_by_query, get_articles_from_db, store_articles_into_db
-from app.utils.db import init_db
-from app.core.vector_db import load_vector_store
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.schemas.data_fetcher import ArticleFilters, ArticleInDB, ArticlePage, ArxivSyncResult, ArxivSyncTopic, ArxivSyncTopicRequest, FetchArxivArticleRequest, FetchArxivArticleResponse
+from app.core.data_fetcher import get_articles_from_db, stream_articles_from_db
+from app.core.arxiv_sync import delete_sync_topic, list_sync_topics, upsert_sync_topic
+from app.core.ingestion import ingest_arxiv_query
+from app.api.deps import ArxivSyncDep, AsyncDbSessionDep, SparseIndexDep, VectorStoreDep
 
 router = APIRouter()
 @router.post(
@@ -14,15 +16,20 @@ router = APIRouter()
     tags=["data-fetcher"],
     responses={500: {"description": "Internal server error"}, 400: {"description": "Bad request"}},
 )
-def api_fetch_arxiv_articles(
+async def api_fetch_arxiv_articles(
     body: FetchArxivArticleRequest,
+    vector_store: VectorStoreDep,
+    sparse_index: SparseIndexDep,
 ) -> FetchArxivArticleResponse:
-    init_db()
-    chroma = load_vector_store()
-    fetched_articles: FetchArxivArticleResponse = asyncio.run(fetch_articles_by_query(body.query, body.max_results, body.sort_criterion))
-    asyncio.run(store_articles_into_db(fetched_articles.fetched_articles))
-    asyncio.run(index_arxiv_articles(fetched_articles.fetched_articles,query=body.query,vectore_store=chroma))
-    return fetched_articles
+    return await ingest_arxiv_query(body.query, body.max_results, body.sort_criterion, vector_store, sparse_index=sparse_index, full_text=body.full_text)
+
+def get_article_filters(
+    published_from: datetime | None = None,
+    published_to: datetime | None = None,
+    title: Annotated[str | None, Query(description="Case-insensitive substring of the title")] = None,
+) -> ArticleFilters:
+    return ArticleFilters(published_from=published_from, published_to=published_to, title=title)
+
 
 @router.get(
     "/get-db-arxiv-articles",
@@ -30,9 +37,95 @@ def api_fetch_arxiv_articles(
     tags=["data-fetcher"],
     responses={500: {"description": "Internal server error"}, 400: {"description": "Bad request"}},
 )
-def api_get_stored_arxiv_articles(
+async def api_get_stored_arxiv_articles(
+    filters: Annotated[ArticleFilters, Depends(get_article_filters)],
 ) -> list[ArticleInDB]:
-    init_db()
-    result = asyncio.run(get_articles_from_db())
+    """Every matching article in one list, as this endpoint always answered; large
+    collections are better read page by page or as a stream."""
+    return [article async for article in stream_articles_from_db(filters)]
+
+
+@router.get(
+    "/get-db-arxiv-articles/page",
+    response_model=ArticlePage,
+    tags=["data-fetcher"],
+    responses={500: {"description": "Internal server error"}, 400: {"description": "Bad request"}},
+)
+async def api_get_stored_arxiv_articles_page(
+    filters: Annotated[ArticleFilters, Depends(get_article_filters)],
+    db: AsyncDbSessionDep,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=500)] = 100,
+) -> ArticlePage:
+    try:
+        return await get_articles_from_db(db, filters, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return result
\ No newline at end of file
+
+@router.get(
+    "/get-db-arxiv-articles/stream",
+    tags=["data-fetcher"],
+    responses={200: {"content": {"application/x-ndjson": {}}, "description": "One stored article per line"}},
+)
+async def api_stream_stored_arxiv_articles(
+    filters: Annotated[ArticleFilters, Depends(get_article_filters)],
+) -> StreamingResponse:
+    async def stream_lines():
+        async for article in stream_articles_from_db(filters):
+            yield article.model_dump_json() + "\n"
+
+    return StreamingResponse(stream_lines(), media_type="application/x-ndjson")
+
+
+@router.put(
+    "/arxiv-sync/topics",
+    response_model=ArxivSyncTopic,
+    tags=["data-fetcher"],
+)
+async def api_track_arxiv_sync_topic(
+    body: ArxivSyncTopicRequest,
+    db: AsyncDbSessionDep,
+) -> ArxivSyncTopic:
+    return await upsert_sync_topic(db, body)
+
+
+@router.get(
+    "/arxiv-sync/topics",
+    response_model=list[ArxivSyncTopic],
+    tags=["data-fetcher"],
+)
+async def api_list_arxiv_sync_topics(
+    db: AsyncDbSessionDep,
+) -> list[ArxivSyncTopic]:
+    return await list_sync_topics(db)
+
+
+@router.delete(
+    "/arxiv-sync/topics",
+    status_code=204,
+    tags=["data-fetcher"],
+    responses={404: {"description": "Query not tracked"}},
+)
+async def api_untrack_arxiv_sync_topic(
+    query: str,
+    db: AsyncDbSessionDep,
+) -> None:
+    if not await delete_sync_topic(db, query):
+        raise HTTPException(status_code=404, detail="Query not tracked")
+
+
+@router.post(
+    "/arxiv-sync",
+    response_model=list[ArxivSyncResult],
+    tags=["data-fetcher"],
+    responses={404: {"description": "Query not tracked"}},
+)
+async def api_run_arxiv_sync(
+    arxiv_sync: ArxivSyncDep,
+    query: Annotated[str | None, Query(description="Tracked query to sync; every enabled one when omitted")] = None,
+) -> list[ArxivSyncResult]:
+    results = await arxiv_sync.sync(query)
+    if query is not None and not results:
+        raise HTTPException(status_code=404, detail="Query not tracked")
+    return results
@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.api.deps import ResourcesDep
+from app.schemas.health import HealthStatus
+
+router = APIRouter()
+
+
+@router.get(
+    "/health/live",
+    response_model=HealthStatus,
+    tags=["health"],
+)
+async def api_liveness() -> HealthStatus:
+    return HealthStatus(status="ok")
+
+
+@router.get(
+    "/health/ready",
+    response_model=HealthStatus,
+    tags=["health"],
+    responses={503: {"model": HealthStatus, "description": "Service not ready"}},
+)
+async def api_readiness(resources: ResourcesDep):
+    components = {
+        "embedder": resources.embedder is not None,
+        "llm": resources.llm is not None,
+        "database": resources.db_ready,
+        "vector_store": await resources.check_vector_store(),
+    }
+    if all(components.values()):
+        return HealthStatus(status="ok", components=components)
+    return JSONResponse(
+        status_code=503,
+        content=HealthStatus(status="unavailable", components=components).model_dump(),
+    )
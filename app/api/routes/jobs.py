@@ -0,0 +1,71 @@
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException
+from app.api.deps import IngestionJobsDep
+from app.core.jobs import IngestionQueueFull
+from app.schemas.data_fetcher import FetchArxivArticleRequest
+from app.schemas.jobs import IngestionJob, SubmitIngestionJobResponse
+
+router = APIRouter()
+
+
+@router.post(
+    "/ingestion-jobs",
+    response_model=SubmitIngestionJobResponse,
+    status_code=202,
+    tags=["ingestion-jobs"],
+    responses={503: {"description": "Ingestion queue is full"}},
+)
+async def api_submit_ingestion_job(
+    body: FetchArxivArticleRequest,
+    jobs: IngestionJobsDep,
+) -> SubmitIngestionJobResponse:
+    try:
+        job, deduplicated = await jobs.submit(body)
+    except IngestionQueueFull:
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, retry later")
+    return SubmitIngestionJobResponse(job_id=job.id, status=job.status, deduplicated=deduplicated)
+
+
+@router.get(
+    "/ingestion-jobs",
+    response_model=list[IngestionJob],
+    response_model_exclude={"__all__": {"articles"}},
+    tags=["ingestion-jobs"],
+)
+async def api_list_ingestion_jobs(
+    jobs: IngestionJobsDep,
+) -> list[IngestionJob]:
+    return jobs.list()
+
+
+@router.get(
+    "/ingestion-jobs/{job_id}",
+    response_model=IngestionJob,
+    tags=["ingestion-jobs"],
+    responses={404: {"description": "Job not found"}},
+)
+async def api_get_ingestion_job(
+    job_id: UUID,
+    jobs: IngestionJobsDep,
+) -> IngestionJob:
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.delete(
+    "/ingestion-jobs/{job_id}",
+    response_model=IngestionJob,
+    tags=["ingestion-jobs"],
+    responses={404: {"description": "Job not found"}},
+)
+async def api_cancel_ingestion_job(
+    job_id: UUID,
+    jobs: IngestionJobsDep,
+) -> IngestionJob:
+    job = await jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
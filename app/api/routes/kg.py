@@ -1,79 +1,158 @@
 import asyncio
-import time
+from typing import Annotated
 
-from fastapi import APIRouter
-from app.schemas.data_fetcher import FetchArxivArticleRequest, FetchArxivArticleResponse
-from app.core.kg import construct_KG_from_articles_list
-from app.core.data_fetcher import fetch_articles_by_query
-from app.utils.db import SessionLocal, init_db
-from app.utils.cruds import article_crud
-from  app.schemas.data_fetcher import ArticleInDB
-from app.schemas.kg import KG_triples, ConstructKBFromArticlesRequest
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from loguru import logger
+
+from app.api.deps import KGGraphDep
+from app.config import settings
+from app.core.data_fetcher import fetch_articles_by_query, store_articles_into_db
+from app.core.kg import iter_kg_triples
+from app.core.kg_graph import KGGraph
+from app.schemas.data_fetcher import FetchArxivArticleRequest
+from app.schemas.kg import (
+    KG_triple,
+    KGArticleTriples,
+    KGCooccurrence,
+    KGEntity,
+    KGNeighbor,
+    KGNeighborhood,
+    KGRelatedPaper,
+)
 
 router = APIRouter()
 
-# Initialize database tables
-# init_db()
-# #
-
-# @router.post(
-#     "/contruct-kb",
-#     response_model=KG_triples,
-#     tags=["KG"],
-#     responses={500: {"description": "Internal server error"}, 400: {"description": "Bad request"}},
-# )
-# def api_contruct_kb_from_articles(
-#     body: FetchArxivArticleRequest,
-# ) -> ConstructKBFromArticlesRequest:
-    
-#     fetched_articles: FetchArxivArticleResponse = asyncio.run(fetch_articles_by_query(body.query, body.max_results, body.sort_criterion))
-#         # Store articles in PostgreSQL database using CRUD operations
-#     db = SessionLocal()
-#     try:
-#         # Convert pydantic models to dict for bulk creation
-#         articles_data = [
-#             {
-#                 "title": article.title,
-#                 "summary": article.summary,
-#                 "pdf_url": article.pdf_url,
-#                 "published": article.published,
-#                 "llm_summary": article.llm_summary
-#             }
-#             for article in fetched_articles.fetched_articles
-#         ]
-        
-#         # Use bulk create with duplicate checking
-#         stored_articles = article_crud.bulk_create_articles(db, articles_data)
-#         print(f"Successfully stored {len(stored_articles)} new articles in database")
-        
-#     except Exception as e:
-#         print(f"Error storing articles in database: {e}")
-#     finally:
-#         db.close()
-#     fetched_articles: FetchArxivArticleResponse = asyncio.run(construct_KG_from_articles_list(fetched_articles))
-    
-#     # Store articles in PostgreSQL database using CRUD operations
-#     db = SessionLocal()
-#     try:
-#         # Convert pydantic models to dict for bulk creation
-#         articles_data = [
-#             {
-#                 "title": article.title,
-#                 "summary": article.summary,
-#                 "pdf_url": article.pdf_url,
-#                 "published": article.published,
-#                 "llm_summary": article.llm_summary
-#             }
-#             for article in fetched_articles.fetched_articles
-#         ]
-        
-#         # Use bulk create with duplicate checking
-#         stored_articles = article_crud.bulk_create_articles(db, articles_data)
-#         print(f"Successfully stored {len(stored_articles)} new articles in database")
-        
-#     except Exception as e:
-#         print(f"Error storing articles in database: {e}")
-#     finally:
-#         db.close()
-
-#     return fetched_articles
\ No newline at end of file
+
+def _entity(graph: KGGraph, entity_id: int) -> KGEntity:
+    return KGEntity(id=entity_id, name=graph.names[entity_id], type=graph.types[entity_id], degree=graph.degree(entity_id))
+
+
+def _resolve_entity(graph: KGGraph, name: str, entity_type: str | None) -> int:
+    """Id of the entity with that name; the best connected one when several types match."""
+    entity_ids = graph.find(name, entity_type)
+    if not entity_ids:
+        raise HTTPException(status_code=404, detail=f"Unknown entity: {name}")
+    return max(entity_ids, key=graph.degree)
+
+
+# The graph queries below are NumPy traversals, and the first one after a refresh also
+# rebuilds the CSR adjacency: they run in a worker thread, off the event loop
+
+
+def _find_entities(graph: KGGraph, name: str, entity_type: str | None) -> list[KGEntity]:
+    return [_entity(graph, entity_id) for entity_id in graph.find(name, entity_type)]
+
+
+def _neighborhood(graph: KGGraph, name: str, entity_type: str | None, hops: int, max_nodes: int) -> KGNeighborhood:
+    entity_id = _resolve_entity(graph, name, entity_type)
+    distances, edges = graph.neighborhood(entity_id, hops=hops, max_nodes=max_nodes)
+    return KGNeighborhood(
+        center=_entity(graph, entity_id),
+        nodes=[KGNeighbor(**_entity(graph, node).model_dump(), hops=hop) for node, hop in distances.items() if node != entity_id],
+        edges=[
+            KG_triple(head=graph.names[head], relation=relation, tail=graph.names[tail], tail_type=graph.types[tail])
+            for head, relation, tail in edges
+        ],
+    )
+
+
+def _related_papers(graph: KGGraph, name: str, entity_type: str | None, limit: int) -> list[KGRelatedPaper]:
+    entity_id = _resolve_entity(graph, name, entity_type)
+    return [KGRelatedPaper(paper=_entity(graph, paper), score=score) for paper, score in graph.related_papers(entity_id, limit)]
+
+
+def _cooccurring(graph: KGGraph, name: str, entity_type: str | None, limit: int) -> list[KGCooccurrence]:
+    entity_id = _resolve_entity(graph, name, entity_type)
+    return [KGCooccurrence(entity=_entity(graph, other), shared_papers=count) for other, count in graph.cooccurring(entity_id, limit)]
+
+
+@router.post(
+    "/construct-kb",
+    tags=["KG"],
+    responses={200: {"content": {"application/x-ndjson": {}}, "description": "Triples of one article per line"}},
+)
+async def api_construct_kb_from_articles(
+    body: FetchArxivArticleRequest,
+    graph: KGGraphDep,
+) -> StreamingResponse:
+    fetched_articles = await fetch_articles_by_query(body.query, body.max_results, body.sort_criterion)
+    try:
+        await store_articles_into_db(fetched_articles.fetched_articles)
+    except Exception as e:
+        # The graph is built from the fetched articles whether or not they could be stored
+        logger.warning(f"Building the graph of articles that were not stored: {e}")
+
+    async def stream_triples():
+        # Triples are stored a batch at a time while the extraction carries on
+        pending: list[KG_triple] = []
+        async for article, article_triples in iter_kg_triples(fetched_articles.fetched_articles):
+            pending.extend(article_triples.triples)
+            yield KGArticleTriples(title=article.title, triples=article_triples.triples).model_dump_json() + "\n"
+            if len(pending) >= settings.KG_EXTRACTION_BATCH_SIZE * 10:
+                await graph.add_triples(pending)
+                pending = []
+        if pending:
+            await graph.add_triples(pending)
+        logger.debug(f"KG built for query '{body.query}': {graph.stats()}")
+
+    return StreamingResponse(stream_triples(), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/kg/entities",
+    response_model=list[KGEntity],
+    tags=["KG"],
+)
+async def api_find_kg_entities(
+    name: str,
+    graph: KGGraphDep,
+    type: str | None = None,
+) -> list[KGEntity]:
+    return await asyncio.to_thread(_find_entities, graph, name, type)
+
+
+@router.get(
+    "/kg/neighborhood",
+    response_model=KGNeighborhood,
+    tags=["KG"],
+    responses={404: {"description": "Unknown entity"}},
+)
+async def api_kg_neighborhood(
+    entity: str,
+    graph: KGGraphDep,
+    type: str | None = None,
+    hops: Annotated[int, Query(ge=1, le=3)] = 1,
+    max_nodes: Annotated[int, Query(ge=1, le=1000)] = 200,
+) -> KGNeighborhood:
+    return await asyncio.to_thread(_neighborhood, graph, entity, type, hops, max_nodes)
+
+
+@router.get(
+    "/kg/papers",
+    response_model=list[KGRelatedPaper],
+    tags=["KG"],
+    responses={404: {"description": "Unknown entity"}},
+)
+async def api_kg_related_papers(
+    entity: str,
+    graph: KGGraphDep,
+    type: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+) -> list[KGRelatedPaper]:
+    return await asyncio.to_thread(_related_papers, graph, entity, type, limit)
+
+
+@router.get(
+    "/kg/cooccurrence",
+    response_model=list[KGCooccurrence],
+    tags=["KG"],
+    responses={404: {"description": "Unknown entity"}},
+)
+async def api_kg_cooccurrence(
+    entity: str,
+    graph: KGGraphDep,
+    type: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+) -> list[KGCooccurrence]:
+    return await asyncio.to_thread(_cooccurring, graph, entity, type, limit)
@@ -0,0 +1,29 @@
+from typing import Any
+
+from fastapi import APIRouter
+
+from app.api.deps import ResourcesDep
+from app.core.embedding_cache import CachedEmbeddings
+from app.utils.db import pool_stats
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    response_model=dict[str, Any],
+    tags=["health"],
+)
+async def api_metrics(resources: ResourcesDep) -> dict[str, Any]:
+    metrics: dict[str, Any] = {"database_pool": pool_stats()}
+    if isinstance(resources.embedder, CachedEmbeddings):
+        metrics["embedding_cache"] = resources.embedder.stats()
+    if resources.answer_cache is not None:
+        metrics["answer_cache"] = resources.answer_cache.stats()
+    if resources.context_builder is not None:
+        metrics["context_builder"] = resources.context_builder.stats()
+    metrics["kg_graph"] = resources.kg_graph.stats()
+    metrics["answer_streams"] = resources.stream_latency.stats()
+    if resources.reranker is not None:
+        metrics["reranker"] = resources.reranker.stats()
+    return metrics
@@ -1,60 +1,44 @@
 import asyncio
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
 
 from loguru import logger
-from pathlib import Path
-from fastapi import APIRouter, UploadFile
+from fastapi import APIRouter, HTTPException, Request, UploadFile
+from langchain_core.embeddings import Embeddings
 from fastapi.responses import StreamingResponse
-from app.schemas.rag import AnswerToQuestion, QuestionForDocs, _parse_final_answer
-from app.core.rag import retreive_context, index_document, retreive_arxiv_context
-from app.core.vector_db import load_vector_store
+from app.schemas.rag import AnswerStreamDone, AnswerToQuestion, QuestionForDocs, QuestionsForDocs, StreamMetrics, _parse_final_answer
+from app.core.rag import answer_sources, retreive_context, retreive_arxiv_context
+from app.api.deps import AnswerCacheDep, ContextBuilderDep, EmbedderDep, LLMDep, OptionalKGGraphDep, RerankerDep, SparseIndexDep, StreamLatencyDep, VectorStoreDep
 from app.config import settings
-
-from PyPDF2 import PdfReader
-
-from langchain_openai import ChatOpenAI
+from app.core.answer_cache import answer_cache_namespace
+from app.core.batch_qa import iter_batch_answers
+from app.core.bulk_ingestion import ArchiveTooLarge, LocalDocument, extract_archive, ingest_local_documents, is_archive, is_document, unique_document_name
+from app.core.ingestion import ingest_document_file
+from app.core.metadata_filters import build_where
+from app.core.pdf import UploadTooLarge, spool_upload
+from app.core.prompts import ANSWER_PROMPT, RESEARCHER_PROMPT, get_prompt_template
+from app.core.streaming import relay_until_disconnect, sse_event
 
 
 router = APIRouter()
 
-llm = ChatOpenAI(
-        # base_url=settings.OPENAI_API_BASE,
-        api_key=settings.OPENAI_API_KEY,
-        model=settings.OPENAI_MODEL,
-        temperature=0.5,
-        streaming=True
-    )
-# Global variable to cache the vector store
-_vector_store = None
-
-def get_vector_store():
-    """Lazy loader for the vector store to prevent startup race conditions."""
-    global _vector_store
-    if _vector_store is None:
-        _vector_store = load_vector_store()
-    return _vector_store
+# Size of the pieces a cached answer is replayed in on the streaming endpoint
+CACHED_STREAM_CHUNK_CHARS = 64
 
 # --------- Helpers ---------
 
-def extract_text_from_file(file: UploadFile) -> str | None:
-    """Detect file type and extract raw text."""
-    if file is not None and file.filename is not None:
-        if file.filename.endswith(".txt"):
-            return file.file.read().decode("utf-8")
-
-        if file.filename.endswith(".pdf"):
-            reader = PdfReader(file.file)
-            return "\n".join([page.extract_text() for page in reader.pages])
+def get_system_prompt(question: str, context: str, file_name: str = ANSWER_PROMPT) -> str:
+    """Format the system prompt from its template, read from disk once."""
+    return get_prompt_template(file_name).render(question=question, context=context)
 
-        raise ValueError("Unsupported file type")
-    else:
-        raise ValueError("None existing file")
-    return None
 
-def get_system_prompt(question: str, context: str,file_name:str="answer.txt") -> str:
-    """Load and format the system prompt from file."""
-    prompt_path = Path(__file__).parent.parent.parent / "prompts" / file_name
-    prompt_template = prompt_path.read_text(encoding="utf-8")
-    return prompt_template.format(question=question, context=context)
+def start_question_embedding(embedder: Embeddings, question: str) -> asyncio.Task:
+    """Embed the question in the background, for the answer cache and the dense search."""
+    return asyncio.ensure_future(asyncio.to_thread(embedder.embed_query, question))
 
 
 @router.post(
@@ -65,60 +49,326 @@ def get_system_prompt(question: str, context: str,file_name:str="answer.txt") ->
 )
 async def api_answer_question(
     body: QuestionForDocs,
+    vector_store: VectorStoreDep,
+    llm: LLMDep,
+    embedder: EmbedderDep,
+    answer_cache: AnswerCacheDep,
+    sparse_index: SparseIndexDep,
+    reranker: RerankerDep,
+    kg_graph: OptionalKGGraphDep,
+    context_builder: ContextBuilderDep,
 ) -> AnswerToQuestion:
     answer: AnswerToQuestion
 
+    # Retrieval starts speculatively alongside the cache lookup, sharing its embedding,
+    # and is cancelled if the cache answers
+    question_embedding = start_question_embedding(embedder, body.question) if answer_cache is not None else None
+    cache_version = answer_cache.version() if answer_cache is not None else None
     logger.debug(f"Now going to retreive context for the question: {body.question}")
-    joint_context, retreived_docs = await retreive_context(body.question,vector_store=get_vector_store())
+    retrieval_task = asyncio.ensure_future(retreive_context(
+        body.question, vector_store=vector_store, mode=body.retrieval_mode, sparse_index=sparse_index,
+        reranker=reranker if body.rerank else None, kg_graph=kg_graph,
+        context_builder=context_builder, query_embedding=question_embedding, where=build_where(body.filters),
+    ))
+    try:
+        if answer_cache is not None:
+            cache_namespace = answer_cache_namespace("answer-question", body)
+            cached = answer_cache.lookup(cache_namespace, await question_embedding)
+            if cached is not None:
+                logger.debug(f"Serving cached answer for the question: {body.question}")
+                return AnswerToQuestion(**cached)
+
+        joint_context, retrieval = await retrieval_task
+    finally:
+        retrieval_task.cancel()
     logger.debug(f"Retreived similar context to the question {joint_context}. \n Now, asking LLM to formulate the answer from this context")
     prompt = get_system_prompt(context=joint_context, question=body.question)
     response = await llm.ainvoke(prompt)
     llm_resposne = response.content
     answer = _parse_final_answer(llm_resposne)
+    if answer_cache is not None:
+        answer_cache.store(cache_namespace, question_embedding.result(), answer.model_dump(exclude={"retrieval_timings", "context_stats"}), cache_version)
+    answer.retrieval_timings = retrieval.timings
+    answer.context_stats = retrieval.context_stats
     return answer
 
 
 @router.post(
     "/answer-research-question",
     tags=["rag"],
-    responses={500: {"description": "Internal server error"}, 400: {"description": "Bad request"}},
+    responses={
+        200: {"content": {"text/event-stream": {}}, "description": "status, sources, token, done and error events"},
+        500: {"description": "Internal server error"},
+        400: {"description": "Bad request"},
+    },
 )
 async def api_answer_research_question(
+    request: Request,
     body: QuestionForDocs,
+    vector_store: VectorStoreDep,
+    llm: LLMDep,
+    embedder: EmbedderDep,
+    answer_cache: AnswerCacheDep,
+    sparse_index: SparseIndexDep,
+    reranker: RerankerDep,
+    kg_graph: OptionalKGGraphDep,
+    context_builder: ContextBuilderDep,
+    stream_latency: StreamLatencyDep,
+) -> StreamingResponse:
+    started = time.perf_counter()
+    metrics = StreamMetrics()
+    # Per-stage latency in ms: retrieval stages, then prompt, first token and generation
+    timings: dict[str, float] = {}
+    # The question part of the prompt is filled in before the context is known
+    prompt_template = get_prompt_template(RESEARCHER_PROMPT).partial(question=body.question)
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1000, 2)
+
+    def finish(answer: str, first_token_at: float | None) -> StreamMetrics:
+        metrics.total_ms = elapsed_ms()
+        metrics.output_tokens = context_builder.counter.count(answer)
+        if first_token_at is not None and metrics.total_ms > first_token_at:
+            timings["generation_ms"] = round(metrics.total_ms - first_token_at, 2)
+            metrics.tokens_per_second = round(metrics.output_tokens * 1000 / (metrics.total_ms - first_token_at), 2)
+        stream_latency.record({
+            **timings,
+            "ttfb_ms": metrics.ttfb_ms,
+            "ttft_ms": metrics.ttft_ms,
+            "total_ms": metrics.total_ms,
+            "tokens_per_second": metrics.tokens_per_second,
+        })
+        logger.info(f"Streamed answer: {metrics.model_dump()}, stages: {timings}")
+        return metrics
+
+    async def generate_events():
+        answer_parts: list[str] = []
+        question_embedding = start_question_embedding(embedder, body.question) if answer_cache is not None else None
+        cache_version = answer_cache.version() if answer_cache is not None else None
+        # Retrieval runs while the cache is looked up, and is cancelled on a hit
+        retrieval_task = asyncio.ensure_future(retreive_arxiv_context(
+            body.question, vector_store=vector_store, mode=body.retrieval_mode, sparse_index=sparse_index,
+            reranker=reranker if body.rerank else None, kg_graph=kg_graph,
+            context_builder=context_builder, query_embedding=question_embedding, where=build_where(body.filters),
+        ))
+        try:
+            yield sse_event("status", {"stage": "retrieval", "message": "Retrieving context from Arxiv..."})
+            if answer_cache is not None:
+                cache_namespace = answer_cache_namespace("answer-research-question", body)
+                t0 = time.perf_counter()
+                cached = answer_cache.lookup(cache_namespace, await question_embedding)
+                timings["cache_lookup_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+                if cached is not None:
+                    retrieval_task.cancel()
+                    logger.debug(f"Replaying cached answer for the question: {body.question}")
+                    yield sse_event("status", {"stage": "cache", "message": "Answer served from cache"})
+                    metrics.ttft_ms = elapsed_ms()
+                    for start in range(0, len(cached), CACHED_STREAM_CHUNK_CHARS):
+                        yield sse_event("token", {"text": cached[start:start + CACHED_STREAM_CHUNK_CHARS]})
+                        await asyncio.sleep(0)
+                    yield sse_event("done", AnswerStreamDone(cached=True, metrics=finish(cached, metrics.ttft_ms), timings=timings))
+                    return
+
+            joint_context, retrieval = await retrieval_task
+            timings.update(retrieval.timings)
+            logger.debug(f"Retreived similar context to the question in {retrieval.timings}. Now, asking LLM to formulate the answer")
+            t0 = time.perf_counter()
+            prompt = prompt_template.render(context=joint_context)
+            timings["prompt_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+
+            # The LLM request goes out first; sources are sent while it waits for a token
+            stream = llm.astream(prompt)
+            next_chunk = asyncio.ensure_future(anext(stream, None))
+            try:
+                yield sse_event("sources", {"sources": [source.model_dump() for source in answer_sources(retrieval.documents, retrieval.score_kind)]})
+                yield sse_event("status", {"stage": "generation", "message": "Asking LLM to formulate the answer..."})
+                while (chunk := await next_chunk) is not None:
+                    if chunk.content:
+                        if metrics.ttft_ms is None:
+                            metrics.ttft_ms = elapsed_ms()
+                        answer_parts.append(chunk.content)
+                        yield sse_event("token", {"text": chunk.content})
+                    next_chunk = asyncio.ensure_future(anext(stream, None))
+            finally:
+                # A cancelled request closes the upstream LLM stream right away
+                next_chunk.cancel()
+                await asyncio.gather(next_chunk, return_exceptions=True)
+                await stream.aclose()
+
+            answer = "".join(answer_parts)
+            yield sse_event("done", AnswerStreamDone(
+                metrics=finish(answer, metrics.ttft_ms),
+                timings=timings,
+                context_stats=retrieval.context_stats,
+            ))
+            # Only complete answers are cached: an interrupted stream never gets here
+            if answer_cache is not None:
+                answer_cache.store(cache_namespace, question_embedding.result(), answer, cache_version)
+        except asyncio.CancelledError:
+            logger.info(f"Answer stream cancelled after {len(answer_parts)} chunks ({elapsed_ms()}ms)")
+            raise
+        except Exception as e:
+            logger.exception(f"Error while streaming the answer: {e}")
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            retrieval_task.cancel()
+
+    async def stream_events():
+        async for event in relay_until_disconnect(request, generate_events(), settings.SSE_DISCONNECT_POLL_SECONDS):
+            if metrics.ttfb_ms is None:
+                metrics.ttfb_ms = elapsed_ms()
+            yield event
+
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        # Proxies must not buffer the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post(
+    "/answer-questions",
+    tags=["rag"],
+    responses={
+        200: {"content": {"application/x-ndjson": {}}, "description": "One BatchAnswer per line, in completion order"},
+        400: {"description": "Bad request"},
+    },
+)
+async def api_answer_questions(
+    request: Request,
+    body: QuestionsForDocs,
+    vector_store: VectorStoreDep,
+    llm: LLMDep,
+    embedder: EmbedderDep,
+    answer_cache: AnswerCacheDep,
+    sparse_index: SparseIndexDep,
+    reranker: RerankerDep,
+    kg_graph: OptionalKGGraphDep,
+    context_builder: ContextBuilderDep,
 ) -> StreamingResponse:
-    
-    async def stream_response():
-        yield "🔍 Retrieving context from Arxiv...\n\n"
-        logger.debug(f"Vector store loaded! \n Now going to retreive context for the question: {body.question}")
-        
-        joint_context, retreived_docs = await retreive_arxiv_context(body.question, vector_store=get_vector_store())
-        
-        yield "🧠 Asking LLM to formulate the answer...\n\n"
-        logger.debug(f"Retreived similar context to the question. Now, asking LLM to formulate the answer")
-        
-        prompt = get_system_prompt(context=joint_context, question=body.question, file_name='researcher.txt')
-        
-        async for chunk in llm.astream(prompt):
-            if chunk.content:
-                yield chunk.content
-
-    return StreamingResponse(stream_response(), media_type="text/event-stream")
+    if len(body.questions) > settings.BATCH_QA_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_QA_MAX_QUESTIONS} questions per batch")
+
+    async def stream_answers():
+        async for result in iter_batch_answers(
+            body, vector_store, embedder, llm, context_builder, answer_cache=answer_cache,
+            sparse_index=sparse_index, reranker=reranker, kg_graph=kg_graph,
+        ):
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(
+        relay_until_disconnect(request, stream_answers(), settings.SSE_DISCONNECT_POLL_SECONDS),
+        media_type="application/x-ndjson",
+    )
 
 @router.post(
     "/index-doc",
     tags=["rag"],
-    responses={500: {"description": "Internal server error"}, 400: {"description": "Bad request"}},
+    response_model=None,
+    responses={
+        200: {
+            "content": {"application/json": {"schema": {"type": "integer"}}, "application/x-ndjson": {}},
+            "description": "Number of indexed chunks, or with stream=true the indexing progress, one line per indexed group of pages",
+        },
+        400: {"description": "Bad request"},
+        413: {"description": "Upload too large"},
+    },
 )
 async def api_index_doc(
-    file: UploadFile
-) -> int:
+    file: UploadFile,
+    vector_store: VectorStoreDep,
+    sparse_index: SparseIndexDep,
+    stream: bool = False,
+) -> int | StreamingResponse:
+    file_name = file.filename or ""
+    if not is_document(file_name):
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+    try:
+        path = await spool_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
     try:
-        raw_text = extract_text_from_file(file)
-        doc_len = await index_document(str(raw_text), get_vector_store())
-        if doc_len:
-            return doc_len
-        else:
-            raise Exception("Error while indexing document")
+        progress = ingest_document_file(path, file_name, vector_store, sparse_index=sparse_index)
+        # Unreadable files are reported before the response starts
+        first = await anext(progress)
     except Exception as e:
+        os.remove(path)
         logger.error(f"Indexing error: {e}")
-        raise Exception("Error while indexing document")
+        raise HTTPException(status_code=400, detail=f"Could not read {file_name}")
+
+    if not stream:
+        # The plain JSON count this endpoint always answered
+        last = first
+        try:
+            async for last in progress:
+                pass
+        finally:
+            await progress.aclose()
+            os.remove(path)
+        if not last.chunks:
+            raise HTTPException(status_code=400, detail=f"No text could be indexed from {file_name}")
+        return last.chunks
+
+    async def stream_progress():
+        try:
+            yield first.model_dump_json() + "\n"
+            async for update in progress:
+                yield update.model_dump_json() + "\n"
+        finally:
+            await progress.aclose()
+            os.remove(path)
+
+    return StreamingResponse(stream_progress(), media_type="application/x-ndjson")
+
+
+@router.post(
+    "/index-docs",
+    tags=["rag"],
+    responses={
+        200: {"content": {"application/x-ndjson": {}}, "description": "One BulkDocumentResult per document, then the BulkIngestionReport"},
+        400: {"description": "Bad request"},
+        413: {"description": "Upload too large"},
+    },
+)
+async def api_index_docs(
+    files: list[UploadFile],
+    vector_store: VectorStoreDep,
+    sparse_index: SparseIndexDep,
+    force: bool = False,
+) -> StreamingResponse:
+    os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+    workdir = tempfile.mkdtemp(dir=settings.UPLOAD_SPOOL_DIR)
+    documents: list[LocalDocument] = []
+    # Uploads with the same file name are told apart in the manifest
+    names: set[str] = set()
+    try:
+        for file in files:
+            name = file.filename or ""
+            if not (is_archive(name) or is_document(name)):
+                raise HTTPException(status_code=400, detail=f"Unsupported file type: {name}")
+            name = unique_document_name(name, names)
+            path = await spool_upload(file, directory=workdir)
+            if is_archive(name):
+                try:
+                    documents.extend(await asyncio.to_thread(extract_archive, path, os.path.join(workdir, str(len(documents))), name))
+                except (tarfile.TarError, zipfile.BadZipFile) as e:
+                    raise HTTPException(status_code=400, detail=f"Could not read archive {name}: {e}")
+                os.remove(path)
+            else:
+                documents.append(LocalDocument(path=name, file_path=path))
+    except (UploadTooLarge, ArchiveTooLarge) as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+
+    async def stream_results():
+        try:
+            async for result in ingest_local_documents(documents, vector_store, sparse_index=sparse_index, force=force):
+                yield result.model_dump_json() + "\n"
+        finally:
+            await asyncio.to_thread(shutil.rmtree, workdir, True)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
@@ -0,0 +1,68 @@
+"""Add the typed filter metadata to the chunks indexed before retrieval filters existed.
+
+``source_key``, ``title_key`` and ``published_ts`` are derived from the ``source``,
+``title`` and ``publication_date`` metadata of every chunk that lacks them; vectors are
+left untouched. The BM25 index file is updated the same way. With the local vector
+store backend, stop the server first: both would write the index.
+
+Usage:
+    python -m app.commands.backfill_filter_metadata [--page-size 1000] [--dry-run]
+"""
+import argparse
+
+from loguru import logger
+
+from app.config import settings
+from app.core.local_vector_store import LocalVectorStore
+from app.core.metadata_filters import filter_metadata
+from app.core.sparse_index import BM25Index
+from app.core.vector_db import iter_collection_documents, load_vector_store
+
+
+def backfill_filter_metadata(vector_store, sparse_index: BM25Index | None = None, page_size: int = 1000, dry_run: bool = False) -> dict[str, int]:
+    report = {"chunks": 0, "updated": 0, "sparse_updated": 0}
+    for ids, _, metadatas in iter_collection_documents(vector_store, page_size):
+        report["chunks"] += len(ids)
+        updates = {}
+        for doc_id, metadata in zip(ids, metadatas):
+            metadata = metadata or {}
+            typed = filter_metadata(metadata)
+            if any(metadata.get(key) != value for key, value in typed.items()):
+                updates[doc_id] = {**metadata, **typed}
+        report["updated"] += len(updates)
+        if dry_run or not updates:
+            continue
+        # Updating in place does not shift the pages being read
+        if isinstance(vector_store, LocalVectorStore):
+            vector_store.update_metadatas(list(updates), list(updates.values()))
+        else:
+            vector_store._collection.update(ids=list(updates), metadatas=list(updates.values()))
+        if sparse_index is not None:
+            report["sparse_updated"] += sparse_index.update_metadatas(list(updates), list(updates.values()))
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    args = parser.parse_args()
+
+    vector_store = load_vector_store()
+    sparse_index = BM25Index(k1=settings.BM25_K1, b=settings.BM25_B, path=settings.BM25_INDEX_PATH)
+    if not sparse_index.load():
+        sparse_index = None
+    report = backfill_filter_metadata(vector_store, sparse_index, page_size=args.page_size, dry_run=args.dry_run)
+    if not args.dry_run:
+        if isinstance(vector_store, LocalVectorStore):
+            vector_store.save()
+        if sparse_index is not None:
+            sparse_index.save()
+    logger.info(
+        f"{'[dry-run] ' if args.dry_run else ''}{report['chunks']} chunks, {report['updated']} given filter metadata "
+        f"({report['sparse_updated']} in the BM25 index)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compact a Chroma collection indexed before chunks had content-addressed ids.
+
+Every record is re-keyed with ``document_chunk_id``. For each group of records sharing
+the same content id, a single copy is kept under that id (its stored embedding is
+reused, nothing is re-embedded) and the other copies are deleted.
+
+Usage:
+    python -m app.commands.dedup_collection [--collection demo] [--dry-run]
+"""
+import argparse
+from collections import defaultdict
+
+from langchain_core.documents.base import Document
+from loguru import logger
+
+from app.config import settings
+from app.core.vector_db import document_chunk_id, load_chroma_client
+
+
+def dedup_collection(collection, page_size: int = 1000, dry_run: bool = False) -> dict[str, int]:
+    # 1. Group every record id by its content id before touching the collection, so that
+    # deletions do not shift the pages being read
+    groups: dict[str, list[str]] = defaultdict(list)
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for record_id, content, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            groups[document_chunk_id(Document(page_content=content or "", metadata=metadata or {}))].append(record_id)
+        offset += len(page["ids"])
+
+    report = {"records": offset, "unique_chunks": len(groups), "rekeyed": 0, "deleted": 0}
+
+    # 2. Keep one record per content id, re-keying it when needed
+    to_rekey = [(target, ids[0]) for target, ids in groups.items() if target not in ids]
+    to_delete = [
+        record_id
+        for target, ids in groups.items()
+        for record_id in ids
+        if record_id != target
+    ]
+    report["rekeyed"] = len(to_rekey)
+    report["deleted"] = len(to_delete) - len(to_rekey)
+    if dry_run:
+        return report
+
+    for start in range(0, len(to_rekey), page_size):
+        batch = to_rekey[start:start + page_size]
+        records = collection.get(ids=[source for _, source in batch], include=["documents", "metadatas", "embeddings"])
+        by_id = {
+            record_id: (content, metadata, embedding)
+            for record_id, content, metadata, embedding in zip(
+                records["ids"], records["documents"], records["metadatas"], records["embeddings"]
+            )
+        }
+        targets = [target for target, source in batch if source in by_id]
+        sources = [by_id[source] for _, source in batch if source in by_id]
+        collection.upsert(
+            ids=targets,
+            documents=[content for content, _, _ in sources],
+            metadatas=[metadata for _, metadata, _ in sources],
+            embeddings=[embedding for _, _, embedding in sources],
+        )
+
+    for start in range(0, len(to_delete), page_size):
+        collection.delete(ids=to_delete[start:start + page_size])
+
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--collection", default=settings.CHROMA_COLLECTION_NAME)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    args = parser.parse_args()
+
+    client = load_chroma_client()
+    collection = client.get_collection(args.collection)
+    report = dedup_collection(collection, page_size=args.page_size, dry_run=args.dry_run)
+    logger.info(
+        f"{'[dry-run] ' if args.dry_run else ''}{args.collection}: {report['records']} records, "
+        f"{report['unique_chunks']} unique chunks, {report['rekeyed']} re-keyed, {report['deleted']} duplicates deleted"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Index a local corpus of PDF and text files, directories or zip/tar archives of them.
+
+Files are named by their path relative to the given directory (or by their file name)
+in the ``IndexedDocument`` manifest; a re-run only processes new and changed files.
+The BM25 index of a running server catches up with the new chunks at its next start.
+With the local vector store backend, stop the server first: both would write the index.
+
+Usage:
+    python -m app.commands.ingest_documents PATH [PATH ...] [--force]
+"""
+import argparse
+import asyncio
+import shutil
+import tempfile
+
+from loguru import logger
+
+from app.core.bulk_ingestion import collect_documents, ingest_local_documents
+from app.core.local_vector_store import LocalVectorStore
+from app.core.pdf import shutdown_pdf_process_pool
+from app.core.vector_db import load_vector_store
+from app.schemas.rag import BulkIngestionReport
+from app.utils.db import init_async_db
+
+
+async def ingest_paths(paths: list[str], force: bool = False) -> BulkIngestionReport:
+    try:
+        await init_async_db()
+    except Exception as e:
+        logger.warning(f"PostgreSQL not reachable, indexing without the manifest: {e}")
+    vector_store = await asyncio.to_thread(load_vector_store)
+    extraction_dir = tempfile.mkdtemp()
+    try:
+        documents = await asyncio.to_thread(collect_documents, paths, extraction_dir)
+        logger.info(f"Found {len(documents)} documents")
+        async for result in ingest_local_documents(documents, vector_store, force=force):
+            if isinstance(result, BulkIngestionReport):
+                report = result
+            elif result.status == "failed":
+                logger.warning(f"{result.path}: {result.error}")
+            else:
+                logger.debug(f"{result.path}: {result.status}, {result.chunks} chunks")
+    finally:
+        shutil.rmtree(extraction_dir, ignore_errors=True)
+        shutdown_pdf_process_pool()
+        if isinstance(vector_store, LocalVectorStore):
+            await asyncio.to_thread(vector_store.save)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="files, directories or archives to index")
+    parser.add_argument("--force", action="store_true", help="re-index documents the manifest already holds")
+    args = parser.parse_args()
+
+    report = asyncio.run(ingest_paths(args.paths, force=args.force))
+    logger.info(
+        f"{report.documents} documents: {report.indexed} indexed ({report.pages} pages, {report.stats.chunks} chunks, "
+        f"{report.stats.skipped_chunks} already stored), {report.unchanged} unchanged, {report.duplicates} duplicates, "
+        f"{report.failed} failed in {report.total_seconds:.2f}s "
+        f"({report.documents_per_second} docs/s, {report.chunks_per_second} chunks/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
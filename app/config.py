@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import  SecretStr
+from typing import Literal
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_ignore_empty=True, extra="ignore")
@@ -12,6 +13,17 @@ class Settings(BaseSettings):
 
     CHROMA_DB_HOST: str = "chroma"
     CHROMA_DB_PORT: int = 8001
+    CHROMA_COLLECTION_NAME: str = "demo"
+    CHROMA_MAX_BATCH_SIZE: int = 5000
+
+    # "chroma" talks to the Chroma server, "local" keeps an in-process memory-mapped index
+    VECTOR_STORE_BACKEND: Literal["chroma", "local"] = "chroma"
+    LOCAL_INDEX_PATH: str = "data/local_index"
+    LOCAL_INDEX_DTYPE: Literal["float32", "float16"] = "float32"
+    LOCAL_INDEX_IVF_MIN_VECTORS: int = 50000
+    LOCAL_INDEX_NPROBE: int = 8
+    # Share of deleted rows past which the local index is rewritten without them
+    LOCAL_INDEX_COMPACT_RATIO: float = 0.25
     
     
     PG_DB_HOST: str = "postgres_db"
@@ -19,9 +31,110 @@ class Settings(BaseSettings):
     PG_DB_NAME: str = "researcher_assistantdb"
     PG_DB_USER_NAME: str = "appuser"
     PG_password: str  = "apppassword"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    BACKEND_CONNECT_RETRY_SECONDS: float = 5
     
+    EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
+    EMBEDDING_CACHE_SIZE: int = 50000
+    EMBEDDING_CACHE_DISK_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "data/embedding_cache.sqlite"
+
+    EMBEDDING_BATCH_SIZE: int = 64
+    INGESTION_EMBEDDING_WORKERS: int = 2
+    ARXIV_FETCH_BATCH_SIZE: int = 25
+    # Threads paging arXiv for ingestions, and batches of one ingestion stored and indexed at once
+    ARXIV_FETCH_WORKERS: int = 4
+    ARXIV_INGESTION_BATCHES_IN_FLIGHT: int = 2
+    # Shared arXiv API client: results per page, pause between requests, retries
+    ARXIV_PAGE_SIZE: int = 100
+    ARXIV_DELAY_SECONDS: float = 3.0
+    ARXIV_NUM_RETRIES: int = 3
+    # Incremental sync of the tracked queries: periodic run in-process, and the most
+    # articles one sync of a query fetches (also the size of its first sync)
+    ARXIV_SYNC_ENABLED: bool = False
+    ARXIV_SYNC_INTERVAL_SECONDS: float = 3600
+    ARXIV_SYNC_MAX_RESULTS: int = 200
+    # Full-text ingestion: PDFs are cached by arXiv id and version. ARXIV_PDF_BASE_URL
+    # replaces the article pdf_url (an http(s) mirror, or a file:// directory of <id><version>.pdf)
+    ARXIV_PDF_CACHE_DIR: str = "data/arxiv_pdfs"
+    ARXIV_PDF_BASE_URL: str = ""
+    ARXIV_PDF_DOWNLOAD_CONCURRENCY: int = 4
+    ARXIV_PDF_TIMEOUT_SECONDS: float = 60
+    # PDFs of URLs without a version are the latest one: they are downloaded again past this age
+    ARXIV_PDF_LATEST_TTL_SECONDS: float = 7 * 24 * 3600
+    INGESTION_JOB_WORKERS: int = 2
+    INGESTION_JOB_QUEUE_SIZE: int = 100
+    INGESTION_JOBS_PERSIST: bool = False
+    # Finished jobs stay in memory for INGESTION_JOB_TTL_SECONDS, at most INGESTION_JOBS_MAX_FINISHED
+    # of them, and their fetched articles for INGESTION_JOB_ARTICLES_TTL_SECONDS (enough for a polling client)
+    INGESTION_JOB_TTL_SECONDS: float = 3600
+    INGESTION_JOBS_MAX_FINISHED: int = 500
+    INGESTION_JOB_ARTICLES_TTL_SECONDS: float = 300
+    # Progress of a running persisted job is saved this often, so a crash loses little of it
+    INGESTION_JOB_PROGRESS_SAVE_SECONDS: float = 5
+
     CHUNKS_SIZE: int =1000
+    # Document uploads (/index-doc) are copied here before extraction
+    UPLOAD_SPOOL_DIR: str = "data/uploads"
+    UPLOAD_MAX_BYTES: int = 200 * 1024 * 1024
+    # PDF text extraction process pool; its size defaults to the number of CPU cores
+    PDF_EXTRACTION_PROCESSES: int | None = None
+    PDF_PAGES_PER_TASK: int = 8
+    # Bulk ingestion: documents extracted at a time, and chunks stored per flush
+    BULK_INGESTION_CONCURRENCY: int = 8
+    BULK_INGESTION_FLUSH_CHUNKS: int = 512
+    # Uploaded or local archives: most files and bytes extracted from one archive
+    ARCHIVE_MAX_MEMBERS: int = 10000
+    ARCHIVE_MAX_EXTRACTED_BYTES: int = 2 * 1024 * 1024 * 1024
     TOP_K_RETRIEVE: int = 5
+    # Batch question answering: questions per request and concurrent LLM calls
+    BATCH_QA_MAX_QUESTIONS: int = 500
+    BATCH_QA_CONCURRENCY: int = 8
+    # Tokens of OPENAI_MODEL the retrieved context may take in the prompt
+    CONTEXT_TOKEN_BUDGET: int = 3000
+
+    BM25_INDEX_PATH: str = "data/bm25"
+    # How often the BM25 index is written to disk when ingestions changed it
+    BM25_SAVE_INTERVAL_SECONDS: float = 60
+    BM25_K1: float = 1.5
+    BM25_B: float = 0.75
+    HYBRID_CANDIDATES_FACTOR: int = 4
+    RRF_K: int = 60
+
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL_NAME: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20
+    RERANK_BATCH_SIZE: int = 16
+    RERANK_MAX_LENGTH: int = 512
+    RERANK_CACHE_SIZE: int = 20000
+    RERANK_LATENCY_BUDGET_MS: float = 300
+
+    GLINER2_MODEL_NAME: str = "fastino/gliner2-base-v1"
+    KG_EXTRACTION_BATCH_SIZE: int = 8
+    # Fan batches out to a process pool; its size defaults to the number of CPU cores
+    KG_EXTRACTION_PROCESS_POOL: bool = False
+    KG_EXTRACTION_PROCESSES: int | None = None
+    # Max age of the in-memory graph before a query pulls the new edges from PostgreSQL
+    KG_CACHE_REFRESH_SECONDS: float = 30
+    # Graph retrieval mode: papers reached from the question entities, and how many of
+    # their chunks may displace dense hits
+    KG_RETRIEVAL_MAX_PAPERS: int = 10
+    KG_RETRIEVAL_CHUNK_BUDGET: int = 3
+    KG_RETRIEVAL_MAX_FACTS: int = 30
+
+    # How often a streamed answer checks that its client is still connected
+    SSE_DISCONNECT_POLL_SECONDS: float = 0.5
+
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    ANSWER_CACHE_TTL_SECONDS: float = 3600
+    # Across all namespaces (endpoint and options) together
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
     
     COLLECTOR_ENDPOINT: str = "http://phoenix:6006/v1/traces"
     OTEL_BSP_SCHEDULE_DELAY_MS: int = 10000
@@ -0,0 +1,133 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+from pydantic import BaseModel
+
+from app.core.vector_db import get_collection_version
+
+
+@dataclass
+class _Namespace:
+    vectors: list[np.ndarray] = field(default_factory=list)
+    payloads: list[Any] = field(default_factory=list)
+    created_at: list[float] = field(default_factory=list)
+    matrix: np.ndarray | None = None
+
+
+def answer_cache_namespace(endpoint: str, body: BaseModel) -> str:
+    """Answers are only shared between requests with the same endpoint and options."""
+    return f"{endpoint}:{body.model_dump_json(exclude={'question'})}"
+
+
+class SemanticAnswerCache:
+    """Cache of generated answers looked up by cosine similarity of the question embedding.
+
+    A lookup hits when a cached question of the same namespace is at least ``threshold``
+    similar to the new one. Entries expire after ``ttl_seconds``, the oldest ones are
+    evicted past ``max_entries`` across all namespaces, and everything is dropped as soon
+    as the indexed collection changes since cached answers may then miss new context.
+
+    Callers take ``version()`` before retrieving the context of an answer and pass it to
+    ``store``, which skips answers generated from a collection that changed meanwhile.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._namespaces: dict[str, _Namespace] = {}
+        self._entries = 0
+        self._collection_version = get_collection_version()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_collection_version(self) -> None:
+        version = get_collection_version()
+        if version != self._collection_version:
+            self._namespaces.clear()
+            self._entries = 0
+            self._collection_version = version
+            self.invalidations += 1
+
+    def version(self) -> int:
+        """Version of the collection the cached answers were generated from."""
+        self._check_collection_version()
+        return self._collection_version
+
+    def _drop_oldest(self, namespace: _Namespace, drop: int) -> None:
+        del namespace.vectors[:drop]
+        del namespace.payloads[:drop]
+        del namespace.created_at[:drop]
+        namespace.matrix = None
+        self._entries -= drop
+
+    def _evict_overflow(self) -> None:
+        # The oldest entry of the whole cache is the oldest one of some namespace
+        while self._entries > self.max_entries:
+            key = min(self._namespaces, key=lambda key: self._namespaces[key].created_at[0])
+            namespace = self._namespaces[key]
+            self._drop_oldest(namespace, 1)
+            if not namespace.created_at:
+                del self._namespaces[key]
+
+    def _expire(self, namespace: _Namespace) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = 0
+        while expired < len(namespace.created_at) and namespace.created_at[expired] < cutoff:
+            expired += 1
+        if expired:
+            self._drop_oldest(namespace, expired)
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, namespace_key: str, embedding) -> Any | None:
+        self._check_collection_version()
+        namespace = self._namespaces.get(namespace_key)
+        if namespace is not None:
+            self._expire(namespace)
+        if namespace is None or not namespace.vectors:
+            self._namespaces.pop(namespace_key, None)
+            self.misses += 1
+            return None
+
+        if namespace.matrix is None:
+            namespace.matrix = np.vstack(namespace.vectors)
+        similarities = namespace.matrix @ self._normalize(embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return namespace.payloads[best]
+
+    def store(self, namespace_key: str, embedding, payload: Any, version: int) -> bool:
+        """Cache an answer generated at collection ``version``; False if it is stale."""
+        if self.version() != version:
+            return False
+        namespace = self._namespaces.setdefault(namespace_key, _Namespace())
+        self._expire(namespace)
+        namespace.vectors.append(self._normalize(embedding))
+        namespace.payloads.append(payload)
+        namespace.created_at.append(time.monotonic())
+        namespace.matrix = None
+        self._entries += 1
+        self._evict_overflow()
+        return True
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "namespaces": len(self._namespaces),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
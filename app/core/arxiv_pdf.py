@@ -0,0 +1,151 @@
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+import time
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import httpx
+from loguru import logger
+
+from app.config import settings
+from app.core.metadata_filters import to_timestamp
+from app.core.pdf import extract_document_pages, run_in_pdf_pool
+from app.schemas.data_fetcher import Article
+
+# New-style (2401.01234v2) and old-style (hep-th/9901001v1) identifiers
+_ARXIV_URL_ID_RE = re.compile(r"/(?:abs|pdf)/((?:[a-z\-]+(?:\.[A-Z]{2})?/)?\d{4,7}(?:\.\d{4,5})?)(v\d+)?(?:\.pdf)?/?$")
+_DOWNLOAD_BLOCK_BYTES = 1 << 16
+
+
+def parse_arxiv_id(url: str) -> tuple[str, str] | None:
+    """(identifier, version) of an arXiv abs/pdf URL; the version is "" when the URL has none."""
+    match = _ARXIV_URL_ID_RE.search(url)
+    if match is None:
+        return None
+    return match.group(1), match.group(2) or ""
+
+
+class ArxivPdfFetcher:
+    """Downloads arXiv PDFs through one bounded HTTP connection pool into a local cache.
+
+    The cache is addressed by arXiv identifier and version (a version never changes), so
+    a paper is downloaded once across ingestions and concurrent requests for the same
+    paper share one download. A URL without a version points to the latest one: its
+    ``latest`` cache entry is downloaded again once older than the article's ``updated``
+    date or than ``latest_ttl_seconds``. PDFs are fetched from ``base_url`` when given: an
+    ``http(s)://`` mirror or a ``file://`` directory holding ``<id><version>.pdf`` files
+    (old-style ids with their "/" replaced by "_"), e.g. a local stand-in for tests.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = settings.ARXIV_PDF_CACHE_DIR,
+        base_url: str = settings.ARXIV_PDF_BASE_URL,
+        max_connections: int = settings.ARXIV_PDF_DOWNLOAD_CONCURRENCY,
+        timeout_seconds: float = settings.ARXIV_PDF_TIMEOUT_SECONDS,
+        latest_ttl_seconds: float = settings.ARXIV_PDF_LATEST_TTL_SECONDS,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.latest_ttl_seconds = latest_ttl_seconds
+        self.base_url = base_url.rstrip("/")
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            # Waiting for a connection is bounded by the semaphore, not timed out
+            timeout=httpx.Timeout(timeout_seconds, pool=None),
+            follow_redirects=True,
+        )
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._downloads: dict[str, asyncio.Future] = {}
+        self.downloaded = 0
+        self.cache_hits = 0
+
+    async def __aenter__(self) -> "ArxivPdfFetcher":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def cache_path(self, arxiv_id: str, version: str) -> str:
+        return os.path.join(self.cache_dir, arxiv_id.replace("/", "_"), f"{version or 'latest'}.pdf")
+
+    def is_cached(self, path: str, article: Article, version: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        if version:
+            return True
+        cached_at = os.path.getmtime(path)
+        if article.updated is not None and cached_at < to_timestamp(article.updated):
+            return False
+        return time.time() - cached_at < self.latest_ttl_seconds
+
+    def source_url(self, article: Article, arxiv_id: str, version: str) -> str:
+        if not self.base_url:
+            return article.pdf_url
+        return f"{self.base_url}/{arxiv_id.replace('/', '_') if self.base_url.startswith('file:') else arxiv_id}{version}.pdf"
+
+    async def fetch(self, article: Article) -> str:
+        """Path of the cached PDF of ``article``, downloaded first when missing."""
+        parsed = parse_arxiv_id(article.pdf_url)
+        if parsed is None:
+            raise ValueError(f"Not an arXiv URL: {article.pdf_url}")
+        path = self.cache_path(*parsed)
+        if self.is_cached(path, article, parsed[1]):
+            self.cache_hits += 1
+            return path
+        download = self._downloads.get(path)
+        if download is None:
+            download = asyncio.ensure_future(self._download(self.source_url(article, *parsed), path))
+            self._downloads[path] = download
+            download.add_done_callback(lambda _: self._downloads.pop(path, None))
+        # shield: a cancelled waiter must not abort the download other waiters share
+        await asyncio.shield(download)
+        return path
+
+    async def _download(self, url: str, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        async with self._semaphore:
+            await self._download_to(url, path)
+
+    async def _download_to(self, url: str, path: str) -> None:
+        fd, tmp = tempfile.mkstemp(suffix=".part", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if url.startswith("file:"):
+                    with open(url2pathname(urlparse(url).path), "rb") as source:
+                        await asyncio.to_thread(shutil.copyfileobj, source, out)
+                else:
+                    async with self._client.stream("GET", url) as response:
+                        response.raise_for_status()
+                        async for block in response.aiter_bytes(_DOWNLOAD_BLOCK_BYTES):
+                            await asyncio.to_thread(out.write, block)
+            with open(tmp, "rb") as f:
+                # arXiv answers with an HTML page while a PDF is still being generated
+                if f.read(5) != b"%PDF-":
+                    raise ValueError(f"{url} did not return a PDF")
+            os.replace(tmp, path)
+            self.downloaded += 1
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+
+async def fetch_full_texts(articles: list[Article], fetcher: ArxivPdfFetcher) -> list[list[tuple[int | None, str]] | None]:
+    """Pages of each article's PDF, downloaded concurrently and extracted in the PDF
+    process pool; None for the articles whose PDF could not be fetched or read."""
+
+    async def full_text(article: Article) -> list[tuple[int | None, str]] | None:
+        try:
+            path = await fetcher.fetch(article)
+            _, pages = await run_in_pdf_pool(extract_document_pages, path)
+            return pages
+        except Exception as e:
+            logger.warning(f"Indexing the abstract only of '{article.title}', no full text: {e}")
+            return None
+
+    return await asyncio.gather(*(full_text(article) for article in articles))
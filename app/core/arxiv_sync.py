@@ -0,0 +1,164 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from langchain_core.vectorstores import VectorStore
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.data_fetcher import article_arxiv_id, article_sort_date
+from app.core.ingestion import ingest_arxiv_query
+from app.core.sparse_index import BM25Index
+from app.models.arxiv_sync import ArxivSyncTopic as ArxivSyncTopicRow
+from app.schemas.data_fetcher import ArticleStoreStats, ArxivSyncResult, ArxivSyncTopic, ArxivSyncTopicRequest
+from app.utils.db import AsyncSessionLocal
+
+
+def topic_key(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _as_utc(date: datetime) -> datetime:
+    return date.replace(tzinfo=timezone.utc) if date.tzinfo is None else date.astimezone(timezone.utc)
+
+
+def _utcnow() -> datetime:
+    # last_synced_at is a naive UTC column
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def upsert_sync_topic(db: AsyncSession, request: ArxivSyncTopicRequest) -> ArxivSyncTopic:
+    """Track a query, or update its settings; the watermark of a tracked query is kept."""
+    row = await db.get(ArxivSyncTopicRow, topic_key(request.query))
+    if row is None:
+        row = ArxivSyncTopicRow(key=topic_key(request.query), last_fetched=0)
+        db.add(row)
+    elif row.sort_criterion != request.sort_criterion:
+        # The watermark is a date of the previous sort order
+        row.watermark_date = row.watermark_arxiv_id = None
+    row.query = request.query
+    row.sort_criterion = request.sort_criterion
+    row.max_results = request.max_results
+    row.full_text = request.full_text
+    row.enabled = request.enabled
+    await db.commit()
+    return ArxivSyncTopic.model_validate(row)
+
+
+async def list_sync_topics(db: AsyncSession, enabled_only: bool = False) -> list[ArxivSyncTopic]:
+    query = select(ArxivSyncTopicRow).order_by(ArxivSyncTopicRow.key)
+    if enabled_only:
+        query = query.where(ArxivSyncTopicRow.enabled.is_(True))
+    return [ArxivSyncTopic.model_validate(row) for row in (await db.execute(query)).scalars()]
+
+
+async def delete_sync_topic(db: AsyncSession, query: str) -> bool:
+    row = await db.get(ArxivSyncTopicRow, topic_key(query))
+    if row is None:
+        return False
+    await db.delete(row)
+    await db.commit()
+    return True
+
+
+async def sync_arxiv_topic(topic: ArxivSyncTopic, vector_store: VectorStore, sparse_index: BM25Index | None = None) -> ArxivSyncResult:
+    """Fetch, store and index the articles of a tracked query newer than its watermark,
+    then move the watermark to the newest of them.
+
+    The first sync of a query fetches its ``max_results`` newest articles. The watermark
+    only moves once the delta is stored and indexed, so a failed sync is retried in full;
+    a store that accounted for fewer articles than were fetched counts as a failure.
+    """
+    started = time.perf_counter()
+    result = ArxivSyncResult(query=topic.query, watermark_date=topic.watermark_date, watermark_arxiv_id=topic.watermark_arxiv_id)
+    newer_than = None
+    if topic.watermark_date is not None:
+        newer_than = (_as_utc(topic.watermark_date), topic.watermark_arxiv_id)
+    try:
+        response = await ingest_arxiv_query(
+            topic.query, topic.max_results, topic.sort_criterion, vector_store,
+            sparse_index=sparse_index, full_text=topic.full_text, newer_than=newer_than,
+        )
+        result.fetched = len(response.fetched_articles)
+        result.indexing_stats = response.indexing_stats
+        result.storage_stats = response.storage_stats
+        storage_stats = response.storage_stats or ArticleStoreStats()
+        stored = storage_stats.inserted + storage_stats.skipped
+        if stored < len(response.fetched_articles):
+            raise RuntimeError(f"Only {stored} of {len(response.fetched_articles)} fetched articles were stored")
+        if response.fetched_articles:
+            newest = max(response.fetched_articles, key=lambda article: _as_utc(article_sort_date(article, topic.sort_criterion)))
+            newest_date = _as_utc(article_sort_date(newest, topic.sort_criterion))
+            if newer_than is None or newest_date >= newer_than[0]:
+                result.watermark_date, result.watermark_arxiv_id = newest_date, article_arxiv_id(newest)
+    except Exception as e:
+        logger.error(f"arXiv sync of '{topic.query}' failed: {e}")
+        result.error = str(e)
+    result.seconds = round(time.perf_counter() - started, 3)
+
+    try:
+        async with AsyncSessionLocal() as db:
+            row = await db.get(ArxivSyncTopicRow, topic_key(topic.query))
+            if row is not None:
+                row.watermark_date = result.watermark_date
+                row.watermark_arxiv_id = result.watermark_arxiv_id
+                row.last_synced_at = _utcnow()
+                row.last_fetched = result.fetched
+                row.last_error = result.error
+                await db.commit()
+    except Exception as e:
+        logger.warning(f"Could not save the arXiv sync watermark of '{topic.query}': {e}")
+    logger.info(f"arXiv sync of '{topic.query}': {result.fetched} new articles in {result.seconds}s")
+    return result
+
+
+class ArxivSyncScheduler:
+    """Runs the incremental sync of every enabled topic every ``interval_seconds``.
+
+    Topics are synced one after the other: they share the rate-limited arXiv client
+    anyway. A sync requested through the API waits for a scheduled run in progress
+    rather than running alongside it.
+    """
+
+    def __init__(self, resources, interval_seconds: float = settings.ARXIV_SYNC_INTERVAL_SECONDS) -> None:
+        self.resources = resources
+        self.interval_seconds = interval_seconds
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.last_run_at: datetime | None = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def sync(self, query: str | None = None) -> list[ArxivSyncResult]:
+        """Sync one tracked query, or all the enabled ones."""
+        async with self._lock:
+            async with AsyncSessionLocal() as db:
+                topics = await list_sync_topics(db, enabled_only=query is None)
+            if query is not None:
+                topics = [topic for topic in topics if topic_key(topic.query) == topic_key(query)]
+            results = []
+            for topic in topics:
+                results.append(await sync_arxiv_topic(topic, self.resources.vector_store, self.resources.sparse_index))
+            self.last_run_at = datetime.now(timezone.utc)
+            return results
+
+    async def _run_periodically(self) -> None:
+        while self.resources.vector_store is None or not self.resources.db_ready:
+            await asyncio.sleep(settings.BACKEND_CONNECT_RETRY_SECONDS)
+        while True:
+            try:
+                results = await self.sync()
+                if results:
+                    logger.info(f"arXiv sync: {sum(r.fetched for r in results)} new articles over {len(results)} topics")
+            except Exception as e:
+                logger.error(f"Scheduled arXiv sync failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
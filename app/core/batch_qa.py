@@ -0,0 +1,136 @@
+import asyncio
+import time
+from typing import AsyncIterator
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_openai import ChatOpenAI
+from loguru import logger
+
+from app.config import settings
+from app.core.answer_cache import SemanticAnswerCache, answer_cache_namespace
+from app.core.context_builder import ContextBuilder
+from app.core.kg_graph import KGGraph
+from app.core.metadata_filters import build_where
+from app.core.prompts import ANSWER_PROMPT, get_prompt_template
+from app.core.rag import build_context
+from app.core.reranker import CrossEncoderReranker
+from app.core.retrieval import RetrievalResult, retrieve
+from app.core.sparse_index import BM25Index
+from app.core.vector_db import embed_questions, retrieved_chunk_id, search_by_vectors
+from app.schemas.rag import AnswerToQuestion, BatchAnswer, QuestionForDocs, QuestionsForDocs, _parse_final_answer
+
+
+def _resolved(value):
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(value)
+    return future
+
+
+async def iter_batch_answers(
+    body: QuestionsForDocs,
+    vector_store: VectorStore,
+    embedder: Embeddings,
+    llm: ChatOpenAI,
+    context_builder: ContextBuilder,
+    answer_cache: SemanticAnswerCache | None = None,
+    sparse_index: BM25Index | None = None,
+    reranker: CrossEncoderReranker | None = None,
+    kg_graph: KGGraph | None = None,
+    top_k: int = settings.TOP_K_RETRIEVE,
+    concurrency: int = settings.BATCH_QA_CONCURRENCY,
+) -> AsyncIterator[BatchAnswer]:
+    """Answer a batch of questions, yielding each answer as soon as it is generated.
+
+    All questions are embedded in one forward pass. In dense mode a single multi-query
+    search serves the whole batch and chunks shared by several questions are fetched
+    once; other modes run their own retrieval per question on the shared embeddings.
+    At most ``concurrency`` questions are retrieved for and sent to the LLM at a time.
+    Answers are looked up in and stored to the cache of ``/answer-question``.
+    """
+    started = time.perf_counter()
+    questions = body.questions
+    reranker = reranker if body.rerank else None
+    namespace = answer_cache_namespace(
+        "answer-question", QuestionForDocs(question="", retrieval_mode=body.retrieval_mode, rerank=body.rerank, filters=body.filters)
+    )
+    where = build_where(body.filters)
+
+    t0 = time.perf_counter()
+    embeddings = await asyncio.to_thread(embed_questions, embedder, questions)
+    embed_ms = round((time.perf_counter() - t0) * 1000, 2)
+
+    cached = {}
+    cache_version = answer_cache.version() if answer_cache is not None else None
+    if answer_cache is not None:
+        for i, embedding in enumerate(embeddings):
+            hit = answer_cache.lookup(namespace, embedding)
+            if hit is not None:
+                cached[i] = hit
+
+    shared_hits: dict[int, list] = {}
+    search_ms = 0.0
+    if body.retrieval_mode == "dense":
+        pending = [i for i in range(len(questions)) if i not in cached]
+        k = max(top_k, settings.RERANK_CANDIDATES) if reranker is not None else top_k
+        t0 = time.perf_counter()
+        hits = await asyncio.to_thread(search_by_vectors, vector_store, [embeddings[i] for i in pending], k, where)
+        search_ms = round((time.perf_counter() - t0) * 1000, 2)
+        shared_hits = dict(zip(pending, hits))
+        retrieved = sum(len(h) for h in hits)
+        unique = len({retrieved_chunk_id(doc) for h in hits for doc, _ in h})
+        logger.debug(f"Multi-query search for {len(pending)} questions: {retrieved} hits, {unique} distinct chunks in {search_ms}ms")
+
+    template = get_prompt_template(ANSWER_PROMPT)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer(i: int) -> BatchAnswer:
+        question = questions[i]
+        t_start = time.perf_counter()
+        if i in cached:
+            return BatchAnswer(index=i, question=question, answer=AnswerToQuestion(**cached[i]), cached=True, latency_ms=0.0)
+        async with semaphore:
+            try:
+                if i in shared_hits:
+                    retrieval = RetrievalResult(documents=shared_hits[i], timings={"embed_ms": embed_ms, "dense_ms": search_ms})
+                    if reranker is not None:
+                        t0 = time.perf_counter()
+                        retrieval.documents, retrieval.reranked = await asyncio.to_thread(reranker.rerank, question, retrieval.documents, top_k)
+                        if retrieval.reranked:
+                            retrieval.score_kind = "relevance"
+                        retrieval.timings["rerank_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+                else:
+                    retrieval = await retrieve(
+                        question, vector_store, mode=body.retrieval_mode, top_k=top_k, sparse_index=sparse_index,
+                        reranker=reranker, kg_graph=kg_graph, query_embedding=_resolved(embeddings[i]), where=where,
+                    )
+                context = await build_context(retrieval, context_builder)
+                t0 = time.perf_counter()
+                response = await llm.ainvoke(template.render(question=question, context=context))
+                retrieval.timings["llm_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+                result = _parse_final_answer(response.content)
+                if answer_cache is not None:
+                    answer_cache.store(namespace, embeddings[i], result.model_dump(exclude={"retrieval_timings", "context_stats"}), cache_version)
+                result.retrieval_timings = retrieval.timings
+                result.context_stats = retrieval.context_stats
+                return BatchAnswer(index=i, question=question, answer=result, latency_ms=round((time.perf_counter() - t_start) * 1000, 2))
+            except Exception as e:
+                logger.warning(f"Batch question {i} failed: {e}")
+                return BatchAnswer(index=i, question=question, error=str(e), latency_ms=round((time.perf_counter() - t_start) * 1000, 2))
+
+    tasks = [asyncio.ensure_future(answer(i)) for i in range(len(questions))]
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            failed += result.error is not None
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Answered {len(questions)} questions ({len(cached)} cached, {failed} failed) in {elapsed:.2f}s "
+        f"({len(questions) / elapsed:.2f} questions/s, embedding {embed_ms}ms, search {search_ms}ms)"
+    )
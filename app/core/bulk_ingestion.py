@@ -0,0 +1,339 @@
+import asyncio
+import hashlib
+import os
+import posixpath
+import tarfile
+import time
+import zipfile
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator
+
+from langchain_core.documents.base import Document
+from langchain_core.vectorstores import VectorStore
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from loguru import logger
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import settings
+from app.core.pdf import extract_document_pages, run_in_pdf_pool
+from app.core.rag import index_documents_batched, split_document_pages
+from app.core.sparse_index import BM25Index
+from app.core.vector_db import delete_documents_where, run_in_ingestion_executor
+from app.models.documents import IndexedDocument
+from app.schemas.rag import BulkDocumentResult, BulkIngestionReport
+from app.utils.db import AsyncSessionLocal
+
+DOCUMENT_EXTENSIONS = (".pdf", ".txt")
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+_HASH_READ_BYTES = 1 << 20
+_EXTRACT_READ_BYTES = 1 << 20
+
+
+class ArchiveTooLarge(Exception):
+    """Raised when an archive holds more files or bytes than the extraction limits."""
+
+
+@dataclass
+class LocalDocument:
+    """A document file on disk; ``path`` is its name in the manifest."""
+    path: str
+    file_path: str
+    size_bytes: int = 0
+    content_hash: str | None = None
+
+
+def is_archive(name: str) -> bool:
+    return name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def is_document(name: str) -> bool:
+    return name.lower().endswith(DOCUMENT_EXTENSIONS)
+
+
+def unique_document_name(name: str, taken: set[str]) -> str:
+    """``name``, or ``name`` with a " (n)" suffix before its extension when already taken."""
+    unique, n = name, 1
+    while unique in taken:
+        n += 1
+        stem, extension = posixpath.splitext(name)
+        if stem.lower().endswith(".tar"):
+            stem, extension = stem[:-4], stem[-4:] + extension
+        unique = f"{stem} ({n}){extension}"
+    taken.add(unique)
+    return unique
+
+
+def _safe_member_path(name: str) -> str | None:
+    # Archive members are written under the extraction directory only
+    path = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+    if path.startswith("..") or not is_document(path):
+        return None
+    return path
+
+
+def extract_archive(
+    archive_path: str,
+    destination: str,
+    prefix: str = "",
+    max_members: int = settings.ARCHIVE_MAX_MEMBERS,
+    max_bytes: int = settings.ARCHIVE_MAX_EXTRACTED_BYTES,
+) -> list[LocalDocument]:
+    """Extract the PDF and text files of a zip or tar archive; other members are ignored.
+
+    Raises ``ArchiveTooLarge`` past ``max_members`` files or ``max_bytes`` extracted: the
+    declared member sizes are checked first, then the bytes actually written, since a
+    crafted archive can understate them.
+    """
+    documents = []
+    members = 0
+    extracted = 0
+
+    def write(name: str, size: int, source) -> None:
+        nonlocal members, extracted
+        members += 1
+        if members > max_members:
+            raise ArchiveTooLarge(f"{prefix or archive_path} holds more than {max_members} files")
+        path = _safe_member_path(name)
+        if path is None:
+            return
+        if extracted + size > max_bytes:
+            raise ArchiveTooLarge(f"{prefix or archive_path} extracts to more than {max_bytes} bytes")
+        target = os.path.join(destination, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as out:
+            while block := source.read(_EXTRACT_READ_BYTES):
+                extracted += len(block)
+                if extracted > max_bytes:
+                    raise ArchiveTooLarge(f"{prefix or archive_path} extracts to more than {max_bytes} bytes")
+                out.write(block)
+        documents.append(LocalDocument(path=posixpath.join(prefix, path), file_path=target))
+
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for member in archive.infolist():
+                if not member.is_dir():
+                    with archive.open(member) as source:
+                        write(member.filename, member.file_size, source)
+    else:
+        with tarfile.open(archive_path) as archive:
+            for member in archive:
+                if member.isfile():
+                    write(member.name, member.size, archive.extractfile(member))
+    return documents
+
+
+def collect_documents(paths: list[str], extraction_dir: str) -> list[LocalDocument]:
+    """Documents under the given files, directories and archives, named relative to them.
+
+    Archives are extracted into ``extraction_dir``, which the caller removes.
+    """
+    documents = []
+
+    def add(file_path: str, name: str) -> None:
+        if is_archive(name):
+            destination = os.path.join(extraction_dir, str(len(os.listdir(extraction_dir))))
+            documents.extend(extract_archive(file_path, destination, prefix=name))
+        elif is_document(name):
+            documents.append(LocalDocument(path=name, file_path=file_path))
+
+    for path in paths:
+        if os.path.isdir(path):
+            root = os.path.abspath(path)
+            for directory, _, files in os.walk(root):
+                for file_name in sorted(files):
+                    file_path = os.path.join(directory, file_name)
+                    add(file_path, os.path.relpath(file_path, os.path.dirname(root)).replace(os.sep, "/"))
+        else:
+            add(path, os.path.basename(path))
+    return documents
+
+
+def hash_file(file_path: str) -> tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(file_path, "rb") as f:
+        while block := f.read(_HASH_READ_BYTES):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+async def load_manifest(documents: list[LocalDocument]) -> tuple[dict[str, str], dict[str, str]]:
+    """Content hash of the known paths, and a known path for each known content hash."""
+    paths = [document.path for document in documents]
+    hashes = [document.content_hash for document in documents]
+    by_path: dict[str, str] = {}
+    by_hash: dict[str, str] = {}
+    try:
+        async with AsyncSessionLocal() as db:
+            for start in range(0, len(paths), 1000):
+                rows = (await db.execute(
+                    select(IndexedDocument.path, IndexedDocument.content_hash).where(or_(
+                        IndexedDocument.path.in_(paths[start:start + 1000]),
+                        IndexedDocument.content_hash.in_(hashes[start:start + 1000]),
+                    ))
+                )).all()
+                for path, content_hash in rows:
+                    by_path[path] = content_hash
+                    by_hash.setdefault(content_hash, path)
+    except Exception as e:
+        logger.warning(f"Could not read the document manifest, every document will be processed: {e}")
+    return by_path, by_hash
+
+
+async def save_manifest(results: list[tuple[LocalDocument, BulkDocumentResult]]) -> None:
+    if not results:
+        return
+    # indexed_at is a naive UTC column
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # One row per path: an INSERT ... ON CONFLICT DO UPDATE cannot touch a row twice
+    rows = list({
+        document.path: {
+            "path": document.path,
+            "content_hash": document.content_hash,
+            "size_bytes": document.size_bytes,
+            "pages": result.pages,
+            "chunks": result.chunks,
+            "indexed_at": now,
+        }
+        for document, result in results
+    }.values())
+    statement = insert(IndexedDocument).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[IndexedDocument.path],
+        set_={column: statement.excluded[column] for column in ("content_hash", "size_bytes", "pages", "chunks", "indexed_at")},
+    )
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(statement)
+            await db.commit()
+    except Exception as e:
+        logger.warning(f"Could not update the document manifest: {e}")
+
+
+def _classify(documents: list[LocalDocument], by_path: dict[str, str], by_hash: dict[str, str], force: bool) -> Iterator[tuple[LocalDocument, BulkDocumentResult | None]]:
+    # None: the document is to be indexed
+    seen: dict[str, str] = {}
+    for document in documents:
+        status, duplicate_of = None, None
+        if document.content_hash in seen:
+            status, duplicate_of = "duplicate", seen[document.content_hash]
+        elif not force and by_path.get(document.path) == document.content_hash:
+            status = "unchanged"
+        elif not force and by_hash.get(document.content_hash, document.path) != document.path:
+            status, duplicate_of = "duplicate", by_hash[document.content_hash]
+        seen.setdefault(document.content_hash, document.path)
+        result = None
+        if status is not None:
+            result = BulkDocumentResult(path=document.path, status=status, content_hash=document.content_hash, duplicate_of=duplicate_of)
+        yield document, result
+
+
+async def ingest_local_documents(
+    documents: list[LocalDocument],
+    vector_store: VectorStore,
+    sparse_index: BM25Index | None = None,
+    force: bool = False,
+    concurrency: int = settings.BULK_INGESTION_CONCURRENCY,
+    flush_chunks: int = settings.BULK_INGESTION_FLUSH_CHUNKS,
+) -> AsyncIterator[BulkDocumentResult | BulkIngestionReport]:
+    """Index many local documents, yielding a result per document and the run report last.
+
+    Files are hashed first: those whose path and content match the ``IndexedDocument``
+    manifest, and those whose content is already indexed under another path (or earlier
+    in the run), are skipped unless ``force`` is set. The rest are extracted
+    ``concurrency`` at a time across the PDF process pool while the chunks of finished
+    documents are embedded and stored in batches of ``flush_chunks``, whatever the
+    document they come from. A document enters the manifest once all its chunks are
+    stored, so an interrupted run resumes where it stopped. The chunks of the previous
+    version of a changed document (those with its path as ``source`` and its manifest hash
+    as ``document_hash``, so never those of a single upload with the same name) are deleted
+    from the vector store and the BM25 index right before its new chunks are stored.
+    """
+    started = time.perf_counter()
+    report = BulkIngestionReport(documents=len(documents))
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=settings.CHUNKS_SIZE, chunk_overlap=200)
+
+    hashes = await asyncio.gather(*(asyncio.to_thread(hash_file, document.file_path) for document in documents))
+    for document, (content_hash, size) in zip(documents, hashes):
+        document.content_hash, document.size_bytes = content_hash, size
+    by_path, by_hash = await load_manifest(documents)
+
+    to_index: deque[LocalDocument] = deque()
+    for document, result in _classify(documents, by_path, by_hash, force):
+        if result is None:
+            to_index.append(document)
+            continue
+        report.unchanged += result.status == "unchanged"
+        report.duplicates += result.status == "duplicate"
+        yield result
+
+    async def extract(document: LocalDocument) -> tuple[LocalDocument, BulkDocumentResult, list[Document]]:
+        result = BulkDocumentResult(path=document.path, status="indexed", content_hash=document.content_hash)
+        try:
+            result.pages, pages = await run_in_pdf_pool(extract_document_pages, document.file_path)
+        except Exception as e:
+            logger.warning(f"Could not extract {document.path}: {e}")
+            result.status, result.error = "failed", str(e)
+            return document, result, []
+        splits = split_document_pages(pages, document.path, text_splitter)
+        for split in splits:
+            split.metadata["document_hash"] = document.content_hash
+        result.chunks = len(splits)
+        return document, result, splits
+
+    buffered: list[tuple[LocalDocument, BulkDocumentResult]] = []
+    chunks: list[Document] = []
+
+    async def flush() -> list[BulkDocumentResult]:
+        nonlocal buffered, chunks
+        for document, result in buffered:
+            if result.status == "indexed" and document.path in by_path:
+                previous = {"$and": [{"source": {"$eq": document.path}}, {"document_hash": {"$eq": by_path[document.path]}}]}
+                replaced = await run_in_ingestion_executor(delete_documents_where, vector_store, previous)
+                if sparse_index is not None:
+                    sparse_index.delete(replaced)
+                result.replaced_chunks = len(replaced)
+        if chunks:
+            stats = await index_documents_batched(chunks, vector_store, sparse_index=sparse_index)
+            stats.total_seconds = 0.0
+            report.stats.add(stats)
+        indexed = [(document, result) for document, result in buffered if result.status == "indexed"]
+        await save_manifest(indexed)
+        for _, result in buffered:
+            report.indexed += result.status == "indexed"
+            report.failed += result.status == "failed"
+            report.pages += result.pages or 0
+        flushed = [result for _, result in buffered]
+        buffered, chunks = [], []
+        return flushed
+
+    in_flight: deque[asyncio.Future] = deque()
+    try:
+        while to_index or in_flight:
+            while to_index and len(in_flight) < concurrency:
+                in_flight.append(asyncio.ensure_future(extract(to_index.popleft())))
+            document, result, splits = await in_flight.popleft()
+            buffered.append((document, result))
+            chunks.extend(splits)
+            if len(chunks) >= flush_chunks:
+                for flushed in await flush():
+                    yield flushed
+        for flushed in await flush():
+            yield flushed
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+    report.total_seconds = time.perf_counter() - started
+    report.stats.documents = report.indexed
+    report.stats.total_seconds = report.total_seconds
+    logger.info(
+        f"Bulk ingestion of {report.documents} documents: {report.indexed} indexed, {report.unchanged} unchanged, "
+        f"{report.duplicates} duplicates, {report.failed} failed in {report.total_seconds:.2f}s "
+        f"({report.documents_per_second} docs/s, {report.chunks_per_second} chunks/s)"
+    )
+    yield report
@@ -0,0 +1,218 @@
+import re
+import threading
+from dataclasses import dataclass
+
+from langchain_core.documents.base import Document
+from loguru import logger
+
+from app.config import settings
+from app.schemas.rag import ContextStats
+
+_ARXIV_ID_RE = re.compile(r"arxiv\.org/(?:abs|pdf)/([^/?#]+?)(?:\.pdf)?/?$")
+# Shortest shared span taken for a splitter overlap rather than a coincidence
+_MIN_OVERLAP_CHARS = 20
+# A chunk is cut to the remaining budget only if that leaves it this many tokens
+_MIN_TRUNCATED_TOKENS = 50
+# Share of the budget the knowledge graph triples may take
+_GRAPH_FACTS_BUDGET_SHARE = 0.25
+_GAP_MARKER = "\n[...]\n"
+_CHUNKS_OPEN, _CHUNKS_CLOSE = "<retrieved_chunks>\n", "\n</retrieved_chunks>"
+
+
+class TokenCounter:
+    """Counts tokens with the tiktoken encoding of the configured model.
+
+    The encoding files are downloaded on first use; when that fails (no network),
+    tokens are estimated at 4 characters each so that budgets still apply.
+    """
+
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                import tiktoken
+
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model_name)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                logger.warning(f"No tiktoken encoding for {self.model_name}, estimating tokens from characters: {e}")
+            self._loaded = True
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        self.load()
+        if self._encoding is None:
+            return -(-len(text) // 4)
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        self.load()
+        if self._encoding is None:
+            cut = text[:max_tokens * 4]
+            return cut[:cut.rfind(" ")] if " " in cut else cut
+        return self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def merge_overlapping(left: str, right: str, min_overlap: int = _MIN_OVERLAP_CHARS) -> str | None:
+    """``left`` followed by ``right`` without the span they share, or None when ``right``
+    does not start with a suffix of ``left``."""
+    if len(right) < min_overlap:
+        return None
+    probe = right[:min_overlap]
+    start = left.find(probe, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return left + right[len(left) - start:]
+        start = left.find(probe, start + 1)
+    return None
+
+
+def _verbose_chunk(rank: int, doc: Document, score: float) -> str:
+    # Layout used before the context was compacted, kept as the baseline of saved_tokens
+    metadata = doc.metadata
+    return (
+        f"[CHUNK_{rank}]\n"
+        f"Paper URL: {metadata.get('URL', 'N/A')}\n"
+        f"Title: {metadata.get('title', 'N/A')}\n"
+        f"Year: {str(metadata.get('publication_date', 'N/A'))}\n"
+        f"Content: {doc.page_content}\n"
+        f"Relevance Score: {round(score, 4)}"
+    )
+
+
+def paper_header(metadata: dict) -> str:
+    """One-line reference of the paper a chunk comes from: title, year and arXiv id."""
+    details = []
+    year = str(metadata.get("publication_date") or "")[:4]
+    if year.isdigit():
+        details.append(year)
+    url = metadata.get("URL")
+    if url:
+        match = _ARXIV_ID_RE.search(url)
+        details.append(f"arXiv:{match.group(1)}" if match else url)
+    title = metadata.get("title") or metadata.get("source") or "Untitled"
+    return f"{title} ({', '.join(details)})" if details else title
+
+
+@dataclass
+class _Passage:
+    chunk_index: int | None
+    rank: int
+    text: str
+
+
+class ContextBuilder:
+    """Assembles retrieved chunks into a compact, token-budgeted LLM context.
+
+    Chunks are taken best first until ``budget_tokens`` is spent. Repeated chunks are
+    dropped, chunks of the same paper are grouped under a single header and put back
+    in document order, and the span two consecutive chunks share (the splitter
+    overlap) is sent once.
+    """
+
+    def __init__(self, budget_tokens: int, model_name: str) -> None:
+        self.budget_tokens = budget_tokens
+        self.counter = TokenCounter(model_name)
+        self._lock = threading.Lock()
+        self.contexts = 0
+        self.raw_tokens = 0
+        self.context_tokens = 0
+
+    def _graph_block(self, graph_facts: list[str], budget: int) -> str:
+        lines, used = [], 0
+        for fact in graph_facts:
+            cost = self.counter.count(fact + "\n")
+            if used + cost > budget:
+                break
+            lines.append(fact)
+            used += cost
+        return "<knowledge_graph>\n" + "\n".join(lines) + "\n</knowledge_graph>" if lines else ""
+
+    def build(self, documents: list[tuple[Document, float]], graph_facts: list[str] | None = None, budget_tokens: int | None = None) -> tuple[str, ContextStats]:
+        budget = self.budget_tokens if budget_tokens is None else budget_tokens
+        stats = ContextStats(chunks=len(documents), budget_tokens=budget)
+        raw_context = "\n\n".join(_verbose_chunk(i, doc, score) for i, (doc, score) in enumerate(documents, start=1))
+        if graph_facts:
+            raw_context += "\n" + "\n".join(graph_facts)
+        stats.raw_tokens = self.counter.count(raw_context)
+
+        graph_block = self._graph_block(graph_facts or [], int(budget * _GRAPH_FACTS_BUDGET_SHARE))
+        remaining = budget - self.counter.count(graph_block) - self.counter.count(_CHUNKS_OPEN + _CHUNKS_CLOSE)
+        separator_cost = self.counter.count(_GAP_MARKER)
+
+        papers: dict[str, tuple[str, list[_Passage]]] = {}
+        kept: list[str] = []
+        for rank, (doc, _) in enumerate(documents):
+            text = doc.page_content.strip()
+            normalized = " ".join(text.split())
+            if not normalized or any(normalized in other for other in kept):
+                continue
+            key = doc.metadata.get("URL") or doc.metadata.get("title") or doc.metadata.get("source") or ""
+            header = papers[key][0] if key in papers else f"[P{len(papers) + 1}] {paper_header(doc.metadata)}"
+            # Upper bound: sharing an overlap with a neighbour only makes the chunk cheaper
+            overhead = separator_cost + (0 if key in papers else self.counter.count(header))
+            cost = self.counter.count(text) + overhead
+            if cost > remaining:
+                stats.truncated = True
+                room = remaining - overhead
+                if room < _MIN_TRUNCATED_TOKENS:
+                    continue
+                text = self.counter.truncate(text, room)
+                cost = remaining
+            kept.append(normalized)
+            papers.setdefault(key, (header, []))[1].append(_Passage(doc.metadata.get("chunk_index"), rank, text))
+            remaining -= cost
+
+        blocks = []
+        for header, passages in papers.values():
+            passages.sort(key=lambda p: (p.chunk_index is None, p.chunk_index if p.chunk_index is not None else p.rank))
+            parts = [passages[0].text]
+            for passage in passages[1:]:
+                merged = merge_overlapping(parts[-1], passage.text)
+                if merged is None:
+                    parts.append(passage.text)
+                else:
+                    parts[-1] = merged
+            blocks.append(header + "\n" + _GAP_MARKER.join(parts))
+
+        context = _CHUNKS_OPEN + "\n\n".join(blocks) + _CHUNKS_CLOSE
+        if graph_block:
+            context += "\n" + graph_block
+        stats.used_chunks = len(kept)
+        stats.papers = len(papers)
+        stats.context_tokens = self.counter.count(context)
+        with self._lock:
+            self.contexts += 1
+            self.raw_tokens += stats.raw_tokens
+            self.context_tokens += stats.context_tokens
+        return context, stats
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model": self.counter.model_name,
+                "exact_token_counts": self.counter.exact,
+                "budget_tokens": self.budget_tokens,
+                "contexts": self.contexts,
+                "raw_tokens": self.raw_tokens,
+                "context_tokens": self.context_tokens,
+                "saved_tokens": self.raw_tokens - self.context_tokens,
+            }
+
+
+def load_context_builder() -> ContextBuilder:
+    builder = ContextBuilder(settings.CONTEXT_TOKEN_BUDGET, settings.OPENAI_MODEL)
+    builder.counter.load()
+    return builder
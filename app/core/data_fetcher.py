@@ -1,69 +1,205 @@
-from typing import List
+import asyncio
+import base64
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, List
+from uuid import UUID
 import pandas as pd
 import arxiv
-from app.schemas.data_fetcher import Article, FetchArxivArticleResponse
-from app.utils.db import SessionLocal
+from loguru import logger
+from app.schemas.data_fetcher import Article, ArticleFilters, ArticlePage, ArticleStoreStats, FetchArxivArticleResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.db import AsyncSessionLocal
 from app.utils.cruds import article_crud
 from  app.schemas.data_fetcher import ArticleInDB
+from app.config import settings
+from app.core.arxiv_pdf import parse_arxiv_id
 
 
-async def fetch_articles_by_query(query:str="LLM",max_results:int=10,sort_criterion: arxiv.SortCriterion = arxiv.SortCriterion.SubmittedDate ) -> FetchArxivArticleResponse:
-  """search for articles in arxiv
-  """
-  articles : List[Article] = []
+# One client for the whole process: arXiv asks for a pause between requests, which the
+# client enforces only among the calls it serves itself
+_arxiv_client = arxiv.Client(
+  page_size=settings.ARXIV_PAGE_SIZE,
+  delay_seconds=settings.ARXIV_DELAY_SECONDS,
+  num_retries=settings.ARXIV_NUM_RETRIES,
+)
+_arxiv_client_lock = threading.Lock()
+# Paging arXiv blocks a thread for minutes; it gets its own pool so that it does not
+# hold the threads of the default executor used by the rest of the app
+_arxiv_fetch_executor = ThreadPoolExecutor(
+  max_workers=settings.ARXIV_FETCH_WORKERS,
+  thread_name_prefix="arxiv-fetch",
+)
+
+
+def to_sort_criterion(sort_criterion: str | arxiv.SortCriterion) -> arxiv.SortCriterion:
+  if isinstance(sort_criterion, arxiv.SortCriterion):
+    return sort_criterion
+  return arxiv.SortCriterion[sort_criterion]
 
-  client = arxiv.Client()
 
+def article_arxiv_id(article: Article) -> str | None:
+  """arXiv identifier of an article, without its version."""
+  parsed = parse_arxiv_id(article.pdf_url)
+  return parsed[0] if parsed is not None else None
+
+
+def article_sort_date(article: Article, sort_criterion: str | arxiv.SortCriterion) -> datetime:
+  """Date the articles are ordered by under ``sort_criterion``, newest first."""
+  if to_sort_criterion(sort_criterion) == arxiv.SortCriterion.LastUpdatedDate and article.updated is not None:
+    return article.updated
+  return article.published
+
+
+def _search_arxiv(query: str, max_results: int, sort_criterion: str | arxiv.SortCriterion):
   search = arxiv.Search(
     query = query,
     max_results = max_results,
-    sort_by =  arxiv.SortCriterion.Relevance 
+    sort_by = to_sort_criterion(sort_criterion),
+    sort_order = arxiv.SortOrder.Descending,
   )
 
-  for r in client.results(search):
-    article = Article(title=r.title, summary=r.summary, pdf_url=r.pdf_url,published=pd.to_datetime(r.published))
-    articles.append(article)
+  # Pages are requested lazily as results are consumed; the lock is held for one result
+  # at a time so that concurrent searches interleave but never race the rate limiter
+  results = _arxiv_client.results(search)
+  while True:
+    with _arxiv_client_lock:
+      r = next(results, None)
+    if r is None:
+      return
+    yield Article(title=r.title, summary=r.summary, pdf_url=r.pdf_url,published=pd.to_datetime(r.published), updated=pd.to_datetime(r.updated))
+
+
+def _is_newer(article: Article, sort_criterion: str | arxiv.SortCriterion, watermark: tuple[datetime, str | None]) -> bool | None:
+  """True for an article past the watermark, False for the watermark entry itself, None
+  once the results (sorted newest first) have gone past it."""
+  date, last_id = watermark
+  article_date = article_sort_date(article, sort_criterion)
+  if article_date > date:
+    return True
+  if article_date < date:
+    return None
+  return article_arxiv_id(article) != last_id if last_id is not None else False
+
+
+async def iter_arxiv_article_batches(query:str="LLM",max_results:int=10,sort_criterion: str | arxiv.SortCriterion = arxiv.SortCriterion.SubmittedDate, batch_size: int = settings.ARXIV_FETCH_BATCH_SIZE, newer_than: tuple[datetime, str | None] | None = None) -> AsyncIterator[List[Article]]:
+  """Yield fetched articles in batches while the blocking arxiv client runs in a worker thread.
+
+  Downstream stages can start storing and indexing the first batch while later pages
+  are still being downloaded. With a ``newer_than`` watermark (sort date, arXiv id),
+  paging stops at the first article that is not newer.
+  """
+  loop = asyncio.get_running_loop()
+  queue: asyncio.Queue = asyncio.Queue()
+  done = object()
+  stop = threading.Event()
+
+  def produce():
+    batch: List[Article] = []
+    try:
+      for article in _search_arxiv(query, max_results, sort_criterion):
+        if stop.is_set():
+          return
+        if newer_than is not None:
+          newer = _is_newer(article, sort_criterion, newer_than)
+          if newer is None:
+            break
+          if not newer:
+            continue
+        batch.append(article)
+        if len(batch) >= batch_size:
+          loop.call_soon_threadsafe(queue.put_nowait, batch)
+          batch = []
+      if batch:
+        loop.call_soon_threadsafe(queue.put_nowait, batch)
+      loop.call_soon_threadsafe(queue.put_nowait, done)
+    except Exception as e:
+      loop.call_soon_threadsafe(queue.put_nowait, e)
+
+  loop.run_in_executor(_arxiv_fetch_executor, produce)
+  try:
+    while True:
+      item = await queue.get()
+      if item is done:
+        break
+      if isinstance(item, Exception):
+        raise item
+      yield item
+  finally:
+    # Let the worker thread stop paging arXiv if the consumer went away early
+    stop.set()
+
+
+async def fetch_articles_by_query(query:str="LLM",max_results:int=10,sort_criterion: str | arxiv.SortCriterion = arxiv.SortCriterion.SubmittedDate ) -> FetchArxivArticleResponse:
+  """search for articles in arxiv
+  """
+  articles : List[Article] = []
+
+  async for batch in iter_arxiv_article_batches(query, max_results, sort_criterion):
+    articles.extend(batch)
   
   result: FetchArxivArticleResponse = FetchArxivArticleResponse(fetched_articles=articles)
 
   return result
 
-async def store_articles_into_db(articles: list[Article]) -> None:
-  # Store articles in PostgreSQL database using CRUD operations
-    db = SessionLocal()
-    try:
-        # Convert pydantic models to dict for bulk creation
-        articles_data = [
-            {
-                "title": article.title,
-                "summary": article.summary,
-                "pdf_url": article.pdf_url,
-                "published": article.published,
-                "llm_summary": article.llm_summary
-            }
-            for article in articles
-        ]
-        
-        # Use bulk create with duplicate checking
-        stored_articles = article_crud.bulk_create_articles(db, articles_data)
-        print(f"Successfully stored {len(stored_articles)} new articles in database")
-        
-    except Exception as e:
-        print(f"Error storing articles in database: {e}")
-    finally:
-        db.close()
+async def store_articles_into_db(articles: list[Article]) -> ArticleStoreStats:
+  """Store articles in PostgreSQL using CRUD operations; database errors are raised
+  so that callers never take an unstored batch for a stored one."""
+  async with AsyncSessionLocal() as db:
+      try:
+          # Convert pydantic models to dict for bulk creation
+          articles_data = [
+              {
+                  "title": article.title,
+                  "summary": article.summary,
+                  "pdf_url": article.pdf_url,
+                  "published": article.published,
+                  "llm_summary": article.llm_summary
+              }
+              for article in articles
+          ]
+          
+          # Use bulk create with duplicate checking
+          stats = await db.run_sync(article_crud.bulk_create_articles, articles_data)
+          logger.info(f"Stored {stats.inserted} new articles in database ({stats.skipped} already stored)")
+          return stats
+
+      except Exception as e:
+          logger.error(f"Error storing articles in database: {e}")
+          raise
         
-async def get_articles_from_db()-> list[ArticleInDB]:
-  db = SessionLocal()
+def encode_article_cursor(article: ArticleInDB) -> str:
+  """Opaque cursor pointing right after ``article`` in the (published, id) order."""
+  keyset = {"published": article.published.isoformat() if article.published else None, "id": str(article.id)}
+  return base64.urlsafe_b64encode(json.dumps(keyset).encode()).decode()
+
+
+def decode_article_cursor(cursor: str) -> tuple[datetime | None, UUID]:
   try:
-      articles = article_crud.get_articles(db=db, limit=200)    
-      result = [ArticleInDB.model_validate(a) for a in articles] 
-           
-      print("Successfully getting articles from database")
-      return result
-      
+    keyset = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    published = datetime.fromisoformat(keyset["published"]) if keyset["published"] else None
+    return published, UUID(keyset["id"])
   except Exception as e:
-      print(f"Error getting articles from database: {e}")
-      return []
-  finally:
-      db.close()
\ No newline at end of file
+    raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+async def get_articles_from_db(db: AsyncSession, filters: ArticleFilters | None = None, cursor: str | None = None, limit: int = 100) -> ArticlePage:
+  """One page of stored articles, newest first."""
+  filters = filters or ArticleFilters()
+  after = decode_article_cursor(cursor) if cursor else None
+  articles = await db.run_sync(lambda session: article_crud.get_articles_page(session, filters, after=after, limit=limit))
+  items = [ArticleInDB.model_validate(a) for a in articles]
+  next_cursor = encode_article_cursor(items[-1]) if len(items) == limit else None
+  return ArticlePage(items=items, next_cursor=next_cursor)
+
+
+async def stream_articles_from_db(filters: ArticleFilters | None = None, yield_per: int = 500) -> AsyncIterator[ArticleInDB]:
+  """Walk every matching article through a server-side cursor, ``yield_per`` rows at a time."""
+  query = article_crud.articles_query(filters or ArticleFilters()).execution_options(yield_per=yield_per)
+  # Opens its own session: it must stay open while the response body is streamed
+  async with AsyncSessionLocal() as db:
+    result = await db.stream_scalars(query)
+    async for article in result:
+      yield ArticleInDB.model_validate(article)
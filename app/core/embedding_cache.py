@@ -0,0 +1,146 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that remembers every vector it has computed.
+
+    Vectors are keyed by the model name plus a sha256 of the text. Lookups go through a
+    bounded in-memory LRU first, then through an optional SQLite file that survives
+    restarts; only the texts missing from both tiers reach the wrapped model.
+    """
+
+    def __init__(self, embedder: Embeddings, model_name: str, max_entries: int = 10000, disk_path: str | None = None) -> None:
+        self.embedder = embedder
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: sqlite3.Connection | None = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_path:
+            self._open_disk(disk_path)
+
+    def _open_disk(self, disk_path: str) -> None:
+        try:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._disk.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding disk cache disabled, could not open {disk_path}: {e}")
+            self._disk = None
+
+    def _key(self, kind: str, text: str) -> str:
+        # Query and document embeddings may differ (instruction prefixes), keep them apart
+        return f"{self.model_name}:{kind}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _lookup(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+
+            missing = [key for key in keys if key not in found]
+            if missing and self._disk is not None:
+                for start in range(0, len(missing), 500):
+                    batch = missing[start:start + 500]
+                    rows = self._disk.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vector
+                        self._remember(key, vector)
+                    self.disk_hits += len(rows)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _store(self, entries: dict[str, np.ndarray]) -> None:
+        with self._lock:
+            for key, vector in entries.items():
+                self._remember(key, vector)
+            if self._disk is not None:
+                self._disk.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in entries.items()],
+                )
+                self._disk.commit()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key("doc", text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            vectors = self.embedder.embed_documents(list(missing.values()))
+            computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+            self._store(computed)
+            found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Query embeddings of several texts; the missing ones are computed in one batch."""
+        keys = [self._key("query", text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            if isinstance(self.embedder, HuggingFaceEmbeddings):
+                # Its embed_query is embed_documents of a single text: batching is equivalent
+                vectors = self.embedder.embed_documents(list(missing.values()))
+            else:
+                vectors = [self.embedder.embed_query(text) for text in missing.values()]
+            computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+            self._store(computed)
+            found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key("query", text)
+        found = self._lookup([key])
+        if key not in found:
+            vector = np.asarray(self.embedder.embed_query(text), dtype=np.float32)
+            self._store({key: vector})
+            return vector.tolist()
+        return found[key].tolist()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "model": self.model_name,
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk_enabled": self._disk is not None,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
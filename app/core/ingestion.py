@@ -0,0 +1,149 @@
+import asyncio
+import time
+from contextlib import aclosing
+from datetime import datetime
+from typing import AsyncIterator
+
+from langchain_core.documents.base import Document
+from langchain_core.vectorstores import VectorStore
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from loguru import logger
+
+from app.config import settings
+from app.core.arxiv_pdf import ArxivPdfFetcher
+from app.core.data_fetcher import iter_arxiv_article_batches, store_articles_into_db
+from app.core.pdf import count_pdf_pages, iter_pdf_pages, run_in_pdf_pool
+from app.core.rag import index_arxiv_articles, index_documents_batched, split_document_pages
+from app.core.sparse_index import BM25Index
+from app.schemas.data_fetcher import Article, ArticleStoreStats, FetchArxivArticleResponse
+from app.schemas.jobs import IngestionProgress
+from app.schemas.rag import DocumentIndexingProgress, IndexingStats
+
+
+async def ingest_arxiv_query(query: str, max_results: int, sort_criterion: str, vector_store: VectorStore, progress: IngestionProgress | None = None, sparse_index: BM25Index | None = None, full_text: bool = False, newer_than: tuple[datetime, str | None] | None = None) -> FetchArxivArticleResponse:
+    """Fetch, store and index the articles of an arXiv query as overlapping stages.
+
+    Each batch coming out of the arXiv client is stored in PostgreSQL and indexed in
+    the vector store concurrently, while the next batch is still being downloaded. At most
+    ``ARXIV_INGESTION_BATCHES_IN_FLIGHT`` batches are in those stages at once, and the
+    first stage failure stops the fetching and cancels the other stages. When given,
+    ``progress`` is updated as batches leave each stage. With ``full_text``, the PDFs of
+    a batch are downloaded through one shared connection pool and indexed with it.
+    With a ``newer_than`` watermark, only the articles sorted before it are fetched.
+    """
+    if progress is None:
+        progress = IngestionProgress()
+
+    storage_stats = ArticleStoreStats()
+
+    async def store(batch: list[Article]) -> None:
+        storage_stats.add(await store_articles_into_db(batch))
+        progress.stored += len(batch)
+
+    indexing_stats = IndexingStats()
+
+    async def index(batch: list[Article]) -> None:
+        indexing_stats.add(await index_arxiv_articles(batch, query=query, vectore_store=vector_store, sparse_index=sparse_index, pdf_fetcher=pdf_fetcher))
+        progress.indexed += len(batch)
+
+    # Fetching is faster than indexing: without a bound, every fetched batch would wait
+    # in its own tasks, with its PDFs and embeddings, for the indexing threads
+    in_flight = asyncio.Semaphore(settings.ARXIV_INGESTION_BATCHES_IN_FLIGHT)
+
+    articles: list[Article] = []
+    stage_tasks: list[asyncio.Task] = []
+
+    def raise_first_failure() -> None:
+        # A failed stage would fail every later batch too: stop paging arXiv for them
+        for task in stage_tasks:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+    pdf_fetcher = ArxivPdfFetcher() if full_text else None
+    try:
+        async with aclosing(iter_arxiv_article_batches(query, max_results, sort_criterion, newer_than=newer_than)) as batches:
+            async for batch in batches:
+                raise_first_failure()
+                articles.extend(batch)
+                progress.fetched += len(batch)
+                await in_flight.acquire()
+                raise_first_failure()
+                batch_tasks = [asyncio.create_task(store(batch)), asyncio.create_task(index(batch))]
+                asyncio.gather(*batch_tasks, return_exceptions=True).add_done_callback(lambda _: in_flight.release())
+                stage_tasks.extend(batch_tasks)
+        await asyncio.gather(*stage_tasks)
+    except BaseException:
+        for task in stage_tasks:
+            task.cancel()
+        raise
+    finally:
+        if pdf_fetcher is not None:
+            await pdf_fetcher.aclose()
+
+    logger.debug(f"Ingested {len(articles)} articles for query '{query}'")
+    return FetchArxivArticleResponse(fetched_articles=articles, indexing_stats=indexing_stats, storage_stats=storage_stats)
+
+
+def _read_text_file(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+async def _iter_text_pages(path: str) -> AsyncIterator[list[tuple[int | None, str]]]:
+    # Plain text has no pages: the whole file is one, without a number
+    yield [(None, await asyncio.to_thread(_read_text_file, path))]
+
+
+async def ingest_document_file(path: str, file_name: str, vector_store: VectorStore, sparse_index: BM25Index | None = None) -> AsyncIterator[DocumentIndexingProgress]:
+    """Index a PDF or text file from disk page by page, yielding progress as chunks are stored.
+
+    PDF pages are extracted across the PDF process pool a few at a time, ahead of the
+    consumer: the pages of the next group are read while the chunks of the previous one
+    are embedded. Chunks are indexed as soon as an embedding batch is full, so memory
+    does not grow with the size of the document.
+    """
+    started = time.perf_counter()
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=settings.CHUNKS_SIZE, chunk_overlap=200)
+    progress = DocumentIndexingProgress(file_name=file_name)
+    stats = IndexingStats(documents=1)
+
+    if file_name.lower().endswith(".pdf"):
+        progress.total_pages = await run_in_pdf_pool(count_pdf_pages, path)
+        page_groups = iter_pdf_pages(path, progress.total_pages)
+    else:
+        page_groups = _iter_text_pages(path)
+    yield progress.model_copy()
+
+    async def index(documents: list[Document]) -> None:
+        batch_stats = await index_documents_batched(documents, vector_store, sparse_index=sparse_index)
+        batch_stats.total_seconds = 0.0
+        stats.add(batch_stats)
+
+    pending: list[Document] = []
+    chunk_index = 0
+    async for pages in page_groups:
+        t0 = time.perf_counter()
+        splits = split_document_pages(pages, file_name, text_splitter, chunk_index)
+        stats.split_seconds += time.perf_counter() - t0
+        chunk_index += len(splits)
+        pending.extend(splits)
+        progress.pages += len(pages)
+        if len(pending) >= settings.EMBEDDING_BATCH_SIZE:
+            await index(pending)
+            pending = []
+            progress.chunks = stats.chunks
+            progress.elapsed_seconds = round(time.perf_counter() - started, 3)
+            yield progress.model_copy()
+    if pending:
+        await index(pending)
+
+    stats.total_seconds = time.perf_counter() - started
+    progress.chunks = stats.chunks
+    progress.elapsed_seconds = round(stats.total_seconds, 3)
+    progress.done = True
+    progress.stats = stats
+    logger.debug(
+        f"Indexed {stats.chunks} chunks from {progress.pages} pages of {file_name} in {stats.total_seconds:.2f}s "
+        f"({stats.chunks_per_second} chunks/s)"
+    )
+    yield progress
@@ -0,0 +1,260 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import select
+
+from app.config import settings
+from app.core.ingestion import ingest_arxiv_query
+from app.models.jobs import IngestionJob as IngestionJobRow
+from app.schemas.data_fetcher import FetchArxivArticleRequest
+from app.schemas.jobs import IngestionJob, IngestionProgress
+from app.utils.db import AsyncSessionLocal
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+def _dedup_key(request: FetchArxivArticleRequest) -> tuple:
+    return (" ".join(request.query.lower().split()), request.max_results, request.sort_criterion, request.full_text)
+
+
+def _utcnow() -> datetime:
+    # Job dates are naive UTC, like their columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class IngestionJobManager:
+    """In-process queue of arXiv ingestion jobs served by a bounded pool of workers.
+
+    Identical queries submitted while a previous one is still queued or running are
+    attached to the existing job. When ``persist`` is enabled, every job is mirrored
+    in the ``IngestionJob`` table, the progress of running jobs is saved every few
+    seconds and unfinished jobs are re-queued after a restart.
+
+    Finished jobs are evicted from memory after ``INGESTION_JOB_TTL_SECONDS`` or past
+    ``INGESTION_JOBS_MAX_FINISHED``, and drop their fetched articles sooner; evicted
+    persisted jobs are still served from the table, without articles.
+    """
+
+    def __init__(self, resources, workers: int = settings.INGESTION_JOB_WORKERS, persist: bool = settings.INGESTION_JOBS_PERSIST) -> None:
+        self.resources = resources
+        self.workers = workers
+        self.persist = persist
+        self.jobs: dict[UUID, IngestionJob] = {}
+        self._queue: asyncio.Queue[UUID] = asyncio.Queue(maxsize=settings.INGESTION_JOB_QUEUE_SIZE)
+        self._in_flight: dict[tuple, UUID] = {}
+        self._running: dict[UUID, asyncio.Task] = {}
+        self._cancel_requested: set[UUID] = set()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        if self.persist:
+            self._tasks.append(asyncio.create_task(self._restore()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, request: FetchArxivArticleRequest) -> tuple[IngestionJob, bool]:
+        """Queue a new job, or return the in-flight job running the same query."""
+        key = _dedup_key(request)
+        existing_id = self._in_flight.get(key)
+        if existing_id is not None:
+            return self.jobs[existing_id], True
+
+        if self._queue.full():
+            raise IngestionQueueFull()
+        self._prune()
+        now = _utcnow()
+        job = IngestionJob(id=uuid.uuid4(), request=request, created_at=now, updated_at=now)
+        self.jobs[job.id] = job
+        self._in_flight[key] = job.id
+        self._queue.put_nowait(job.id)
+        await self._save(job)
+        return job, False
+
+    async def get(self, job_id: UUID) -> IngestionJob | None:
+        job = self.jobs.get(job_id)
+        if job is None and self.persist:
+            job = await self._load(job_id)
+        return job
+
+    def list(self) -> list[IngestionJob]:
+        self._prune()
+        return sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    async def cancel(self, job_id: UUID) -> IngestionJob | None:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        task = self._running.get(job_id)
+        if task is not None:
+            # The worker marks the job as cancelled once the pipeline has unwound
+            self._cancel_requested.add(job_id)
+            task.cancel()
+        else:
+            await self._finish(job, "cancelled")
+        return job
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is not None and job.status == "queued":
+                    await self._run(job)
+            except Exception as e:
+                logger.error(f"Ingestion worker {worker_id} failed on job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IngestionJob) -> None:
+        while self.resources.vector_store is None:
+            await asyncio.sleep(settings.BACKEND_CONNECT_RETRY_SECONDS)
+
+        job.status = "running"
+        await self._touch(job)
+        request = job.request
+        task = asyncio.create_task(
+            ingest_arxiv_query(
+                request.query,
+                request.max_results,
+                request.sort_criterion,
+                self.resources.vector_store,
+                progress=job.progress,
+                sparse_index=self.resources.sparse_index,
+                full_text=request.full_text,
+            )
+        )
+        self._running[job.id] = task
+        saver = asyncio.create_task(self._save_progress_periodically(job)) if self.persist else None
+        try:
+            result = await task
+            job.articles = result.fetched_articles
+            job.indexing_stats = result.indexing_stats
+            job.storage_stats = result.storage_stats
+            await self._finish(job, "succeeded")
+        except asyncio.CancelledError:
+            if job.id not in self._cancel_requested:
+                # The worker itself is being stopped: leave the job resumable
+                raise
+            await self._finish(job, "cancelled")
+        except Exception as e:
+            logger.error(f"Ingestion job {job.id} failed: {e}")
+            await self._finish(job, "failed", error=str(e))
+        finally:
+            if saver is not None:
+                saver.cancel()
+            self._running.pop(job.id, None)
+            self._cancel_requested.discard(job.id)
+
+    async def _save_progress_periodically(self, job: IngestionJob) -> None:
+        saved = job.progress.model_copy()
+        while True:
+            await asyncio.sleep(settings.INGESTION_JOB_PROGRESS_SAVE_SECONDS)
+            if job.progress != saved:
+                saved = job.progress.model_copy()
+                await self._touch(job)
+
+    async def _finish(self, job: IngestionJob, status: str, error: str | None = None) -> None:
+        job.status = status
+        job.error = error
+        self._in_flight.pop(_dedup_key(job.request), None)
+        await self._touch(job)
+        self._prune()
+
+    def _prune(self) -> None:
+        now = _utcnow()
+        finished = sorted((job for job in self.jobs.values() if job.finished), key=lambda job: job.updated_at, reverse=True)
+        for rank, job in enumerate(finished):
+            age = now - job.updated_at
+            if rank >= settings.INGESTION_JOBS_MAX_FINISHED or age > timedelta(seconds=settings.INGESTION_JOB_TTL_SECONDS):
+                del self.jobs[job.id]
+            elif job.articles and age > timedelta(seconds=settings.INGESTION_JOB_ARTICLES_TTL_SECONDS):
+                job.articles = []
+
+    async def _touch(self, job: IngestionJob) -> None:
+        job.updated_at = _utcnow()
+        await self._save(job)
+
+    async def _save(self, job: IngestionJob) -> None:
+        if not self.persist:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.merge(IngestionJobRow(
+                    id=job.id,
+                    query=job.request.query,
+                    max_results=job.request.max_results,
+                    sort_criterion=job.request.sort_criterion,
+                    full_text=job.request.full_text,
+                    status=job.status,
+                    fetched=job.progress.fetched,
+                    stored=job.progress.stored,
+                    indexed=job.progress.indexed,
+                    error=job.error,
+                    created_at=job.created_at,
+                    updated_at=job.updated_at,
+                ))
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Could not persist ingestion job {job.id}: {e}")
+
+    async def _load(self, job_id: UUID) -> IngestionJob | None:
+        try:
+            async with AsyncSessionLocal() as db:
+                row = await db.get(IngestionJobRow, job_id)
+        except Exception as e:
+            logger.warning(f"Could not load ingestion job {job_id}: {e}")
+            return None
+        return _job_from_row(row) if row is not None else None
+
+    async def _restore(self) -> None:
+        """Re-queue the jobs that were queued or running when the process stopped."""
+        while not self.resources.db_ready:
+            await asyncio.sleep(settings.BACKEND_CONNECT_RETRY_SECONDS)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(IngestionJobRow)
+                .where(IngestionJobRow.status.in_(("queued", "running")))
+                .order_by(IngestionJobRow.created_at)
+            )).scalars().all()
+
+        for row in rows:
+            job = _job_from_row(row)
+            key = _dedup_key(job.request)
+            if job.id in self.jobs or key in self._in_flight:
+                continue
+            # Progress restarts from zero since the pipeline is run again from the beginning
+            job.status = "queued"
+            job.progress = IngestionProgress()
+            self.jobs[job.id] = job
+            self._in_flight[key] = job.id
+            await self._queue.put(job.id)
+            await self._touch(job)
+        if rows:
+            logger.info(f"Restored {len(rows)} unfinished ingestion jobs")
+
+
+def _job_from_row(row: IngestionJobRow) -> IngestionJob:
+    return IngestionJob(
+        id=row.id,
+        request=FetchArxivArticleRequest(
+            query=row.query,
+            max_results=row.max_results,
+            sort_criterion=row.sort_criterion,
+            full_text=bool(row.full_text),
+        ),
+        status=row.status,
+        progress=IngestionProgress(fetched=row.fetched, stored=row.stored, indexed=row.indexed),
+        error=row.error,
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+    )
@@ -1,50 +1,157 @@
-from gliner2 import GLiNER2
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator
+
 from loguru import logger
+
+from app.config import settings
+from app.schemas.data_fetcher import Article
 from app.schemas.kg import KG_triple, KG_triples
 
-def extract_kg_triples_from_gliner2_entities(paper_title: str, entities_list: list):
+ENT_STRUCTURE = {
+    "task": "Research task or objective (e.g., text classification, NL2SQL, machine translation)",
+    "method": "Algorithm, model, or technique proposed or used (e.g., Transformer, CRF, fine-tuning)",
+    "dataset": "Datasets or benchmarks used for evaluation (e.g., SQuAD, ImageNet, Spider)",
+    "metric": "Evaluation metrics or scores reported (e.g., F1, BLEU, accuracy)",
+    "concept": "General CS/NLP concepts mentioned in the text that do not fit the other categories (e.g., embeddings, knowledge graphs, attention mechanism)"
+}
+
+# Relation linking a paper to each kind of extracted entity
+ENTITY_RELATIONS = {
+    "concept": "CITE",
+    "task": "TREAT",
+    "dataset": "USE",
+    "method": "USE",
+    "metric": "USE",
+}
+
+# One model per process: loaded on first use in the API process, and by the pool
+# initializer in each extraction worker
+_extractor = None
+_extractor_lock = threading.Lock()
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def get_kg_extractor():
+    global _extractor
+    with _extractor_lock:
+        if _extractor is None:
+            from gliner2 import GLiNER2
+
+            logger.debug(f"Loading GLiNER2 model {settings.GLINER2_MODEL_NAME}")
+            _extractor = GLiNER2.from_pretrained(settings.GLINER2_MODEL_NAME)
+        return _extractor
+
+
+def _init_extraction_worker() -> None:
+    # Each worker gets one core: letting torch spawn a thread per core in every
+    # process would oversubscribe the CPU
+    try:
+        import torch
+
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    get_kg_extractor()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        workers = settings.KG_EXTRACTION_PROCESSES or os.cpu_count() or 1
+        # spawn: forking a process that already runs torch threads can deadlock
+        _process_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_extraction_worker,
+        )
+        logger.info(f"Started KG extraction process pool with {workers} workers")
+    return _process_pool
+
+
+def shutdown_kg_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def _entity_text(entity) -> str:
+    # Entities are plain strings, or dicts when confidences/spans are requested
+    return (entity.get("text", "") if isinstance(entity, dict) else str(entity)).strip()
+
+
+def extract_kg_triples_from_gliner2_entities(paper_title: str, entities: dict) -> KG_triples:
     """Extract knowledge graph triples from GLiNER2 entities."""
-    kg_triples : KG_triples = KG_triples(triples=[])
-    for entity in entities_list:
-        tasks = entity.get("task", None)
-        methods = entity.get("method", None)
-        metrics = entity.get("metric", None)
-        datasets = entity.get("dataset", None)
-        concepts = entity.get("concept", None)
-        
-        if concepts:    
-            kg_triples.triples.append(KG_triple(paper_title, "CITE", c) for c in concepts)
-        if tasks:
-            kg_triples.triples.append((paper_title, "TREAT", t) for t in tasks)
-        if datasets:
-            kg_triples.triples.append((paper_title, "USE", d) for d in datasets)
-        if methods:
-            kg_triples.triples.append((paper_title, "USE", m) for m in methods)
-        if metrics:
-            kg_triples.triples.append((paper_title, "USE", m) for m in metrics)
-    
+    # GLiNER2 returns {"entities": {label: [entity, ...]}}
+    entities_by_label = entities.get("entities", entities)
+    kg_triples: KG_triples = KG_triples(triples=[])
+    seen = set()
+    for label, relation in ENTITY_RELATIONS.items():
+        for entity in entities_by_label.get(label) or []:
+            tail = _entity_text(entity)
+            if tail and (relation, tail.lower()) not in seen:
+                seen.add((relation, tail.lower()))
+                kg_triples.triples.append(KG_triple(head=paper_title, relation=relation, tail=tail, tail_type=label))
+    return kg_triples
+
+
+def extract_kg_triples_batch(titles: list[str], texts: list[str]) -> list[KG_triples]:
+    """Run the extractor over a batch of texts, one KG_triples per text."""
+    extractor = get_kg_extractor()
+    if hasattr(extractor, "batch_extract_entities"):
+        results = extractor.batch_extract_entities(texts, ENT_STRUCTURE, batch_size=settings.KG_EXTRACTION_BATCH_SIZE)
+    else:
+        results = [extractor.extract_entities(text, ENT_STRUCTURE) for text in texts]
+    return [extract_kg_triples_from_gliner2_entities(title, result) for title, result in zip(titles, results)]
+
+
+async def iter_kg_triples(articles_list: list[Article]) -> AsyncIterator[tuple[Article, KG_triples]]:
+    """Yield the triples of each article as soon as the batch holding it is extracted.
+
+    Batches run one after the other in a worker thread, or concurrently across a
+    process pool when ``KG_EXTRACTION_PROCESS_POOL`` is set, in which case they are
+    yielded in completion order.
+    """
+    batch_size = settings.KG_EXTRACTION_BATCH_SIZE
+    batches = [articles_list[start:start + batch_size] for start in range(0, len(articles_list), batch_size)]
+    started = time.perf_counter()
+
+    if settings.KG_EXTRACTION_PROCESS_POOL:
+        loop = asyncio.get_running_loop()
+        pool = _get_process_pool()
+
+        async def run(batch: list[Article]) -> tuple[list[Article], list[KG_triples]]:
+            titles = [r.title for r in batch]
+            texts = [r.title + " " + r.summary for r in batch]
+            return batch, await loop.run_in_executor(pool, extract_kg_triples_batch, titles, texts)
+
+        pending = [asyncio.ensure_future(run(batch)) for batch in batches]
+        try:
+            for next_done in asyncio.as_completed(pending):
+                batch, triples = await next_done
+                for article, article_triples in zip(batch, triples):
+                    yield article, article_triples
+        finally:
+            for future in pending:
+                future.cancel()
+    else:
+        for batch in batches:
+            triples = await asyncio.to_thread(
+                extract_kg_triples_batch, [r.title for r in batch], [r.title + " " + r.summary for r in batch]
+            )
+            for article, article_triples in zip(batch, triples):
+                yield article, article_triples
+
+    logger.debug(f"Extracted KG triples from {len(articles_list)} articles in {time.perf_counter() - started:.2f}s")
+
+
+async def construct_KG_from_articles_list(articles_list: list[Article]) -> KG_triples:
+    kg_triples: KG_triples = KG_triples(triples=[])
+    async for _, article_triples in iter_kg_triples(articles_list):
+        kg_triples.triples.extend(article_triples.triples)
     return kg_triples
-    
-def construct_KG_from_articles_list(articles_list:list):
-
-    extractor = GLiNER2.from_pretrained("fastino/gliner2-base-v1")
-    
-    ent_structure = {
-        "task": "Research task or objective (e.g., text classification, NL2SQL, machine translation)",
-        "method": "Algorithm, model, or technique proposed or used (e.g., Transformer, CRF, fine-tuning)",
-        "dataset": "Datasets or benchmarks used for evaluation (e.g., SQuAD, ImageNet, Spider)",
-        "metric": "Evaluation metrics or scores reported (e.g., F1, BLEU, accuracy)",
-        "concept": "General CS/NLP concepts mentioned in the text that do not fit the other categories (e.g., embeddings, knowledge graphs, attention mechanism)"
-    }
-    kg_triples : KG_triples = KG_triples(triples=[])
-    for r in articles_list:
-        entities = extractor.extract_entities(
-        r.title+" "+r.summary,
-        ent_structure
-    )
-        kg_triples.triples.extend(extract_kg_triples_from_gliner2_entities(r.title, entities))
-        print("###############")
-        logger.debug(entities)
-        logger.debug(kg_triples)
-        
-    return kg_triples
\ No newline at end of file
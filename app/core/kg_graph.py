@@ -0,0 +1,321 @@
+import asyncio
+import re
+import threading
+import time
+
+import numpy as np
+from loguru import logger
+
+from app.schemas.kg import KG_triple
+from app.utils.cruds import kg_crud, normalize_entity_name, normalize_title
+from app.utils.db import AsyncSessionLocal, SessionLocal
+
+# Question tokens keep the characters found in entity names such as "GPT-4" or "F1.5"
+_QUESTION_TOKEN_RE = re.compile(r"\w[\w\-+.]*")
+# Longest entity name, in words, looked up in a question
+_MAX_ENTITY_WORDS = 6
+# Single words never looked up as entities: function words, and the words a question
+# uses to ask for a kind of entity ("which methods ...")
+_QUESTION_STOPWORDS = frozenset(
+    "a an and are as at be by can did do does for from how in is it of on or paper papers "
+    "the their them these they this to used using was were what when where which who why with "
+    "approach approaches benchmark benchmarks concept concepts dataset datasets method methods "
+    "metric metrics model models task tasks technique techniques".split()
+)
+
+
+class KGGraph:
+    """In-memory copy of the knowledge graph stored in PostgreSQL.
+
+    Entity ids are the dense integer ids of the ``KGEntity`` dictionary, so they index
+    NumPy arrays directly. Edges are kept as parallel ``heads``/``relations``/``tails``
+    arrays from which CSR adjacencies are built: ``out`` (paper -> entities), ``in``
+    (entity -> papers) and ``both`` (undirected, for neighborhood walks). ``refresh`` only loads the entities
+    and edges created since the previous refresh; the CSR arrays are rebuilt with a
+    vectorised argsort the next time they are needed.
+
+    Ids are used as watermarks, which assumes writes are not committed out of id order:
+    this holds as long as the graph is only written through ``KGGraph.write_lock``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self.write_lock = asyncio.Lock()
+        # One refresh at a time: the watermarks are read and moved as a whole
+        self._refresh_lock = asyncio.Lock()
+        self.names: list[str] = [""]  # entity ids start at 1
+        self.types: list[str] = [""]
+        self._keys: dict[str, list[int]] = {}
+        self.relation_names: list[str] = []
+        self._relation_codes: dict[str, int] = {}
+        self.heads = np.zeros(0, dtype=np.int32)
+        self.tails = np.zeros(0, dtype=np.int32)
+        self.relations = np.zeros(0, dtype=np.int16)
+        self._last_entity_id = 0
+        self._last_edge_id = 0
+        self._csr: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]] | None = None
+        self.refreshed_at: float | None = None
+
+    @property
+    def n_entities(self) -> int:
+        return len(self.names)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.heads)
+
+    # -- refresh ---------------------------------------------------------------------
+
+    def _reserve_entities(self, size: int) -> None:
+        # Ids may have gaps (rolled back inserts): they are padded with empty entries
+        if size > len(self.names):
+            self.names.extend([""] * (size - len(self.names)))
+            self.types.extend([""] * (size - len(self.types)))
+            self._csr = None
+
+    def _apply(self, entities: list[tuple], edges: list[tuple]) -> None:
+        with self._lock:
+            # Rows at or below the watermarks are already loaded
+            entities = [entity for entity in entities if entity[0] > self._last_entity_id]
+            edges = [edge for edge in edges if edge[0] > self._last_edge_id]
+            for entity_id, name, entity_type in entities:
+                self._reserve_entities(entity_id + 1)
+                self.names[entity_id] = name
+                self.types[entity_id] = entity_type
+                key = normalize_title(name) if entity_type == "paper" else normalize_entity_name(name)
+                self._keys.setdefault(key, []).append(entity_id)
+                self._last_entity_id = max(self._last_entity_id, entity_id)
+            if edges:
+                self._reserve_entities(max(max(e[1], e[3]) for e in edges) + 1)
+                codes = np.fromiter(
+                    (self._relation_codes.setdefault(relation, len(self._relation_codes)) for _, _, relation, _ in edges),
+                    dtype=np.int16,
+                    count=len(edges),
+                )
+                self.relation_names = sorted(self._relation_codes, key=self._relation_codes.get)
+                self.heads = np.concatenate([self.heads, np.fromiter((e[1] for e in edges), dtype=np.int32, count=len(edges))])
+                self.tails = np.concatenate([self.tails, np.fromiter((e[3] for e in edges), dtype=np.int32, count=len(edges))])
+                self.relations = np.concatenate([self.relations, codes])
+                self._last_edge_id = max(edge[0] for edge in edges)
+                self._csr = None
+
+    async def refresh(self) -> int:
+        """Load the entities and edges added since the last refresh. Returns the number of new edges."""
+        async with self._refresh_lock:
+            return await self._refresh()
+
+    def _load_new_rows(self) -> tuple[list[tuple], list[tuple]]:
+        # Reading a large graph and appending it to the arrays runs in a worker thread,
+        # through a sync session, so that it does not hold the event loop
+        with SessionLocal() as db:
+            entities = kg_crud.get_entities_since(db, self._last_entity_id)
+            edges = kg_crud.get_edges_since(db, self._last_edge_id)
+        self._apply(entities, edges)
+        return entities, edges
+
+    async def _refresh(self) -> int:
+        n_edges = self.n_edges
+        entities, edges = await asyncio.to_thread(self._load_new_rows)
+        self.refreshed_at = time.monotonic()
+        if entities or edges:
+            logger.debug(f"KG cache refreshed: +{len(entities)} entities, +{len(edges)} edges ({self.n_edges} edges)")
+        return self.n_edges - n_edges
+
+    def _is_stale(self, max_age_seconds: float) -> bool:
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at > max_age_seconds
+
+    async def refresh_if_stale(self, max_age_seconds: float) -> None:
+        if not self._is_stale(max_age_seconds):
+            return
+        async with self._refresh_lock:
+            # Requests that queued behind a refresh do not run it again
+            if self._is_stale(max_age_seconds):
+                await self._refresh()
+
+    async def add_triples(self, triples: list[KG_triple]) -> dict[str, int]:
+        """Persist triples in PostgreSQL, then pull the new edges into the cache."""
+        async with self.write_lock:
+            async with AsyncSessionLocal() as db:
+                counts = await db.run_sync(kg_crud.add_triples, triples)
+            await self.refresh()
+        return counts
+
+    # -- CSR -------------------------------------------------------------------------
+
+    @staticmethod
+    def _build_csr(sources: np.ndarray, targets: np.ndarray, codes: np.ndarray, n_nodes: int):
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n_nodes), out=indptr[1:])
+        return indptr, targets[order], codes[order]
+
+    def _adjacency(self, kind: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._csr is None:
+            n = self.n_entities
+            self._csr = {
+                "out": self._build_csr(self.heads, self.tails, self.relations, n),
+                "in": self._build_csr(self.tails, self.heads, self.relations, n),
+                "both": self._build_csr(
+                    np.concatenate([self.heads, self.tails]),
+                    np.concatenate([self.tails, self.heads]),
+                    np.concatenate([self.relations, self.relations]),
+                    n,
+                ),
+            }
+        return self._csr[kind]
+
+    @staticmethod
+    def _gather(indptr: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        """Positions in the CSR arrays of the neighbors of every node of ``nodes``."""
+        starts, ends = indptr[nodes], indptr[nodes + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return np.zeros(0, dtype=np.int64)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(lengths.sum())
+
+    # -- queries ---------------------------------------------------------------------
+
+    def find(self, name: str, entity_type: str | None = None) -> list[int]:
+        """Ids of the entities (or papers) with that name, optionally of one type."""
+        with self._lock:
+            ids = self._keys.get(normalize_entity_name(name), []) + self._keys.get(normalize_title(name), [])
+            return [i for i in dict.fromkeys(ids) if entity_type is None or self.types[i] == entity_type]
+
+    def degree(self, entity_id: int) -> int:
+        with self._lock:
+            indptr, _, _ = self._adjacency("both")
+            return int(indptr[entity_id + 1] - indptr[entity_id])
+
+    def neighborhood(self, entity_id: int, hops: int = 1, max_nodes: int = 200) -> tuple[dict[int, int], list[tuple[int, str, int]]]:
+        """Nodes within ``hops`` of the entity with their distance, and the edges between them."""
+        with self._lock:
+            indptr, targets, _ = self._adjacency("both")
+            distance = {entity_id: 0}
+            visited = np.zeros(self.n_entities, dtype=bool)
+            visited[entity_id] = True
+            frontier = np.array([entity_id], dtype=np.int64)
+            for hop in range(1, hops + 1):
+                neighbors = np.unique(targets[self._gather(indptr, frontier)])
+                neighbors = neighbors[~visited[neighbors]]
+                neighbors = neighbors[:max(0, max_nodes - len(distance))]
+                if not len(neighbors):
+                    break
+                visited[neighbors] = True
+                distance.update((int(n), hop) for n in neighbors)
+                frontier = neighbors
+
+            nodes = np.fromiter(distance, dtype=np.int64)
+            out_indptr, out_targets, out_codes = self._adjacency("out")
+            positions = self._gather(out_indptr, nodes)
+            heads = np.repeat(nodes, out_indptr[nodes + 1] - out_indptr[nodes])
+            keep = visited[out_targets[positions]]
+            edges = [
+                (int(h), self.relation_names[c], int(t))
+                for h, c, t in zip(heads[keep], out_codes[positions][keep], out_targets[positions][keep])
+            ]
+            return distance, edges
+
+    def related_papers(self, entity_id: int, limit: int = 10) -> list[tuple[int, float]]:
+        """Papers linked to the entity, favouring papers with fewer other entities."""
+        with self._lock:
+            in_indptr, in_targets, _ = self._adjacency("in")
+            papers = in_targets[in_indptr[entity_id]:in_indptr[entity_id + 1]]
+            if not len(papers):
+                return []
+            papers, links = np.unique(papers, return_counts=True)
+            out_indptr, _, _ = self._adjacency("out")
+            scores = links / np.sqrt(out_indptr[papers + 1] - out_indptr[papers])
+            top = np.argsort(-scores, kind="stable")[:limit]
+            return [(int(papers[i]), round(float(scores[i]), 4)) for i in top]
+
+    def cooccurring(self, entity_id: int, limit: int = 10) -> list[tuple[int, int]]:
+        """Entities extracted from the same papers, with the number of shared papers."""
+        with self._lock:
+            in_indptr, in_targets, _ = self._adjacency("in")
+            papers = np.unique(in_targets[in_indptr[entity_id]:in_indptr[entity_id + 1]])
+            out_indptr, out_targets, _ = self._adjacency("out")
+            # One count per paper even when the paper links the entity with several relations
+            pairs = np.unique(np.stack([
+                np.repeat(papers, out_indptr[papers + 1] - out_indptr[papers]),
+                out_targets[self._gather(out_indptr, papers)],
+            ]), axis=1)
+            counts = np.bincount(pairs[1], minlength=self.n_entities) if pairs.size else np.zeros(self.n_entities, dtype=np.int64)
+            counts[entity_id] = 0
+            top = np.argsort(-counts, kind="stable")[:limit]
+            return [(int(i), int(counts[i])) for i in top if counts[i] > 0]
+
+    def match_entities(self, text: str) -> list[int]:
+        """Ids of the entities named in a text, by dictionary lookup of its word n-grams.
+
+        The longest name wins where matches overlap and papers are left out, so no
+        extraction model runs at query time.
+        """
+        tokens = [token.rstrip(".") for token in _QUESTION_TOKEN_RE.findall(text.casefold())]
+        matched: dict[int, None] = {}
+        with self._lock:
+            start = 0
+            while start < len(tokens):
+                for size in range(min(_MAX_ENTITY_WORDS, len(tokens) - start), 0, -1):
+                    key = " ".join(tokens[start:start + size])
+                    if size == 1 and key in _QUESTION_STOPWORDS:
+                        continue
+                    ids = [i for i in self._keys.get(key, []) if self.types[i] != "paper"]
+                    if ids:
+                        matched.update(dict.fromkeys(ids))
+                        start += size
+                        break
+                else:
+                    start += 1
+        return list(matched)
+
+    def expand_to_papers(self, entity_ids: list[int], limit: int = 10) -> list[tuple[int, float]]:
+        """Papers linked to the most (and rarest) of the given entities.
+
+        Each entity weighs ``1 / log2(1 + papers linked to it)``, so a benchmark shared by
+        a handful of papers counts more than a generic concept, and a paper scores the sum
+        of the weights of the entities it shares with the query.
+        """
+        if not entity_ids:
+            return []
+        with self._lock:
+            nodes = np.asarray(entity_ids, dtype=np.int64)
+            in_indptr, in_targets, _ = self._adjacency("in")
+            papers = in_targets[self._gather(in_indptr, nodes)]
+            if not len(papers):
+                return []
+            owners = np.repeat(nodes, in_indptr[nodes + 1] - in_indptr[nodes])
+            # One link per (paper, entity) even when several relations join them
+            pairs = np.unique(np.stack([papers, owners]), axis=1)
+            papers_per_entity = np.bincount(pairs[1], minlength=self.n_entities)
+            weights = 1.0 / np.log2(1.0 + papers_per_entity[pairs[1]])
+            scores = np.bincount(pairs[0], weights=weights, minlength=self.n_entities)
+            candidates = np.flatnonzero(scores)
+            top = candidates[np.argsort(-scores[candidates], kind="stable")[:limit]]
+            return [(int(paper), round(float(scores[paper]), 4)) for paper in top]
+
+    def paper_facts(self, paper_ids: list[int], focus: list[int] | None = None, limit: int = 30) -> list[tuple[int, str, int]]:
+        """Edges leaving the given papers, those reaching a ``focus`` entity first."""
+        if not paper_ids:
+            return []
+        with self._lock:
+            nodes = np.asarray(paper_ids, dtype=np.int64)
+            out_indptr, out_targets, out_codes = self._adjacency("out")
+            positions = self._gather(out_indptr, nodes)
+            heads = np.repeat(nodes, out_indptr[nodes + 1] - out_indptr[nodes])
+            tails, codes = out_targets[positions], out_codes[positions]
+            if focus:
+                order = np.argsort(~np.isin(tails, focus), kind="stable")
+                heads, tails, codes = heads[order], tails[order], codes[order]
+            return [
+                (int(h), self.relation_names[c], int(t))
+                for h, c, t in zip(heads[:limit], codes[:limit], tails[:limit])
+            ]
+
+    def stats(self) -> dict:
+        return {
+            "entities": self.n_entities - 1,
+            "edges": self.n_edges,
+            "relations": len(self.relation_names),
+            "last_edge_id": self._last_edge_id,
+        }
@@ -0,0 +1,13 @@
+from langchain_openai import ChatOpenAI
+
+from app.config import settings
+
+
+def load_llm() -> ChatOpenAI:
+    return ChatOpenAI(
+        # base_url=settings.OPENAI_API_BASE,
+        api_key=settings.OPENAI_API_KEY,
+        model=settings.OPENAI_MODEL,
+        temperature=0.5,
+        streaming=True
+    )
@@ -0,0 +1,590 @@
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+from langchain_core.documents.base import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from loguru import logger
+
+# Rows scored per matrix product so that float16 vectors are upcast in bounded blocks
+_SCORE_BLOCK_ROWS = 65536
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLES_PER_LIST = 64
+# Metadata kept in typed columns so that filters on it are evaluated without a pass over
+# the metadata dicts: epoch dates as a NumPy array, exact-match keys as inverted lists
+_NUMERIC_KEYS = ("published_ts",)
+_KEYWORD_KEYS = ("source", "source_key", "title_key", "title", "document_hash")
+
+_COMPARISONS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+}
+
+
+def metadata_matches(metadata: dict, where: dict) -> bool:
+    """Evaluate a Chroma-style ``where`` clause against the metadata of one chunk."""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(metadata_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(metadata_matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_COMPARISONS[op](value, operand) for op, operand in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store backed by a memory-mapped matrix of normalized vectors.
+
+    Vectors live in ``vectors.npy`` (float32 or float16) opened with ``np.memmap``, chunk
+    texts and metadata are appended to ``documents.jsonl`` and ``meta.json`` records how
+    many rows are committed, so every upsert leaves a consistent snapshot on disk.
+
+    Search is exact below ``ivf_min_vectors``. Past that, an IVF index (spherical k-means
+    over ``sqrt(n)`` lists) is trained and queries only score the ``nprobe`` closest lists
+    plus the rows added since the last training; the index is retrained once that tail
+    has grown as large as the trained part. Scores are cosine distances, lower is closer,
+    like the Chroma backend. A Chroma-style metadata ``filter`` is resolved to the matching
+    rows first, from the typed columns when it only compares indexed keys, and an exact
+    search scores those rows only.
+
+    Deleted chunks leave a tombstone: their row stays in the matrix but is never returned,
+    and their id can be stored again in a new row. Once tombstones make up ``compact_ratio``
+    of the rows, ``compact`` rewrites the vectors and records without them under a new
+    generation of file names; ``meta.json`` switches to it in one atomic rename.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        path: str | None = None,
+        dtype: str = "float32",
+        ivf_min_vectors: int = 50000,
+        nprobe: int = 8,
+        compact_ratio: float = 0.25,
+    ) -> None:
+        self._embedding = embedding
+        self.path = Path(path) if path else None
+        self.dtype = np.dtype(dtype)
+        self.ivf_min_vectors = ivf_min_vectors
+        self.nprobe = nprobe
+        self.compact_ratio = compact_ratio
+        self._generation = 0
+        self._lock = threading.RLock()
+        self._vectors: np.ndarray | None = None
+        self._size = 0
+        self.ids: list[str] = []
+        self.contents: list[str] = []
+        self.metadatas: list[dict] = []
+        self._rows: dict[str, int] = {}
+        self._deleted: set[int] = set()
+        self._deleted_array: np.ndarray | None = None
+        self._numeric: dict[str, list[float]] = {key: [] for key in _NUMERIC_KEYS}
+        self._numeric_arrays: dict[str, np.ndarray] = {}
+        self._keyword_rows: dict[str, dict[str, set[int]]] = {key: {} for key in _KEYWORD_KEYS}
+        self._centroids: np.ndarray | None = None
+        self._list_indptr: np.ndarray | None = None
+        self._list_rows: np.ndarray | None = None
+        self._trained_size = 0
+        if self.path is not None:
+            self.load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return self._size - len(self._deleted)
+
+    # -- storage ---------------------------------------------------------------------
+
+    def _file(self, name: str, generation: int | None = None) -> Path:
+        # Generation 0 keeps the file names of stores written before compaction existed
+        generation = self._generation if generation is None else generation
+        stem, extension = name.split(".")
+        return self.path / (name if generation == 0 else f"{stem}.{generation}.{extension}")
+
+    def _write_meta(self) -> None:
+        tmp = self.path / "meta.json.tmp"
+        tmp.write_text(json.dumps({"size": self._size, "dtype": self.dtype.name, "generation": self._generation}))
+        os.replace(tmp, self.path / "meta.json")
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        """Make room for ``rows`` vectors, doubling the memory-mapped file when full."""
+        if self._vectors is not None and self._vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match the index ({self._vectors.shape[1]})")
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, 1024)
+        if self.path is None:
+            vectors = np.zeros((new_capacity, dim), dtype=self.dtype)
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp = self.path / "vectors.npy.tmp"
+            vectors = np.lib.format.open_memmap(tmp, mode="w+", dtype=self.dtype, shape=(new_capacity, dim))
+        if self._size:
+            vectors[:self._size] = self._vectors[:self._size]
+        if self.path is not None:
+            vectors.flush()
+            os.replace(tmp, self._file("vectors.npy"))
+        self._vectors = vectors
+
+    def _commit(self, records: list[dict]) -> None:
+        if self.path is None:
+            return
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+        with open(self._file("documents.jsonl"), "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        self._write_meta()
+
+    def save(self) -> None:
+        """Flush the vectors and write the IVF index next to them."""
+        if self.path is None:
+            return
+        with self._lock:
+            self._commit([])
+            if self._centroids is not None:
+                np.savez(
+                    self._file("ivf.npz"),
+                    centroids=self._centroids,
+                    list_indptr=self._list_indptr,
+                    list_rows=self._list_rows,
+                    trained_size=self._trained_size,
+                )
+
+    def load(self) -> bool:
+        if self.path is None or not (self.path / "meta.json").exists():
+            return False
+        try:
+            with self._lock:
+                meta = json.loads((self.path / "meta.json").read_text())
+                if meta["dtype"] != self.dtype.name:
+                    logger.warning(f"Local index at {self.path} stores {meta['dtype']} vectors, ignoring LOCAL_INDEX_DTYPE={self.dtype.name}")
+                    self.dtype = np.dtype(meta["dtype"])
+                self._generation = meta.get("generation", 0)
+                self._vectors = np.load(self._file("vectors.npy"), mmap_mode="r+")
+                self._size = meta["size"]
+                # Rows past the committed size belong to an interrupted write and are dropped;
+                # a later record for the same row (an overwrite) wins
+                records: dict[int, dict] = {}
+                with open(self._file("documents.jsonl"), encoding="utf-8") as f:
+                    for line in f:
+                        record = json.loads(line)
+                        if record["row"] < self._size:
+                            records[record["row"]] = record
+                self.ids = [records[row]["id"] for row in range(self._size)]
+                self.contents = [records[row]["content"] for row in range(self._size)]
+                self.metadatas = [records[row]["metadata"] for row in range(self._size)]
+                self._deleted = {row for row in range(self._size) if records[row].get("deleted")}
+                self._deleted_array = None
+                self._rows = {doc_id: row for row, doc_id in enumerate(self.ids) if row not in self._deleted}
+                self._numeric = {key: [] for key in _NUMERIC_KEYS}
+                self._keyword_rows = {key: {} for key in _KEYWORD_KEYS}
+                for row, metadata in enumerate(self.metadatas):
+                    self._index_metadata(row, {} if row in self._deleted else metadata)
+                if self._file("ivf.npz").exists():
+                    ivf = np.load(self._file("ivf.npz"))
+                    if int(ivf["trained_size"]) <= self._size:
+                        self._centroids = ivf["centroids"]
+                        self._list_indptr = ivf["list_indptr"]
+                        self._list_rows = ivf["list_rows"]
+                        self._trained_size = int(ivf["trained_size"])
+            logger.info(f"Loaded local vector index with {self._size} vectors from {self.path}")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not load local vector index from {self.path}: {e}")
+            return False
+
+    # -- metadata columns --------------------------------------------------------------
+
+    def _index_metadata(self, row: int, metadata: dict, previous: dict | None = None) -> None:
+        """Record the typed metadata of ``row``, a new row when ``previous`` is None."""
+        for key, values in self._numeric.items():
+            value = metadata.get(key)
+            value = float(value) if isinstance(value, (int, float)) else np.nan
+            if previous is None:
+                values.append(value)
+            else:
+                values[row] = value
+        self._numeric_arrays.clear()
+        for key, inverted in self._keyword_rows.items():
+            if previous is not None and previous.get(key) is not None:
+                inverted.get(str(previous[key]), set()).discard(row)
+            if metadata.get(key) is not None:
+                inverted.setdefault(str(metadata[key]), set()).add(row)
+
+    def _numeric_column(self, key: str) -> np.ndarray:
+        # NaN where a row has no value: every comparison with it is False
+        if key not in self._numeric_arrays:
+            self._numeric_arrays[key] = np.asarray(self._numeric[key][:self._size], dtype=np.float64)
+        return self._numeric_arrays[key]
+
+    def _keyword_mask(self, key: str, values) -> np.ndarray:
+        mask = np.zeros(self._size, dtype=bool)
+        for value in values:
+            rows = self._keyword_rows[key].get(str(value))
+            if rows:
+                mask[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+        return mask
+
+    def _condition_mask(self, key: str, condition) -> np.ndarray | None:
+        """Rows matching one comparison on an indexed key, None when it is not indexed."""
+        operations = condition if isinstance(condition, dict) else {"$eq": condition}
+        if key in self._numeric and all(isinstance(v, (int, float)) or op in ("$in", "$nin") for op, v in operations.items()):
+            column = self._numeric_column(key)
+            mask = np.ones(self._size, dtype=bool)
+            for op, operand in operations.items():
+                if op in ("$in", "$nin"):
+                    matches = np.isin(column, np.asarray(operand, dtype=np.float64))
+                    mask &= matches if op == "$in" else ~matches
+                elif op == "$ne":
+                    mask &= column != operand
+                else:
+                    mask &= _COMPARISONS[op](column, operand)
+            return mask
+        if key in self._keyword_rows and all(op in ("$eq", "$ne", "$in", "$nin") for op in operations):
+            mask = np.ones(self._size, dtype=bool)
+            for op, operand in operations.items():
+                matches = self._keyword_mask(key, operand if op in ("$in", "$nin") else [operand])
+                mask &= matches if op in ("$eq", "$in") else ~matches
+            return mask
+        return None
+
+    def _where_mask(self, where: dict) -> np.ndarray:
+        mask = np.ones(self._size, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._where_mask(clause)
+            elif key == "$or":
+                mask &= np.logical_or.reduce([self._where_mask(clause) for clause in condition])
+            else:
+                matches = self._condition_mask(key, condition)
+                if matches is None:
+                    clause = {key: condition}
+                    matches = np.fromiter((metadata_matches(self.metadatas[row], clause) for row in range(self._size)), dtype=bool, count=self._size)
+                mask &= matches
+        return mask
+
+    # -- writes ----------------------------------------------------------------------
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def upsert(self, ids: list[str], embeddings: list[list[float]], contents: list[str], metadatas: list[dict]) -> None:
+        """Write already embedded chunks; existing ids are overwritten in place."""
+        if not ids:
+            return
+        vectors = self._normalize(embeddings)
+        with self._lock:
+            new_ids = [doc_id for doc_id in dict.fromkeys(ids) if doc_id not in self._rows]
+            self._reserve(self._size + len(new_ids), vectors.shape[1])
+            records = []
+            for doc_id, vector, content, metadata in zip(ids, vectors, contents, metadatas):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = self._size
+                    self._rows[doc_id] = row
+                    self.ids.append(doc_id)
+                    self.contents.append(content)
+                    self.metadatas.append(metadata)
+                    self._index_metadata(row, metadata)
+                    self._size += 1
+                else:
+                    self.contents[row] = content
+                    self._index_metadata(row, metadata, previous=self.metadatas[row])
+                    self.metadatas[row] = metadata
+                self._vectors[row] = vector
+                records.append({"row": row, "id": doc_id, "content": content, "metadata": metadata})
+            self._commit(records)
+            self._maybe_train()
+
+    def update_metadatas(self, ids: list[str], metadatas: list[dict]) -> int:
+        """Replace the metadata of stored chunks, keeping their vectors. Returns the number updated."""
+        with self._lock:
+            records = []
+            for doc_id, metadata in zip(ids, metadatas):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    continue
+                self._index_metadata(row, metadata, previous=self.metadatas[row])
+                self.metadatas[row] = metadata
+                records.append({"row": row, "id": doc_id, "content": self.contents[row], "metadata": metadata})
+            self._commit(records)
+            return len(records)
+
+    def delete(self, ids: list[str] | None = None, **kwargs: Any) -> bool:
+        """Tombstone the rows of the given chunks; unknown ids are ignored."""
+        with self._lock:
+            records = []
+            for doc_id in dict.fromkeys(ids or []):
+                row = self._rows.pop(doc_id, None)
+                if row is None:
+                    continue
+                self._deleted.add(row)
+                self._index_metadata(row, {}, previous=self.metadatas[row])
+                records.append({"row": row, "id": doc_id, "content": self.contents[row], "metadata": self.metadatas[row], "deleted": True})
+            self._deleted_array = None
+            self._commit(records)
+            if self._deleted and len(self._deleted) >= self.compact_ratio * self._size:
+                self.compact()
+            return bool(records)
+
+    def compact(self) -> int:
+        """Rewrite the store without its deleted rows. Returns the number of rows dropped.
+
+        The live rows are written to the files of the next generation, which ``meta.json``
+        then points to: a crash before that rename leaves the previous generation intact.
+        The IVF index is trained again on the new row numbers when the store is big enough.
+        """
+        with self._lock:
+            if not self._deleted:
+                return 0
+            dropped = len(self._deleted)
+            live = np.setdiff1d(np.arange(self._size, dtype=np.int64), self._deleted_rows())
+            dim = self._vectors.shape[1]
+            capacity = max(len(live), 1024)
+            generation = self._generation + 1
+            if self.path is None:
+                vectors = np.zeros((capacity, dim), dtype=self.dtype)
+            else:
+                vectors = np.lib.format.open_memmap(self._file("vectors.npy", generation), mode="w+", dtype=self.dtype, shape=(capacity, dim))
+            for start in range(0, len(live), _SCORE_BLOCK_ROWS):
+                rows = live[start:start + _SCORE_BLOCK_ROWS]
+                vectors[start:start + len(rows)] = self._vectors[rows]
+            ids = [self.ids[row] for row in live.tolist()]
+            contents = [self.contents[row] for row in live.tolist()]
+            metadatas = [self.metadatas[row] for row in live.tolist()]
+
+            previous = self._generation
+            self._vectors, self._size, self._generation = vectors, len(live), generation
+            self.ids, self.contents, self.metadatas = ids, contents, metadatas
+            self._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+            self._deleted, self._deleted_array = set(), None
+            self._numeric = {key: [] for key in _NUMERIC_KEYS}
+            self._keyword_rows = {key: {} for key in _KEYWORD_KEYS}
+            for row, metadata in enumerate(metadatas):
+                self._index_metadata(row, metadata)
+            self._centroids = self._list_indptr = self._list_rows = None
+            self._trained_size = 0
+
+            if self.path is not None:
+                vectors.flush()
+                with open(self._file("documents.jsonl"), "w", encoding="utf-8") as f:
+                    for row, (doc_id, content, metadata) in enumerate(zip(ids, contents, metadatas)):
+                        f.write(json.dumps({"row": row, "id": doc_id, "content": content, "metadata": metadata}) + "\n")
+                self._write_meta()
+                for name in ("vectors.npy", "documents.jsonl", "ivf.npz"):
+                    self._file(name, previous).unlink(missing_ok=True)
+            self._maybe_train()
+            logger.info(f"Compacted local vector index: dropped {dropped} deleted rows, {self._size} left")
+            return dropped
+
+    def _deleted_rows(self) -> np.ndarray:
+        if self._deleted_array is None:
+            self._deleted_array = np.fromiter(sorted(self._deleted), dtype=np.int64, count=len(self._deleted))
+        return self._deleted_array
+
+    def add_texts(self, texts: Iterable[str], metadatas: list[dict] | None = None, *, ids: list[str] | None = None, **kwargs: Any) -> list[str]:
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        self.upsert(ids, self._embedding.embed_documents(texts), texts, metadatas)
+        return ids
+
+    @classmethod
+    def from_texts(cls, texts: list[str], embedding: Embeddings, metadatas: list[dict] | None = None, *, ids: list[str] | None = None, **kwargs: Any) -> "LocalVectorStore":
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+    # -- IVF -------------------------------------------------------------------------
+
+    def _maybe_train(self) -> None:
+        if self._size < self.ivf_min_vectors:
+            return
+        if self._centroids is not None and self._size - self._trained_size < self._trained_size:
+            return
+        self._train()
+
+    def _scores(self, rows: np.ndarray | None, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query with the given rows (all committed rows when None)."""
+        if rows is None:
+            scores = np.empty(self._size, dtype=np.float32)
+            for start in range(0, self._size, _SCORE_BLOCK_ROWS):
+                end = min(start + _SCORE_BLOCK_ROWS, self._size)
+                scores[start:end] = self._vectors[start:end].astype(np.float32, copy=False) @ query
+            return scores
+        return self._vectors[rows].astype(np.float32, copy=False) @ query
+
+    def _assign(self, centroids: np.ndarray, end: int) -> np.ndarray:
+        assignments = np.empty(end, dtype=np.int32)
+        for start in range(0, end, _SCORE_BLOCK_ROWS):
+            stop = min(start + _SCORE_BLOCK_ROWS, end)
+            block = self._vectors[start:stop].astype(np.float32, copy=False)
+            assignments[start:stop] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    def _train(self) -> None:
+        n_lists = max(1, int(np.sqrt(self._size)))
+        rng = np.random.default_rng(0)
+        sample_size = min(self._size, n_lists * _KMEANS_SAMPLES_PER_LIST)
+        sample = self._vectors[np.sort(rng.choice(self._size, sample_size, replace=False))].astype(np.float32)
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)]
+        for _ in range(_KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = self._normalize(sums)
+
+        assignments = self._assign(centroids, self._size)
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        indptr = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=indptr[1:])
+        self._centroids, self._list_indptr, self._list_rows = centroids, indptr, order
+        self._trained_size = self._size
+        logger.info(f"Trained IVF index with {n_lists} lists over {self._size} vectors")
+        self.save()
+
+    def _candidate_rows(self, query: np.ndarray) -> np.ndarray | None:
+        if self._centroids is None:
+            return None
+        nprobe = min(self.nprobe, len(self._centroids))
+        probed = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([
+            *(self._list_rows[self._list_indptr[lst]:self._list_indptr[lst + 1]] for lst in probed),
+            np.arange(self._trained_size, self._size, dtype=np.int64),
+        ])
+
+    # -- reads -----------------------------------------------------------------------
+
+    def _filter_rows(self, where: dict) -> np.ndarray:
+        mask = self._where_mask(where)
+        mask[self._deleted_rows()] = False
+        return np.flatnonzero(mask)
+
+    def _search_rows(self, rows: np.ndarray | None, query: np.ndarray, k: int) -> list[tuple[Document, float]]:
+        if rows is not None and not len(rows):
+            return []
+        scores = self._scores(rows, query)
+        if self._deleted:
+            scores[np.isin(rows, self._deleted_rows()) if rows is not None else self._deleted_rows()] = -np.inf
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top = top[np.isfinite(scores[top])]
+        return [
+            (
+                Document(id=self.ids[row], page_content=self.contents[row], metadata=dict(self.metadatas[row])),
+                float(1.0 - scores[i]),
+            )
+            for i, row in ((i, int(rows[i]) if rows is not None else int(i)) for i in top)
+        ]
+
+    def similarity_search_with_score_by_vector(self, embedding: list[float], k: int = 4, filter: dict | None = None, **kwargs: Any) -> list[tuple[Document, float]]:
+        query = self._normalize(embedding)[0]
+        with self._lock:
+            if self._size == 0 or k <= 0:
+                return []
+            rows = self._filter_rows(filter) if filter else self._candidate_rows(query)
+            return self._search_rows(rows, query, k)
+
+    def similarity_search_with_score_by_vectors(self, embeddings: list[list[float]], k: int = 4, filter: dict | None = None) -> list[list[tuple[Document, float]]]:
+        """Closest chunks of several queries, scored with one matrix product per block of rows.
+
+        With a ``filter``, the matching rows are resolved once for the whole batch.
+        """
+        queries = self._normalize(embeddings)
+        with self._lock:
+            if self._size == 0 or k <= 0:
+                return [[] for _ in queries]
+            if filter:
+                rows = self._filter_rows(filter)
+                return [self._search_rows(rows, query, k) for query in queries]
+            if self._centroids is not None:
+                # Each query probes its own IVF lists
+                return [self.similarity_search_with_score_by_vector(query, k=k) for query in queries]
+            deleted = self._deleted_rows()
+            best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+            best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+            for start in range(0, self._size, _SCORE_BLOCK_ROWS):
+                end = min(start + _SCORE_BLOCK_ROWS, self._size)
+                block = queries @ self._vectors[start:end].astype(np.float32, copy=False).T
+                block[:, deleted[(deleted >= start) & (deleted < end)] - start] = -np.inf
+                scores = np.concatenate([best_scores, block], axis=1)
+                rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))], axis=1)
+                if scores.shape[1] > k:
+                    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                    scores, rows = np.take_along_axis(scores, top, axis=1), np.take_along_axis(rows, top, axis=1)
+                best_scores, best_rows = scores, rows
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            best_scores, best_rows = np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_rows, order, axis=1)
+            return [
+                [
+                    (
+                        Document(id=self.ids[row], page_content=self.contents[row], metadata=dict(self.metadatas[row])),
+                        float(1.0 - score),
+                    )
+                    for row, score in zip(rows.tolist(), scores.tolist())
+                    if np.isfinite(score)
+                ]
+                for rows, scores in zip(best_rows, best_scores)
+            ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> list[tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k=k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: list[float], k: int = 4, **kwargs: Any) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return lambda distance: 1.0 - distance
+
+    def get_ids_where(self, where: dict) -> list[str]:
+        with self._lock:
+            return [self.ids[row] for row in self._filter_rows(where).tolist()]
+
+    def get_existing_ids(self, ids: list[str]) -> set[str]:
+        with self._lock:
+            return {doc_id for doc_id in ids if doc_id in self._rows}
+
+    def iter_documents(self, page_size: int = 1000) -> Iterator[tuple[list[str], list[str], list[dict]]]:
+        start = 0
+        while True:
+            with self._lock:
+                end = min(start + page_size, self._size)
+                rows = [row for row in range(start, end) if row not in self._deleted]
+                page = [self.ids[row] for row in rows], [self.contents[row] for row in rows], [self.metadatas[row] for row in rows]
+            if start >= end:
+                return
+            if rows:
+                yield page
+            start = end
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+
+from app.schemas.rag import RetrievalFilters
+
+
+def normalize_key(text: str) -> str:
+    """Case and spacing insensitive form of a source or title, used for exact matches."""
+    return " ".join(text.lower().split())
+
+
+def to_timestamp(date: datetime) -> int:
+    """Epoch seconds of a date, naive dates being UTC, so dates compare as integers."""
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return int(date.timestamp())
+
+
+def filter_metadata(metadata: dict) -> dict:
+    """Typed filter keys derived from the ``source``, ``title`` and ``publication_date``
+    metadata of a chunk, for chunks indexed before they were set at split time."""
+    typed = {}
+    if metadata.get("source"):
+        typed["source_key"] = normalize_key(str(metadata["source"]))
+    if metadata.get("title"):
+        typed["title_key"] = normalize_key(str(metadata["title"]))
+    if metadata.get("publication_date"):
+        try:
+            typed["published_ts"] = to_timestamp(datetime.fromisoformat(str(metadata["publication_date"])))
+        except ValueError:
+            pass
+    return typed
+
+
+def build_where(filters: RetrievalFilters | None) -> dict | None:
+    """Chroma-style ``where`` clause of the retrieval filters, None when nothing is filtered.
+
+    It only compares the typed ``published_ts``, ``source_key`` and ``title_key`` chunk
+    metadata, so both vector stores evaluate it before any vector is scored.
+    """
+    if filters is None:
+        return None
+    clauses = []
+    if filters.published_from is not None:
+        clauses.append({"published_ts": {"$gte": to_timestamp(filters.published_from)}})
+    if filters.published_to is not None:
+        clauses.append({"published_ts": {"$lte": to_timestamp(filters.published_to)}})
+    if filters.source:
+        clauses.append({"source_key": {"$eq": normalize_key(filters.source)}})
+    if filters.title:
+        clauses.append({"title_key": {"$eq": normalize_key(filters.title)}})
+    return combine_where(*clauses)
+
+
+def combine_where(*clauses: dict | None) -> dict | None:
+    # Chroma rejects an "$and" of fewer than two clauses
+    clauses = [clause for clause in clauses if clause]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
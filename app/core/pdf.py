@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator
+
+from fastapi import UploadFile
+from loguru import logger
+
+from app.config import settings
+
+_UPLOAD_READ_BYTES = 1 << 20
+_process_pool: ProcessPoolExecutor | None = None
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload goes over ``UPLOAD_MAX_BYTES``."""
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        workers = settings.PDF_EXTRACTION_PROCESSES or os.cpu_count() or 1
+        # spawn: forking a process that already runs torch threads can deadlock
+        _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        logger.info(f"Started PDF extraction process pool with {workers} workers")
+    return _process_pool
+
+
+def shutdown_pdf_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+async def spool_upload(file: UploadFile, max_bytes: int = settings.UPLOAD_MAX_BYTES, directory: str = settings.UPLOAD_SPOOL_DIR) -> str:
+    """Copy an upload to a file under ``directory`` a block at a time and return its path.
+
+    The caller owns the file and removes it once done.
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = file.filename or ""
+    suffix = ".tar" + os.path.splitext(name)[1] if name.lower().endswith((".tar.gz", ".tar.bz2", ".tar.xz")) else os.path.splitext(name)[1]
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while block := await file.read(_UPLOAD_READ_BYTES):
+                size += len(block)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Upload is larger than {max_bytes} bytes")
+                await asyncio.to_thread(out.write, block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def count_pdf_pages(path: str) -> int:
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def extract_pdf_pages(path: str, start: int, end: int) -> list[tuple[int, str]]:
+    """Text of pages ``start`` to ``end`` (excluded) of a PDF, with their 1-based numbers.
+
+    Runs in the extraction processes: the file is reopened by each task so that only
+    its path crosses the process boundary.
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    return [(number + 1, reader.pages[number].extract_text() or "") for number in range(start, end)]
+
+
+def extract_document_pages(path: str) -> tuple[int | None, list[tuple[int | None, str]]]:
+    """Page count and pages of a whole PDF or text file; a text file is one page without a number."""
+    if path.lower().endswith(".pdf"):
+        total_pages = count_pdf_pages(path)
+        return total_pages, extract_pdf_pages(path, 0, total_pages)
+    with open(path, encoding="utf-8") as f:
+        return None, [(None, f.read())]
+
+
+async def run_in_pdf_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_process_pool(), func, *args)
+
+
+async def iter_pdf_pages(path: str, total_pages: int, pages_per_task: int = settings.PDF_PAGES_PER_TASK) -> AsyncIterator[list[tuple[int, str]]]:
+    """Yield the pages of a PDF in order, ``pages_per_task`` at a time.
+
+    Page ranges are extracted across the process pool, but only a couple of ranges per
+    worker are in flight: pages are read as the consumer catches up rather than all at
+    once, so memory stays bounded on large documents.
+    """
+    ranges = deque((start, min(start + pages_per_task, total_pages)) for start in range(0, total_pages, pages_per_task))
+    max_in_flight = 2 * (settings.PDF_EXTRACTION_PROCESSES or os.cpu_count() or 1)
+    in_flight: deque[asyncio.Future] = deque()
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < max_in_flight:
+                in_flight.append(asyncio.ensure_future(run_in_pdf_pool(extract_pdf_pages, path, *ranges.popleft())))
+            yield await in_flight.popleft()
+    finally:
+        for future in in_flight:
+            future.cancel()
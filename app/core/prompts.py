@@ -0,0 +1,58 @@
+import string
+from functools import cache
+from pathlib import Path
+
+from loguru import logger
+
+PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+# Templates rendered with str.format fields, loaded at startup
+ANSWER_PROMPT = "answer.txt"
+RESEARCHER_PROMPT = "researcher.txt"
+
+
+class PromptTemplate:
+    """A prompt file parsed once into literal text and ``{field}`` placeholders.
+
+    Rendering only joins the pieces, and ``partial`` fills some fields ahead of time so
+    that the part of the prompt known before retrieval is built while it runs.
+    """
+
+    def __init__(self, parts: list[tuple[str, str | None, str]]) -> None:
+        self._parts = parts
+        self.fields = {name for _, name, _ in parts if name is not None}
+
+    @classmethod
+    def from_text(cls, text: str) -> "PromptTemplate":
+        return cls([(literal, name, spec or "") for literal, name, spec, _ in string.Formatter().parse(text)])
+
+    def partial(self, **values) -> "PromptTemplate":
+        parts, pending = [], ""
+        for literal, name, spec in self._parts:
+            if name is not None and name in values:
+                pending += literal + format(values[name], spec)
+            else:
+                parts.append((pending + literal, name, spec))
+                pending = ""
+        if pending:
+            parts.append((pending, None, ""))
+        return PromptTemplate(parts)
+
+    def render(self, **values) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Missing prompt fields: {sorted(missing)}")
+        return "".join(
+            literal + (format(values[name], spec) if name is not None else "")
+            for literal, name, spec in self._parts
+        )
+
+
+@cache
+def get_prompt_template(file_name: str) -> PromptTemplate:
+    """Template of a file of ``app/prompts``, read from disk on first use only."""
+    return PromptTemplate.from_text((PROMPTS_DIR / file_name).read_text(encoding="utf-8"))
+
+
+def load_prompt_templates() -> None:
+    for file_name in (ANSWER_PROMPT, RESEARCHER_PROMPT):
+        logger.debug(f"Loaded prompt template {file_name} with fields {sorted(get_prompt_template(file_name).fields)}")
@@ -1,24 +1,60 @@
+import asyncio
+import time
+
 from loguru import logger
-from typing import List, Tuple
+from typing import Awaitable, List, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from langchain_chroma import Chroma
+from langchain_core.vectorstores import VectorStore
 from langchain_core.documents.base import Document
 
 from app.schemas.data_fetcher import Article
+from app.schemas.rag import AnswerSource, IndexingStats
 from app.config import settings
-
-
-async def retreive_context(question: str, vector_store: Chroma, top_k: int=5) -> Tuple[str, List[Document]]:
+from app.core.arxiv_pdf import ArxivPdfFetcher, fetch_full_texts, parse_arxiv_id
+from app.core.context_builder import ContextBuilder
+from app.core.kg_graph import KGGraph
+from app.core.metadata_filters import normalize_key, to_timestamp
+from app.core.reranker import CrossEncoderReranker
+from app.core.retrieval import RetrievalMode, RetrievalResult, retrieve
+from app.core.sparse_index import BM25Index
+from app.core.vector_db import document_chunk_id, get_existing_ids, get_upsert_batch_size, run_in_ingestion_executor, upsert_embedded_documents
+
+
+async def build_context(retrieval: RetrievalResult, context_builder: ContextBuilder | None = None) -> str:
+    """Fit the retrieved chunks (and graph triples) into the prompt token budget."""
+    context_builder = context_builder or ContextBuilder(settings.CONTEXT_TOKEN_BUDGET, settings.OPENAI_MODEL)
+    t0 = time.perf_counter()
+    context, retrieval.context_stats = await asyncio.to_thread(context_builder.build, retrieval.documents, retrieval.graph_facts)
+    retrieval.timings["context_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    return context
+
+
+def answer_sources(documents: list[tuple[Document, float]], score_kind: str = "distance") -> list[AnswerSource]:
+    """One source per paper, in retrieval order, with the score of its best chunk."""
+    sources: dict[str, AnswerSource] = {}
+    for doc, score in documents:
+        metadata = doc.metadata
+        key = metadata.get("URL") or metadata.get("title") or metadata.get("source") or ""
+        if key not in sources:
+            sources[key] = AnswerSource(
+                title=metadata.get("title"),
+                url=metadata.get("URL"),
+                publication_date=metadata.get("publication_date"),
+                score=round(float(score), 4),
+                score_kind=score_kind,
+            )
+    return list(sources.values())
+
+
+async def retreive_context(question: str, vector_store: VectorStore, top_k: int=5, mode: RetrievalMode = "dense", sparse_index: BM25Index | None = None, reranker: CrossEncoderReranker | None = None, kg_graph: KGGraph | None = None, context_builder: ContextBuilder | None = None, query_embedding: Awaitable[list[float]] | None = None, where: dict | None = None) -> Tuple[str, RetrievalResult]:
     logger.debug(f"Looking for similar context to the question {question}")
-    results = vector_store.similarity_search(
-    question,
-    k=top_k)
-    docs_content = "\n\n".join(doc.page_content for doc in results)
-    return docs_content, results
+    retrieval = await retrieve(question, vector_store, mode=mode, top_k=top_k, sparse_index=sparse_index, reranker=reranker, kg_graph=kg_graph, query_embedding=query_embedding, where=where)
+    docs_content = await build_context(retrieval, context_builder)
+    return docs_content, retrieval
 
 
-async def index_document(doc: str, vectore_store: Chroma) -> int:
+async def index_document(doc: str, vectore_store: VectorStore, sparse_index: BM25Index | None = None) -> int:
     # 1. Split text into Document objects
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,
@@ -31,79 +67,182 @@ async def index_document(doc: str, vectore_store: Chroma) -> int:
         split.metadata = {
             "chunk_index": i,
             "source": "user_input",
+            "source_key": "user_input",
             "length": len(split.page_content)
         }
 
-    # add to Chroma
-    vectore_store.add_documents(
-        documents=splits,
-    )
+    # add to the vector store
+    stats = await index_documents_batched(splits, vectore_store, sparse_index=sparse_index)
 
-    return len(splits)
+    return stats.chunks
 
 
+def split_document_pages(pages: list[tuple[int | None, str]], source: str, text_splitter: RecursiveCharacterTextSplitter, first_chunk_index: int = 0) -> list[Document]:
+    """Split each page on its own, so that every chunk carries the page it comes from."""
+    splits = []
+    for page, text in pages:
+        for split in text_splitter.create_documents([text]):
+            split.metadata = {
+                "chunk_index": first_chunk_index + len(splits),
+                "source": source,
+                "source_key": normalize_key(source),
+                "length": len(split.page_content),
+            }
+            if page is not None:
+                split.metadata["page"] = page
+            splits.append(split)
+    return splits
 
-async def index_arxiv_document(article: Article, query: str, vectore_store: Chroma) -> int:
-    # 1. Split text into Document objects
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=settings.CHUNKS_SIZE,
-        chunk_overlap=200
-    )
+
+def split_arxiv_article(article: Article, query: str, text_splitter: RecursiveCharacterTextSplitter, full_text: list[tuple[int | None, str]] | None = None) -> List[Document]:
+    """Chunks of the title and abstract, followed by those of the PDF pages when given.
+
+    Every chunk carries the metadata of the article, so the full text is indexed under
+    the same paper as its abstract. Its ``source`` is ``query``: chunk ids do not depend on
+    it, so when another query fetches the paper again the stored chunks keep this one.
+    """
     splits = text_splitter.create_documents([article.title+" "+article.summary])
+    if full_text:
+        splits.extend(split_document_pages(full_text, query, text_splitter, first_chunk_index=len(splits)))
+    arxiv_id = parse_arxiv_id(article.pdf_url)
 
     # Assign metadata (optional)
     for i, split in enumerate(splits):
         split.metadata = {
+            **({"page": split.metadata["page"]} if "page" in split.metadata else {}),
             "chunk_index": i,
             "source": query,
             "title":article.title,
             "URL": article.pdf_url,
             "length": len(split.page_content),
             "publication_date":str(article.published),
+            # Typed copies of the above, compared by the retrieval filters
+            "source_key": normalize_key(query),
+            "title_key": normalize_key(article.title),
+            "published_ts": to_timestamp(article.published),
         }
+        if arxiv_id is not None:
+            split.metadata["arxiv_id"] = "".join(arxiv_id)
+    return splits
+
+
+async def index_documents_batched(documents: List[Document], vectore_store: VectorStore, batch_size: int = settings.EMBEDDING_BATCH_SIZE, sparse_index: BM25Index | None = None) -> IndexingStats:
+    """Embed documents in fixed-size batches and upsert them to the vector store in bulk payloads.
+
+    Embedding of the next batch overlaps with the upsert of the previous payload, so the
+    run is bounded by embedding compute rather than by HTTP round-trips. When given, the
+    BM25 index is kept in sync with the same chunks.
+    """
+    stats = IndexingStats(chunks=len(documents))
+    started = time.perf_counter()
+    # The store caps the size of a payload, so no embedding batch may be larger than it
+    upsert_batch_size = await run_in_ingestion_executor(get_upsert_batch_size, vectore_store)
+    batch_size = max(1, min(batch_size, upsert_batch_size))
+
+    # Chunks are addressed by content: drop repeats inside this run, then skip the ones
+    # the collection already holds so they are neither re-embedded nor duplicated
+    unique: dict[str, Document] = {}
+    for doc in documents:
+        unique.setdefault(document_chunk_id(doc), doc)
+    candidate_ids = list(unique)
+    existing: set[str] = set()
+    for start in range(0, len(candidate_ids), upsert_batch_size):
+        existing |= await run_in_ingestion_executor(
+            get_existing_ids, vectore_store, candidate_ids[start:start + upsert_batch_size]
+        )
+    ids = [chunk_id for chunk_id in candidate_ids if chunk_id not in existing]
+    documents = [unique[chunk_id] for chunk_id in ids]
+    stats.skipped_chunks = stats.chunks - len(documents)
+
+    async def upsert(start: int, end: int, embeddings: list) -> None:
+        t0 = time.perf_counter()
+        await run_in_ingestion_executor(
+            upsert_embedded_documents, vectore_store, ids[start:end], embeddings, documents[start:end]
+        )
+        stats.upsert_seconds += time.perf_counter() - t0
+        stats.upsert_batches += 1
+
+    pending_start = 0
+    pending_embeddings: list = []
+    upsert_task: asyncio.Task | None = None
+    for start in range(0, len(documents), batch_size):
+        batch = documents[start:start + batch_size]
+        t0 = time.perf_counter()
+        pending_embeddings.extend(await run_in_ingestion_executor(
+            vectore_store.embeddings.embed_documents, [doc.page_content for doc in batch]
+        ))
+        stats.embedding_seconds += time.perf_counter() - t0
+        stats.embedding_batches += 1
+
+        if len(pending_embeddings) + batch_size > upsert_batch_size or start + batch_size >= len(documents):
+            if upsert_task is not None:
+                await upsert_task
+            end = pending_start + len(pending_embeddings)
+            upsert_task = asyncio.create_task(upsert(pending_start, end, pending_embeddings))
+            pending_start, pending_embeddings = end, []
+
+    if upsert_task is not None:
+        await upsert_task
+    if sparse_index is not None:
+        # Chunks already stored are offered too, the BM25 index ignores ids it knows
+        await run_in_ingestion_executor(
+            sparse_index.add,
+            candidate_ids,
+            [unique[chunk_id].page_content for chunk_id in candidate_ids],
+            [unique[chunk_id].metadata for chunk_id in candidate_ids],
+        )
+    stats.total_seconds = time.perf_counter() - started
+    return stats
 
-    # add to Chroma
-    vectore_store.add_documents(
-        documents=splits,
-    )
-
-    return len(splits)
 
-async def index_arxiv_articles(articles:list[Article],  query: str, vectore_store: Chroma):
-    for article in articles:
-        await index_arxiv_document(article,query,vectore_store)
+async def index_arxiv_document(article: Article, query: str, vectore_store: VectorStore, sparse_index: BM25Index | None = None) -> int:
+    stats = await index_arxiv_articles([article], query, vectore_store, sparse_index=sparse_index)
+    return stats.chunks
 
+async def index_arxiv_articles(articles:list[Article],  query: str, vectore_store: VectorStore, sparse_index: BM25Index | None = None, pdf_fetcher: ArxivPdfFetcher | None = None) -> IndexingStats:
+    """Index the title and abstract of each article, and its PDF when given a ``pdf_fetcher``."""
+    full_texts: list = [None] * len(articles)
+    download_seconds = 0.0
+    if pdf_fetcher is not None:
+        t0 = time.perf_counter()
+        full_texts = await fetch_full_texts(articles, pdf_fetcher)
+        download_seconds = time.perf_counter() - t0
 
-async def retreive_arxiv_context(question: str, vector_store: Chroma, top_k: int = settings.TOP_K_RETRIEVE) -> Tuple[str, List[Document]]:
-    logger.debug(f"Looking for similar context to the question {question}")
-
-    results = vector_store.similarity_search_with_score(
-        question,
-        k=top_k
+    # 1. Split every article up front with a single splitter
+    t0 = time.perf_counter()
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.CHUNKS_SIZE,
+        chunk_overlap=200
     )
+    splits = [
+        split
+        for article, full_text in zip(articles, full_texts)
+        for split in split_arxiv_article(article, query, text_splitter, full_text)
+    ]
+    split_seconds = time.perf_counter() - t0
+
+    # 2. Embed and upsert all chunks in batches
+    stats = await index_documents_batched(splits, vectore_store, sparse_index=sparse_index)
+    stats.documents = len(articles)
+    stats.full_texts = sum(full_text is not None for full_text in full_texts)
+    stats.split_seconds = split_seconds
+    stats.download_seconds = download_seconds
+    stats.total_seconds += split_seconds + download_seconds
+    logger.debug(
+        f"Indexed {stats.chunks} chunks from {stats.documents} articles ({stats.full_texts} full texts) in {stats.total_seconds:.2f}s "
+        f"({stats.chunks_per_second} chunks/s)"
+    )
+    return stats
 
-    chunks = []
-    docs = []
-
-    for i, (doc, score) in enumerate(results, start=1):
-        metadata = doc.metadata
 
-        chunk = (
-            f"[CHUNK_{i}]\n"
-            f"Paper URL: {metadata.get('URL', 'N/A')}\n"
-            f"Title: {metadata.get('title', 'N/A')}\n"
-            f"Year: {str(metadata.get('publication_date', 'N/A'))}\n"
-            f"Content: {doc.page_content}\n"
-            f"Relevance Score: {round(score, 4)}"
-        )
-        chunks.append(chunk)
-        docs.append(doc)
+async def retreive_arxiv_context(question: str, vector_store: VectorStore, top_k: int = settings.TOP_K_RETRIEVE, mode: RetrievalMode = "dense", sparse_index: BM25Index | None = None, reranker: CrossEncoderReranker | None = None, kg_graph: KGGraph | None = None, context_builder: ContextBuilder | None = None, query_embedding: Awaitable[list[float]] | None = None, where: dict | None = None) -> Tuple[str, RetrievalResult]:
+    logger.debug(f"Looking for similar context to the question {question}")
 
-    formatted_context = (
-        "<retrieved_chunks>\n"
-        + "\n\n".join(chunks)
-        + "\n</retrieved_chunks>"
+    retrieval = await retrieve(question, vector_store, mode=mode, top_k=top_k, sparse_index=sparse_index, reranker=reranker, kg_graph=kg_graph, query_embedding=query_embedding, where=where)
+    formatted_context = await build_context(retrieval, context_builder)
+    logger.debug(
+        f"Retrieval timings ({mode}{', reranked' if retrieval.reranked else ''}): {retrieval.timings}, "
+        f"context {retrieval.context_stats.context_tokens} tokens ({retrieval.context_stats.saved_tokens} saved)"
     )
-
-    return formatted_context, docs
+    return formatted_context, retrieval
 #https://milvus.io/docs/how_to_enhance_your_rag.md
\ No newline at end of file
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.documents.base import Document
+from loguru import logger
+
+from app.config import settings
+from app.core.vector_db import retrieved_chunk_id
+
+# Applied to the per-pair estimate each time it alone makes reranking fall back, so one
+# slow batch (cold start, GC pause) cannot disable reranking for good: the estimate comes
+# back under the budget after a few requests and the next scoring run measures it again
+_ESTIMATE_DECAY = 0.8
+
+
+def load_reranker() -> "CrossEncoderReranker":
+    # Imported here so that deployments without reranking never load the model code
+    from sentence_transformers import CrossEncoder
+
+    logger.debug(f"Loading cross-encoder {settings.RERANK_MODEL_NAME}")
+    model = CrossEncoder(settings.RERANK_MODEL_NAME, device="cpu", max_length=settings.RERANK_MAX_LENGTH)
+    # The first call is much slower than the next ones and would skew the latency estimate
+    model.predict([("warm up", "warm up")], show_progress_bar=False)
+    return CrossEncoderReranker(
+        model,
+        model_name=settings.RERANK_MODEL_NAME,
+        batch_size=settings.RERANK_BATCH_SIZE,
+        cache_size=settings.RERANK_CACHE_SIZE,
+        budget_ms=settings.RERANK_LATENCY_BUDGET_MS,
+    )
+
+
+class CrossEncoderReranker:
+    """Reorders retrieved chunks by the score of a cross-encoder over (question, chunk) pairs.
+
+    Scores are cached per (question, chunk id) in a bounded LRU, so candidates seen for a
+    repeated question are never scored twice. The time spent per pair is tracked with an
+    exponential moving average: when the uncached pairs are not expected to fit in the
+    latency budget, or when scoring runs past it, the candidates keep their retrieval order.
+
+    Reranked chunks are scored with the sigmoid of the cross-encoder logit, a relevance in
+    (0, 1) where higher is better, unlike the vector store distances of dense retrieval.
+    """
+
+    def __init__(self, model, model_name: str, batch_size: int = 16, cache_size: int = 20000, budget_ms: float = 300) -> None:
+        self.model = model
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.budget_ms = budget_ms
+        self._cache: OrderedDict[tuple[str, str], float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._ms_per_pair: float | None = None
+        self.reranked = 0
+        self.fallbacks = 0
+        self.cache_hits = 0
+        self.scored_pairs = 0
+
+    def _cached_scores(self, question: str, keys: list[str]) -> dict[str, float]:
+        with self._lock:
+            found = {}
+            for key in keys:
+                score = self._cache.get((question, key))
+                if score is not None:
+                    self._cache.move_to_end((question, key))
+                    found[key] = score
+            self.cache_hits += len(found)
+            return found
+
+    def _remember(self, question: str, scores: dict[str, float]) -> None:
+        with self._lock:
+            for key, score in scores.items():
+                self._cache[(question, key)] = score
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _fallback(self, candidates: list[tuple[Document, float]], top_k: int, reason: str) -> tuple[list[tuple[Document, float]], bool]:
+        self.fallbacks += 1
+        logger.warning(f"Keeping retrieval order, {reason}")
+        return candidates[:top_k], False
+
+    def rerank(self, question: str, candidates: list[tuple[Document, float]], top_k: int, budget_ms: float | None = None) -> tuple[list[tuple[Document, float]], bool]:
+        """Best ``top_k`` candidates by cross-encoder score, and whether reranking was applied."""
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        started = time.perf_counter()
+        keys = [retrieved_chunk_id(doc) for doc, _ in candidates]
+        scores = self._cached_scores(question, keys)
+        missing = [i for i, key in enumerate(keys) if key not in scores]
+
+        if missing and self._ms_per_pair is not None and len(missing) * self._ms_per_pair > budget_ms:
+            expected_ms = len(missing) * self._ms_per_pair
+            self._ms_per_pair *= _ESTIMATE_DECAY
+            return self._fallback(
+                candidates, top_k,
+                f"scoring {len(missing)} pairs would take ~{expected_ms:.0f}ms (budget {budget_ms:.0f}ms)",
+            )
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            t0 = time.perf_counter()
+            predicted = self.model.predict(
+                [(question, candidates[i][0].page_content) for i in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            ms_per_pair = (time.perf_counter() - t0) * 1000 / len(batch)
+            self._ms_per_pair = ms_per_pair if self._ms_per_pair is None else 0.8 * self._ms_per_pair + 0.2 * ms_per_pair
+            relevance = 1.0 / (1.0 + np.exp(-np.asarray(predicted, dtype=np.float64)))
+            batch_scores = {keys[i]: float(score) for i, score in zip(batch, relevance)}
+            self._remember(question, batch_scores)
+            scores.update(batch_scores)
+            self.scored_pairs += len(batch)
+
+            # Scores computed so far stay cached, so a retry of the question is cheaper
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if start + self.batch_size < len(missing) and elapsed_ms > budget_ms:
+                return self._fallback(candidates, top_k, f"reranking exceeded its {budget_ms:.0f}ms budget")
+
+        self.reranked += 1
+        order = sorted(range(len(candidates)), key=lambda i: scores[keys[i]], reverse=True)[:top_k]
+        return [(candidates[i][0], scores[keys[i]]) for i in order], True
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+            "cache_entries": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "scored_pairs": self.scored_pairs,
+            "ms_per_pair": round(self._ms_per_pair, 3) if self._ms_per_pair is not None else None,
+        }
@@ -0,0 +1,197 @@
+import asyncio
+
+from loguru import logger
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_openai import ChatOpenAI
+
+from app.config import settings
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.arxiv_sync import ArxivSyncScheduler
+from app.core.context_builder import ContextBuilder, load_context_builder
+from app.core.embedding_cache import CachedEmbeddings
+from app.core.jobs import IngestionJobManager
+from app.core.kg import shutdown_kg_process_pool
+from app.core.kg_graph import KGGraph
+from app.core.llm import load_llm
+from app.core.local_vector_store import LocalVectorStore
+from app.core.pdf import shutdown_pdf_process_pool
+from app.core.prompts import load_prompt_templates
+from app.core.reranker import CrossEncoderReranker, load_reranker
+from app.core.sparse_index import BM25Index
+from app.core.streaming import LatencyTracker
+from app.core.vector_db import (
+    count_collection_documents,
+    iter_collection_documents,
+    load_chroma_client,
+    load_embeddings_model,
+    load_local_vector_store,
+    load_vector_store,
+)
+from app.utils.db import init_async_db
+
+
+class ResourceRegistry:
+    """Process-wide resources shared by every router.
+
+    The registry is built once by the FastAPI lifespan and stored on ``app.state``.
+    Routers reach it through the dependencies in ``app.api.deps`` instead of loading
+    models or opening clients themselves.
+    """
+
+    def __init__(self) -> None:
+        self.embedder: Embeddings | None = None
+        self.chroma_client = None
+        self.vector_store: VectorStore | None = None
+        self.llm: ChatOpenAI | None = None
+        self.reranker: CrossEncoderReranker | None = None
+        self.context_builder: ContextBuilder | None = None
+        self.db_ready = False
+        self.kg_graph = KGGraph()
+        self.sparse_index = BM25Index(k1=settings.BM25_K1, b=settings.BM25_B, path=settings.BM25_INDEX_PATH)
+        self.jobs = IngestionJobManager(self)
+        self.arxiv_sync = ArxivSyncScheduler(self)
+        self.stream_latency = LatencyTracker()
+        self.answer_cache: SemanticAnswerCache | None = None
+        if settings.ANSWER_CACHE_ENABLED:
+            self.answer_cache = SemanticAnswerCache(
+                threshold=settings.ANSWER_CACHE_SIMILARITY,
+                ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+                max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            )
+        self._connect_task: asyncio.Task | None = None
+        self._sparse_sync_task: asyncio.Task | None = None
+        self._sparse_save_task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        return (
+            self.embedder is not None
+            and self.vector_store is not None
+            and self.llm is not None
+            and self.db_ready
+        )
+
+    async def startup(self) -> None:
+        """Load the LLM client and the embedder, then connect to PostgreSQL and the vector store.
+
+        Backends that are not reachable yet are retried in the background so the
+        application can start and report itself as not ready on the health probe.
+        """
+        self.llm = load_llm()
+        load_prompt_templates()
+        self.embedder = await asyncio.to_thread(load_embeddings_model)
+        if settings.RERANK_ENABLED:
+            try:
+                self.reranker = await asyncio.to_thread(load_reranker)
+            except Exception as e:
+                logger.error(f"Could not load the cross-encoder, answering without reranking: {e}")
+        self.context_builder = await asyncio.to_thread(load_context_builder)
+        await asyncio.to_thread(self.sparse_index.load)
+        await self._connect_backends()
+        if self.vector_store is None or not self.db_ready:
+            self._connect_task = asyncio.create_task(self._connect_until_ready())
+        await self.jobs.start()
+        self._sparse_save_task = asyncio.create_task(self._save_sparse_index_periodically())
+        if settings.ARXIV_SYNC_ENABLED:
+            await self.arxiv_sync.start()
+
+    async def shutdown(self) -> None:
+        await self.jobs.stop()
+        await self.arxiv_sync.stop()
+        shutdown_kg_process_pool()
+        shutdown_pdf_process_pool()
+        if self._sparse_sync_task is not None:
+            self._sparse_sync_task.cancel()
+        if self._sparse_save_task is not None:
+            self._sparse_save_task.cancel()
+        await asyncio.to_thread(self.sparse_index.save)
+        if isinstance(self.vector_store, LocalVectorStore):
+            await asyncio.to_thread(self.vector_store.save)
+        if isinstance(self.embedder, CachedEmbeddings):
+            self.embedder.close()
+        if self._connect_task is not None:
+            self._connect_task.cancel()
+            try:
+                await self._connect_task
+            except asyncio.CancelledError:
+                pass
+            self._connect_task = None
+
+    async def _connect_backends(self) -> None:
+        if not self.db_ready:
+            try:
+                await init_async_db()
+                self.db_ready = True
+            except Exception as e:
+                logger.warning(f"PostgreSQL not reachable: {e}")
+            if self.db_ready:
+                try:
+                    await self.kg_graph.refresh()
+                except Exception as e:
+                    logger.error(f"Could not load the knowledge graph: {e}")
+        if self.vector_store is None and settings.VECTOR_STORE_BACKEND == "local":
+            self.vector_store = await asyncio.to_thread(load_local_vector_store, self.embedder)
+            self._sparse_sync_task = asyncio.create_task(self._sync_sparse_index())
+        elif self.vector_store is None:
+            try:
+                client = await asyncio.to_thread(load_chroma_client, 1)
+                self.chroma_client = client
+                self.vector_store = load_vector_store(embedder=self.embedder, client=client)
+                self._sparse_sync_task = asyncio.create_task(self._sync_sparse_index())
+            except Exception as e:
+                logger.warning(f"Chroma not reachable: {e}")
+
+    async def _connect_until_ready(self) -> None:
+        while self.vector_store is None or not self.db_ready:
+            await asyncio.sleep(settings.BACKEND_CONNECT_RETRY_SECONDS)
+            await self._connect_backends()
+
+    async def _sync_sparse_index(self) -> None:
+        """Rebuild the BM25 index from the vector store when it does not hold the same chunks."""
+        try:
+            count = await asyncio.to_thread(count_collection_documents, self.vector_store)
+            if count == len(self.sparse_index):
+                return
+            logger.info(f"Rebuilding BM25 index from the vector store ({len(self.sparse_index)} != {count} chunks)")
+
+            previous = self.sparse_index
+            known = len(previous.doc_ids)
+
+            def rebuild() -> BM25Index:
+                index = BM25Index(k1=settings.BM25_K1, b=settings.BM25_B, path=settings.BM25_INDEX_PATH)
+                for ids, contents, metadatas in iter_collection_documents(self.vector_store):
+                    index.add(ids, contents, metadatas)
+                # Keep the chunks indexed by ingestions that ran during the rebuild
+                tail = [row for row in range(known, len(previous.doc_ids)) if previous.doc_ids[row] in previous]
+                index.add([previous.doc_ids[row] for row in tail], [previous.contents[row] for row in tail], [previous.metadatas[row] for row in tail])
+                index.save()
+                return index
+
+            self.sparse_index = await asyncio.to_thread(rebuild)
+            logger.info(f"BM25 index rebuilt with {len(self.sparse_index)} chunks")
+        except Exception as e:
+            logger.error(f"Could not rebuild the BM25 index: {e}")
+
+    async def _save_sparse_index_periodically(self) -> None:
+        """Persist the BM25 index while the app runs, so a crash does not lose the chunks
+        added since startup (they would only come back through a full rebuild)."""
+        while True:
+            await asyncio.sleep(settings.BM25_SAVE_INTERVAL_SECONDS)
+            try:
+                await asyncio.to_thread(self.sparse_index.save_if_dirty)
+            except Exception as e:
+                logger.error(f"Could not save the BM25 index: {e}")
+
+    async def check_vector_store(self) -> bool:
+        """Heartbeat the Chroma server without blocking the event loop."""
+        if isinstance(self.vector_store, LocalVectorStore):
+            return True
+        if self.chroma_client is None:
+            return False
+        try:
+            await asyncio.to_thread(self.chroma_client.heartbeat)
+            return True
+        except Exception as e:
+            logger.warning(f"Chroma heartbeat failed: {e}")
+            return False
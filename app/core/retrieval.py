@@ -0,0 +1,181 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Literal
+
+from langchain_core.vectorstores import VectorStore
+from langchain_core.documents.base import Document
+from loguru import logger
+
+from app.config import settings
+from app.core.kg_graph import KGGraph
+from app.core.metadata_filters import combine_where
+from app.core.reranker import CrossEncoderReranker
+from app.core.sparse_index import BM25Index
+from app.core.vector_db import retrieved_chunk_id, search_by_vector
+from app.schemas.rag import ContextStats
+
+RetrievalMode = Literal["dense", "sparse", "hybrid", "graph"]
+# What the score of a retrieved chunk means: a vector store distance (lower is closer; squared
+# L2 for a default Chroma collection, cosine for the local store), a BM25 or reciprocal rank
+# fusion score, or a cross-encoder relevance in (0, 1)
+ScoreKind = Literal["distance", "bm25", "rrf", "relevance"]
+_MODE_SCORE_KINDS: dict[str, ScoreKind] = {"dense": "distance", "graph": "distance", "sparse": "bm25", "hybrid": "rrf"}
+
+
+@dataclass
+class RetrievalResult:
+    """Scored chunks, best first, with the latency of each retrieval stage in ms.
+
+    ``score_kind`` tells how to read the scores, which depend on the retrieval mode and
+    on whether the chunks were reranked. In graph mode, ``graph_facts`` holds the
+    knowledge graph triples of the papers reached from the question entities.
+    ``context_stats`` is filled in once the chunks are assembled into a prompt context.
+    """
+    documents: list[tuple[Document, float]] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+    reranked: bool = False
+    score_kind: ScoreKind = "distance"
+    graph_facts: list[str] = field(default_factory=list)
+    context_stats: ContextStats | None = None
+
+
+def reciprocal_rank_fusion(rankings: list[list[tuple[Document, float]]], top_k: int, k: int = settings.RRF_K) -> list[tuple[Document, float]]:
+    """Fuse ranked lists by summing ``1 / (k + rank)`` over the lists a chunk appears in."""
+    scores: dict[str, float] = {}
+    documents: dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, (doc, _) in enumerate(ranking, start=1):
+            key = retrieved_chunk_id(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [(documents[key], scores[key]) for key in best]
+
+
+async def _timed(timings: dict[str, float], stage: str, func, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = await asyncio.to_thread(func, *args, **kwargs)
+    timings[stage] = round((time.perf_counter() - t0) * 1000, 2)
+    return result
+
+
+class _QuestionEmbedding:
+    """Embedding of the question, computed once and awaited by every stage that needs it.
+
+    It is started on first use unless the caller already started it (e.g. for the answer
+    cache lookup). ``embed_ms`` is how long retrieval was kept waiting for it.
+    """
+
+    def __init__(self, vector_store: VectorStore, question: str, timings: dict[str, float], embedding: Awaitable[list[float]] | None = None) -> None:
+        self._vector_store = vector_store
+        self._question = question
+        self._timings = timings
+        self._embedding = asyncio.ensure_future(embedding) if embedding is not None else None
+
+    async def get(self) -> list[float]:
+        if self._embedding is None:
+            self._embedding = asyncio.ensure_future(asyncio.to_thread(self._vector_store.embeddings.embed_query, self._question))
+        t0 = time.perf_counter()
+        embedding = await self._embedding
+        waited = round((time.perf_counter() - t0) * 1000, 2)
+        self._timings["embed_ms"] = max(self._timings.get("embed_ms", 0.0), waited)
+        return embedding
+
+
+async def _dense_hits(vector_store: VectorStore, question_embedding: _QuestionEmbedding, k: int, timings: dict[str, float], where: dict | None = None) -> list[tuple[Document, float]]:
+    embedding = await question_embedding.get()
+    return await _timed(timings, "dense_ms", search_by_vector, vector_store, embedding, k, filter=where)
+
+
+def merge_graph_hits(dense: list[tuple[Document, float]], graph: list[tuple[Document, float]], top_k: int, budget: int) -> list[tuple[Document, float]]:
+    """Let up to ``budget`` chunks of graph papers take the place of the weakest dense hits.
+
+    Both lists hold distances to the same query returned by the same vector store, in
+    whatever metric it uses, so the merged list is simply ordered by distance. Hits of
+    different stores could not be merged this way.
+    """
+    seen = {retrieved_chunk_id(doc) for doc, _ in dense}
+    extra = [(doc, score) for doc, score in graph if retrieved_chunk_id(doc) not in seen][:min(budget, top_k)]
+    return sorted(dense[:top_k - len(extra)] + extra, key=lambda hit: hit[1])
+
+
+async def _graph_hits(question: str, vector_store: VectorStore, question_embedding: _QuestionEmbedding, kg_graph: KGGraph, top_k: int, result: RetrievalResult, where: dict | None = None) -> list[tuple[Document, float]]:
+    """Chunks of the papers the question entities lead to, closest to the question first."""
+    entity_ids = await _timed(result.timings, "kg_entities_ms", kg_graph.match_entities, question)
+    papers = await _timed(result.timings, "kg_expand_ms", kg_graph.expand_to_papers, entity_ids, settings.KG_RETRIEVAL_MAX_PAPERS)
+    logger.debug(f"Question entities {[kg_graph.names[i] for i in entity_ids]} lead to {len(papers)} papers")
+    if not papers:
+        return []
+    paper_ids = [paper for paper, _ in papers]
+    facts = await _timed(result.timings, "kg_facts_ms", kg_graph.paper_facts, paper_ids, entity_ids, settings.KG_RETRIEVAL_MAX_FACTS)
+    result.graph_facts = [
+        f"{kg_graph.names[head]} -[{relation}]-> {kg_graph.names[tail]} ({kg_graph.types[tail]})"
+        for head, relation, tail in facts
+    ]
+    titles = [kg_graph.names[paper] for paper in paper_ids]
+    embedding = await question_embedding.get()
+    return await _timed(
+        result.timings, "kg_chunks_ms",
+        search_by_vector, vector_store, embedding, top_k, filter=combine_where({"title": {"$in": titles}}, where),
+    )
+
+
+async def retrieve(question: str, vector_store: VectorStore, mode: RetrievalMode = "dense", top_k: int = settings.TOP_K_RETRIEVE, sparse_index: BM25Index | None = None, reranker: CrossEncoderReranker | None = None, kg_graph: KGGraph | None = None, query_embedding: Awaitable[list[float]] | None = None, where: dict | None = None) -> RetrievalResult:
+    """Retrieve chunks with dense search, BM25, or both fused with reciprocal rank fusion.
+
+    The graph mode looks the question entities up in the knowledge graph, expands them to
+    the papers sharing them and lets up to ``KG_RETRIEVAL_CHUNK_BUDGET`` chunks of those
+    papers into the dense hits. It falls back to dense search without a graph.
+
+    With a ``reranker``, ``RERANK_CANDIDATES`` chunks are retrieved and the best ``top_k``
+    by cross-encoder score are kept.
+
+    Stages that do not need the question embedding (BM25, graph expansion) run while it
+    is computed; ``query_embedding`` lets the caller share one it already started.
+
+    A Chroma-style ``where`` clause (see ``metadata_filters.build_where``) is pushed down
+    to every search, so scoped questions only score the matching chunks.
+    """
+    result = RetrievalResult()
+    started = time.perf_counter()
+    if mode in ("sparse", "hybrid") and sparse_index is None:
+        raise ValueError(f"Retrieval mode '{mode}' needs the BM25 index")
+    if mode == "graph" and (kg_graph is None or not kg_graph.n_edges):
+        logger.warning("Knowledge graph is empty or unavailable, falling back to dense retrieval")
+        mode = "dense"
+    final_k = top_k
+    if reranker is not None:
+        top_k = max(top_k, settings.RERANK_CANDIDATES)
+    question_embedding = _QuestionEmbedding(vector_store, question, result.timings, query_embedding)
+
+    if mode == "dense":
+        result.documents = await _dense_hits(vector_store, question_embedding, top_k, result.timings, where)
+    elif mode == "sparse":
+        result.documents = await _timed(result.timings, "sparse_ms", sparse_index.search_documents, question, top_k, where)
+    elif mode == "graph":
+        dense, graph = await asyncio.gather(
+            _dense_hits(vector_store, question_embedding, top_k, result.timings, where),
+            _graph_hits(question, vector_store, question_embedding, kg_graph, top_k, result, where),
+        )
+        t0 = time.perf_counter()
+        result.documents = merge_graph_hits(dense, graph, top_k, settings.KG_RETRIEVAL_CHUNK_BUDGET)
+        result.timings["merge_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    else:
+        candidates = top_k * settings.HYBRID_CANDIDATES_FACTOR
+        dense, sparse = await asyncio.gather(
+            _dense_hits(vector_store, question_embedding, candidates, result.timings, where),
+            _timed(result.timings, "sparse_ms", sparse_index.search_documents, question, candidates, where),
+        )
+        t0 = time.perf_counter()
+        result.documents = reciprocal_rank_fusion([dense, sparse], top_k=top_k)
+        result.timings["fusion_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+
+    result.score_kind = _MODE_SCORE_KINDS[mode]
+    if reranker is not None:
+        result.documents, result.reranked = await _timed(result.timings, "rerank_ms", reranker.rerank, question, result.documents, final_k)
+        if result.reranked:
+            result.score_kind = "relevance"
+
+    result.timings["retrieval_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
@@ -0,0 +1,251 @@
+import json
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents.base import Document
+from loguru import logger
+
+from app.core.local_vector_store import metadata_matches
+
+# Keeps acronyms and model/dataset names such as "GPT-4", "T5" or "BERT_base" in one token
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """In-process BM25 index over the indexed chunks.
+
+    Postings are kept in CSR form: ``indptr[t]:indptr[t + 1]`` delimits the rows of
+    ``post_docs``/``post_tf`` holding the documents and term frequencies of term ``t``.
+    Additions are buffered and merged into the CSR arrays lazily before the next search,
+    without re-sorting the postings already merged, and scoring accumulates into a dense NumPy vector followed by an ``argpartition``
+    for top-k, so queries never iterate over documents in Python. Deleted chunks keep
+    their postings but are never returned. ``save_if_dirty`` persists the index only
+    when it changed since the last save, for periodic saves.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, path: str | None = None) -> None:
+        self.k1 = k1
+        self.b = b
+        self.path = Path(path) if path else None
+        self._lock = threading.RLock()
+        self.vocabulary: dict[str, int] = {}
+        self.doc_ids: list[str] = []
+        self.contents: list[str] = []
+        self.metadatas: list[dict] = []
+        self._rows: dict[str, int] = {}
+        self._deleted: set[int] = set()
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.post_docs = np.zeros(0, dtype=np.int32)
+        self.post_tf = np.zeros(0, dtype=np.float32)
+        self._pending_terms: list[np.ndarray] = []
+        self._pending_docs: list[np.ndarray] = []
+        self._pending_tf: list[np.ndarray] = []
+        self._pending_lengths: list[int] = []
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self.doc_ids) - len(self._deleted)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    def add(self, ids: list[str], contents: list[str], metadatas: list[dict] | None = None) -> int:
+        """Index new chunks; ids already present are ignored. Returns the number added."""
+        metadatas = metadatas or [{} for _ in ids]
+        added = 0
+        with self._lock:
+            for doc_id, content, metadata in zip(ids, contents, metadatas):
+                if doc_id in self._rows:
+                    continue
+                row = len(self.doc_ids)
+                counts = Counter(tokenize(content))
+                terms = np.fromiter(
+                    (self.vocabulary.setdefault(term, len(self.vocabulary)) for term in counts),
+                    dtype=np.int64,
+                    count=len(counts),
+                )
+                self._pending_terms.append(terms)
+                self._pending_docs.append(np.full(len(counts), row, dtype=np.int32))
+                self._pending_tf.append(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+                self._pending_lengths.append(sum(counts.values()))
+                self._rows[doc_id] = row
+                self.doc_ids.append(doc_id)
+                self.contents.append(content)
+                self.metadatas.append(metadata)
+                added += 1
+            self._dirty |= added > 0
+        return added
+
+    def _compact(self) -> None:
+        if not self._pending_terms:
+            return
+        n_terms = len(self.vocabulary)
+        # Only the new postings are sorted by term; rows only grow, so within each term
+        # they go after the merged ones and every term block stays sorted by row
+        new_terms = np.concatenate(self._pending_terms)
+        order = np.argsort(new_terms, kind="stable")
+        new_docs = np.concatenate(self._pending_docs)[order]
+        new_tf = np.concatenate(self._pending_tf)[order]
+        new_counts = np.bincount(new_terms, minlength=n_terms)
+        old_counts = np.zeros(n_terms, dtype=np.int64)
+        old_counts[:len(self.indptr) - 1] = np.diff(self.indptr)
+
+        indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(old_counts + new_counts, out=indptr[1:])
+        new_indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(new_counts, out=new_indptr[1:])
+        old_starts = np.zeros(n_terms, dtype=np.int64)
+        old_starts[:len(self.indptr) - 1] = self.indptr[:-1]
+        # Each posting moves by the shift of its term block
+        old_slots = np.arange(len(self.post_docs)) + np.repeat(indptr[:-1] - old_starts, old_counts)
+        new_slots = np.arange(len(new_docs)) + np.repeat(indptr[:-1] + old_counts - new_indptr[:-1], new_counts)
+
+        post_docs = np.empty(indptr[-1], dtype=np.int32)
+        post_tf = np.empty(indptr[-1], dtype=np.float32)
+        post_docs[old_slots], post_docs[new_slots] = self.post_docs, new_docs
+        post_tf[old_slots], post_tf[new_slots] = self.post_tf, new_tf
+        self.indptr, self.post_docs, self.post_tf = indptr, post_docs, post_tf
+        self.doc_lengths = np.concatenate([
+            self.doc_lengths, np.asarray(self._pending_lengths, dtype=np.float32)
+        ])
+        self._pending_terms, self._pending_docs, self._pending_tf, self._pending_lengths = [], [], [], []
+
+    def search(self, query: str, k: int, where: dict | None = None) -> list[tuple[int, float]]:
+        """Top ``k`` (row, score) pairs for the query, best first.
+
+        A Chroma-style ``where`` clause drops the rows whose metadata does not match before
+        the top-k selection; only the rows sharing a term with the query are checked.
+        """
+        with self._lock:
+            self._compact()
+            n_docs = len(self.doc_ids)
+            if n_docs == 0 or k <= 0:
+                return []
+            term_ids = {self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary}
+            if not term_ids:
+                return []
+
+            scores = np.zeros(n_docs, dtype=np.float32)
+            avg_length = float(self.doc_lengths.mean()) or 1.0
+            for term_id in term_ids:
+                start, end = self.indptr[term_id], self.indptr[term_id + 1]
+                docs = self.post_docs[start:end]
+                tf = self.post_tf[start:end]
+                idf = np.log1p((n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / avg_length)
+                scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            if self._deleted:
+                scores[np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted))] = 0.0
+            candidates = np.flatnonzero(scores)
+            if where:
+                candidates = candidates[np.fromiter(
+                    (metadata_matches(self.metadatas[row], where) for row in candidates),
+                    dtype=bool,
+                    count=len(candidates),
+                )]
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(int(row), float(scores[row])) for row in candidates]
+
+    def search_documents(self, query: str, k: int, where: dict | None = None) -> list[tuple[Document, float]]:
+        with self._lock:
+            return [
+                (Document(id=self.doc_ids[row], page_content=self.contents[row], metadata=dict(self.metadatas[row])), score)
+                for row, score in self.search(query, k, where)
+            ]
+
+    def delete(self, ids: list[str]) -> int:
+        """Drop chunks from the results; unknown ids are ignored. Returns the number deleted."""
+        deleted = 0
+        with self._lock:
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is not None:
+                    self._deleted.add(row)
+                    deleted += 1
+            self._dirty |= deleted > 0
+        return deleted
+
+    def update_metadatas(self, ids: list[str], metadatas: list[dict]) -> int:
+        """Replace the metadata of indexed chunks. Returns the number updated."""
+        updated = 0
+        with self._lock:
+            for doc_id, metadata in zip(ids, metadatas):
+                row = self._rows.get(doc_id)
+                if row is not None:
+                    self.metadatas[row] = metadata
+                    updated += 1
+            self._dirty |= updated > 0
+        return updated
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            self._compact()
+            self.path.mkdir(parents=True, exist_ok=True)
+            # Written aside then renamed, so a crash during a periodic save keeps the previous files
+            with open(self.path / "postings.npz.tmp", "wb") as f:
+                np.savez(
+                    f,
+                    indptr=self.indptr,
+                    post_docs=self.post_docs,
+                    post_tf=self.post_tf,
+                    doc_lengths=self.doc_lengths,
+                )
+            with open(self.path / "documents.json.tmp", "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "vocabulary": self.vocabulary,
+                        "doc_ids": self.doc_ids,
+                        "contents": self.contents,
+                        "metadatas": self.metadatas,
+                        "deleted": sorted(self._deleted),
+                    },
+                    f,
+                )
+            os.replace(self.path / "postings.npz.tmp", self.path / "postings.npz")
+            os.replace(self.path / "documents.json.tmp", self.path / "documents.json")
+            self._dirty = False
+
+    def save_if_dirty(self) -> bool:
+        """Save the index if it changed since it was loaded or last saved."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            self.save()
+            return True
+
+    def load(self) -> bool:
+        if self.path is None or not (self.path / "postings.npz").exists():
+            return False
+        try:
+            with self._lock:
+                arrays = np.load(self.path / "postings.npz")
+                with open(self.path / "documents.json", encoding="utf-8") as f:
+                    documents = json.load(f)
+                self.indptr = arrays["indptr"]
+                self.post_docs = arrays["post_docs"]
+                self.post_tf = arrays["post_tf"]
+                self.doc_lengths = arrays["doc_lengths"]
+                self.vocabulary = documents["vocabulary"]
+                self.doc_ids = documents["doc_ids"]
+                self.contents = documents["contents"]
+                self.metadatas = documents["metadatas"]
+                self._deleted = set(documents.get("deleted", []))
+                self._rows = {doc_id: row for row, doc_id in enumerate(self.doc_ids) if row not in self._deleted}
+            return True
+        except Exception as e:
+            logger.warning(f"Could not load BM25 index from {self.path}: {e}")
+            return False
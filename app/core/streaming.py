@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, AsyncIterator
+
+import numpy as np
+from fastapi import Request
+from loguru import logger
+from pydantic import BaseModel
+
+# Queued events a producer may run ahead of a slow client
+_RELAY_QUEUE_SIZE = 64
+_END = object()
+
+
+def sse_event(event: str, data: Any) -> str:
+    """One Server-Sent Events frame. ``data`` is sent as JSON, on a single line."""
+    if isinstance(data, BaseModel):
+        payload = data.model_dump_json()
+    else:
+        payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def relay_until_disconnect(request: Request, events: AsyncIterator[str], poll_seconds: float = 0.5) -> AsyncIterator[str]:
+    """Relay ``events`` to the client and cancel their producer once the client is gone.
+
+    The producer runs in its own task, so a disconnection is noticed even while it is
+    waiting on an upstream call (e.g. for the first token of the LLM) rather than at the
+    next write. Cancelling it closes the upstream stream it is iterating.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_RELAY_QUEUE_SIZE)
+
+    async def produce() -> None:
+        try:
+            async for event in events:
+                await queue.put(event)
+        finally:
+            await events.aclose()
+        await queue.put(_END)
+
+    producer = asyncio.create_task(produce())
+    get: asyncio.Future | None = None
+    try:
+        while True:
+            get = asyncio.ensure_future(queue.get())
+            while not get.done():
+                done, _ = await asyncio.wait({get, producer}, timeout=poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+                if get in done:
+                    break
+                if producer in done and producer.exception() is not None:
+                    get.cancel()
+                    raise producer.exception()
+                if await request.is_disconnected():
+                    get.cancel()
+                    logger.info(f"Client disconnected from {request.url.path}, cancelling the stream")
+                    return
+            event = get.result()
+            if event is _END:
+                return
+            yield event
+    finally:
+        if get is not None:
+            get.cancel()
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+class LatencyTracker:
+    """Recent values of named latency measurements, summarised as percentiles."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.window = window
+        self._values: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, measurements: dict[str, float | None]) -> None:
+        with self._lock:
+            for name, value in measurements.items():
+                if value is not None:
+                    self._values.setdefault(name, deque(maxlen=self.window)).append(value)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            snapshot = {name: np.fromiter(values, dtype=np.float64) for name, values in self._values.items()}
+        return {
+            name: {
+                "count": len(values),
+                "p50": round(float(np.percentile(values, 50)), 2),
+                "p95": round(float(np.percentile(values, 95)), 2),
+                "max": round(float(values.max()), 2),
+            }
+            for name, values in snapshot.items()
+            if len(values)
+        }
@@ -1,48 +1,241 @@
 from loguru import logger
+import asyncio
 import chromadb
+import functools
+import hashlib
 import time
+from concurrent.futures import ThreadPoolExecutor
 from chromadb.config import Settings as ChromaSettings
 
 from langchain_chroma import Chroma
 from langchain_community.embeddings.sentence_transformer import (
     SentenceTransformerEmbeddings,
 )
+from langchain_core.documents.base import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
 from app.config import settings
+from app.core.embedding_cache import CachedEmbeddings
+from app.core.local_vector_store import LocalVectorStore
+
+# Indexing embeds whole batches of documents; it gets its own bounded pool so that
+# concurrent ingestions cannot occupy the threads used to answer questions.
+_ingestion_executor = ThreadPoolExecutor(
+    max_workers=settings.INGESTION_EMBEDDING_WORKERS,
+    thread_name_prefix="ingestion",
+)
+
+
+async def run_in_ingestion_executor(func, *args, **kwargs):
+    """Run blocking embedding/indexing work without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_ingestion_executor, functools.partial(func, *args, **kwargs))
+
+
+# Bumped on every write to the collection; caches built on top of search results
+# compare it to know when they went stale. It only tracks writes made by this process.
+_collection_version = 0
+
+
+def get_collection_version() -> int:
+    return _collection_version
+
+
+def mark_collection_changed() -> None:
+    global _collection_version
+    _collection_version += 1
+
 
 def load_embeddings_model():
     logger.debug('Loading embedding model')
-    return SentenceTransformerEmbeddings(
-        model_name="all-MiniLM-L6-v2"
+    embedder = SentenceTransformerEmbeddings(
+        model_name=settings.EMBEDDING_MODEL_NAME
         )
+    if settings.EMBEDDING_CACHE_SIZE <= 0:
+        return embedder
+    return CachedEmbeddings(
+        embedder,
+        model_name=settings.EMBEDDING_MODEL_NAME,
+        max_entries=settings.EMBEDDING_CACHE_SIZE,
+        disk_path=settings.EMBEDDING_CACHE_PATH if settings.EMBEDDING_CACHE_DISK_ENABLED else None,
+    )
 
-def load_vector_store():
-    embedder = load_embeddings_model()
+def load_chroma_client(max_retries: int = 3, retry_delay: float = 2):
     logger.debug(f"Connecting to Chroma server at {settings.CHROMA_DB_HOST}:{settings.CHROMA_DB_PORT}...")
-    
-    # Explicitly use HttpClient for remote connections
-    client = chromadb.HttpClient(
-        host=settings.CHROMA_DB_HOST,
-        port=settings.CHROMA_DB_PORT,
-        settings=ChromaSettings(allow_reset=True)
-    )
 
     # Wait for Chroma to be ready (retry mechanism)
-    max_retries = 3
     for i in range(max_retries):
         try:
+            # Explicitly use HttpClient for remote connections
+            client = chromadb.HttpClient(
+                host=settings.CHROMA_DB_HOST,
+                port=settings.CHROMA_DB_PORT,
+                settings=ChromaSettings(allow_reset=True)
+            )
             client.heartbeat()
             logger.info("Successfully connected to Chroma server.")
-            break
+            return client
         except Exception as e:
             if i < max_retries - 1:
-                logger.warning(f"Chroma server not ready yet (attempt {i+1}/{max_retries}). Retrying in 2 seconds...")
-                time.sleep(2)
+                logger.warning(f"Chroma server not ready yet (attempt {i+1}/{max_retries}). Retrying in {retry_delay} seconds...")
+                time.sleep(retry_delay)
             else:
                 logger.error("Could not connect to Chroma server after multiple attempts.")
                 raise e
 
+def load_local_vector_store(embedder: Embeddings) -> LocalVectorStore:
+    return LocalVectorStore(
+        embedder,
+        path=settings.LOCAL_INDEX_PATH,
+        dtype=settings.LOCAL_INDEX_DTYPE,
+        ivf_min_vectors=settings.LOCAL_INDEX_IVF_MIN_VECTORS,
+        nprobe=settings.LOCAL_INDEX_NPROBE,
+        compact_ratio=settings.LOCAL_INDEX_COMPACT_RATIO,
+    )
+
+
+def load_vector_store(embedder: Embeddings | None = None, client=None) -> VectorStore:
+    """Build the configured vector store, reusing an already loaded embedder and client when given."""
+    if embedder is None:
+        embedder = load_embeddings_model()
+    if settings.VECTOR_STORE_BACKEND == "local":
+        return load_local_vector_store(embedder)
+    if client is None:
+        client = load_chroma_client()
+
     return Chroma(
         client=client,
-        collection_name="demo",
+        collection_name=settings.CHROMA_COLLECTION_NAME,
         embedding_function=embedder,
-    )
\ No newline at end of file
+    )
+
+
+def chunk_id(source: str, content: str) -> str:
+    """Deterministic chunk id derived from where the chunk comes from and its text."""
+    return hashlib.sha256(f"{source}\x1f{content}".encode("utf-8")).hexdigest()
+
+
+def document_chunk_id(doc: Document) -> str:
+    # arXiv chunks are keyed by the paper rather than by the query that fetched them, so
+    # overlapping queries map the same abstract to the same ids
+    metadata = doc.metadata or {}
+    source = metadata.get("URL") or metadata.get("title") or metadata.get("source", "")
+    return chunk_id(source, doc.page_content)
+
+
+def retrieved_chunk_id(doc: Document) -> str:
+    """Id of a chunk returned by a search, recomputed for stores that do not return ids."""
+    return doc.id or document_chunk_id(doc)
+
+
+def search_by_vector(vector_store: VectorStore, embedding: list[float], k: int, filter: dict | None = None) -> list[tuple[Document, float]]:
+    """Chunks closest to an already computed query embedding, with their distances."""
+    if isinstance(vector_store, LocalVectorStore):
+        return vector_store.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)
+    return vector_store.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)
+
+
+def search_by_vectors(vector_store: VectorStore, embeddings: list[list[float]], k: int, filter: dict | None = None) -> list[list[tuple[Document, float]]]:
+    """Closest chunks of several query embeddings in one request to the store.
+
+    A chunk returned for several queries is materialised once and shared between
+    their result lists. A metadata ``filter`` is passed to the store as its ``where``.
+    """
+    if not embeddings:
+        return []
+    if isinstance(vector_store, LocalVectorStore):
+        results = vector_store.similarity_search_with_score_by_vectors(embeddings, k=k, filter=filter)
+        shared: dict[str, Document] = {}
+        return [[(shared.setdefault(doc.id, doc), score) for doc, score in hits] for hits in results]
+    response = vector_store._collection.query(
+        query_embeddings=embeddings,
+        n_results=k,
+        where=filter,
+        include=["documents", "metadatas", "distances"],
+    )
+    shared = {}
+    results = []
+    for ids, contents, metadatas, distances in zip(response["ids"], response["documents"], response["metadatas"], response["distances"]):
+        results.append([
+            (shared.setdefault(doc_id, Document(id=doc_id, page_content=content, metadata=metadata or {})), distance)
+            for doc_id, content, metadata, distance in zip(ids, contents, metadatas, distances)
+        ])
+    return results
+
+
+def embed_questions(embedder: Embeddings, questions: list[str]) -> list[list[float]]:
+    """Query embeddings of several questions, in one forward pass when the model allows it."""
+    if isinstance(embedder, CachedEmbeddings):
+        return embedder.embed_queries(questions)
+    if isinstance(embedder, SentenceTransformerEmbeddings):
+        return embedder.embed_documents(questions)
+    return [embedder.embed_query(question) for question in questions]
+
+
+def get_upsert_batch_size(vector_store: VectorStore) -> int:
+    """Largest number of records sent to the vector store in a single upsert call."""
+    if not isinstance(vector_store, Chroma):
+        return settings.CHROMA_MAX_BATCH_SIZE
+    try:
+        server_max = vector_store._client.get_max_batch_size()
+    except Exception as e:
+        logger.warning(f"Could not read Chroma max batch size: {e}")
+        server_max = settings.CHROMA_MAX_BATCH_SIZE
+    return max(1, min(settings.CHROMA_MAX_BATCH_SIZE, server_max))
+
+
+def count_collection_documents(vector_store: VectorStore) -> int:
+    if isinstance(vector_store, LocalVectorStore):
+        return len(vector_store)
+    return vector_store._collection.count()
+
+
+def iter_collection_documents(vector_store: VectorStore, page_size: int = 1000):
+    """Page through every stored chunk, yielding (ids, contents, metadatas) per page."""
+    if isinstance(vector_store, LocalVectorStore):
+        yield from vector_store.iter_documents(page_size)
+        return
+    offset = 0
+    while True:
+        page = vector_store._collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page["ids"], page["documents"], page["metadatas"]
+        offset += len(page["ids"])
+
+
+def get_existing_ids(vector_store: VectorStore, ids: list[str]) -> set[str]:
+    """Subset of ``ids`` already stored in the collection."""
+    if not ids:
+        return set()
+    if isinstance(vector_store, LocalVectorStore):
+        return vector_store.get_existing_ids(ids)
+    return set(vector_store._collection.get(ids=ids, include=[])["ids"])
+
+
+def upsert_embedded_documents(vector_store: VectorStore, ids: list[str], embeddings: list[list[float]], documents: list[Document]) -> None:
+    """Write already embedded documents to the collection in one request."""
+    if isinstance(vector_store, LocalVectorStore):
+        vector_store.upsert(ids, embeddings, [doc.page_content for doc in documents], [doc.metadata for doc in documents])
+    else:
+        vector_store._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=[doc.page_content for doc in documents],
+            metadatas=[doc.metadata for doc in documents],
+        )
+    mark_collection_changed()
+
+
+def delete_documents_where(vector_store: VectorStore, where: dict) -> list[str]:
+    """Delete the chunks whose metadata matches a Chroma-style ``where`` clause; returns their ids."""
+    if isinstance(vector_store, LocalVectorStore):
+        ids = vector_store.get_ids_where(where)
+        vector_store.delete(ids)
+    else:
+        ids = vector_store._collection.get(where=where, include=[])["ids"]
+        if ids:
+            vector_store._collection.delete(ids=ids)
+    if ids:
+        mark_collection_changed()
+    return ids
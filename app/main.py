@@ -1,5 +1,6 @@
 import os
 import threading
+from contextlib import asynccontextmanager
 
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.routing import APIRoute
@@ -10,6 +11,7 @@ from phoenix.otel import register
 
 from app.api.main import api_router
 from app.config import settings
+from app.core.resources import ResourceRegistry
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -27,6 +29,18 @@ tags_metadata = [
         "description": "Fetcher for data from arxiv",
         
     },
+    {
+        "name": "ingestion-jobs",
+        "description": "Background arxiv ingestion jobs",
+    },
+    {
+        "name": "KG",
+        "description": "Knowledge graph construction and queries",
+    },
+    {
+        "name": "health",
+        "description": "Liveness, readiness probes and runtime metrics",
+    },
 ]
 
 
@@ -37,6 +51,18 @@ description = """RAG API for Retrieval Augmented Generation.
 """
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPIOffline):
+    """Build the shared resources once and release them on shutdown."""
+    resources = ResourceRegistry()
+    await resources.startup()
+    app.state.resources = resources
+    try:
+        yield
+    finally:
+        await resources.shutdown()
+
+
 app = FastAPIOffline(
     title=settings.PROJECT_NAME,
     description=description,
@@ -44,6 +70,7 @@ app = FastAPIOffline(
     openapi_tags=tags_metadata,
     root_path=ROOT_URL,
     static_url="/docs",
+    lifespan=lifespan,
 )
 
 app.include_router(api_router)
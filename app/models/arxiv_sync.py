@@ -0,0 +1,22 @@
+from sqlalchemy import Boolean, Column, DateTime, Integer, String
+
+from app.utils.db import Base
+
+
+class ArxivSyncTopic(Base):
+    """A query kept up to date by the incremental arXiv sync, with its watermark"""
+    __tablename__ = "ArxivSyncTopic"
+
+    # Normalized query, see app.core.arxiv_sync.topic_key
+    key = Column(String, primary_key=True)
+    query = Column(String, nullable=False)
+    sort_criterion = Column(String, nullable=False)
+    max_results = Column(Integer, nullable=False)
+    full_text = Column(Boolean, nullable=False, default=False)
+    enabled = Column(Boolean, nullable=False, default=True)
+    # Sort date and arXiv id (without version) of the newest article synced so far
+    watermark_date = Column(DateTime(timezone=True), nullable=True)
+    watermark_arxiv_id = Column(String, nullable=True)
+    last_synced_at = Column(DateTime, nullable=True)
+    last_fetched = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 
@@ -6,10 +6,19 @@ from app.utils.db import Base
 
 class Article(Base):
     __tablename__ = "Article"
+    __table_args__ = (
+        # Dedup key of bulk inserts; rows predating the column may keep it NULL
+        Index("uq_Article_title_key", "title_key", unique=True),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String, nullable=False)
+    title_key = Column(String, nullable=True)
     summary = Column(String, nullable=False)
     llm_summary = Column(String, nullable=True)
     pdf_url = Column(String)
     published = Column(DateTime, default=False)
+
+
+# Keyset pagination walks articles newest first on (published, id)
+Index("ix_Article_published_id", Article.published.desc().nulls_last(), Article.id.desc())
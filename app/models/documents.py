@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, Integer, String
+
+from app.utils.db import Base
+
+
+class IndexedDocument(Base):
+    """Manifest of the local documents indexed by bulk ingestion, one row per document path"""
+    __tablename__ = "IndexedDocument"
+
+    # Path of the file relative to the ingested directory or archive
+    path = Column(String, primary_key=True)
+    # sha256 of the file; a file whose content is already indexed is not indexed again
+    content_hash = Column(String, nullable=False, index=True)
+    size_bytes = Column(Integer, nullable=False)
+    pages = Column(Integer, nullable=True)
+    chunks = Column(Integer, nullable=False)
+    indexed_at = Column(DateTime, nullable=False)
@@ -0,0 +1,21 @@
+from sqlalchemy import Boolean, Column, String, DateTime, Integer
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+
+from app.utils.db import Base
+
+class IngestionJob(Base):
+    __tablename__ = "IngestionJob"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    query = Column(String, nullable=False)
+    max_results = Column(Integer, nullable=False)
+    sort_criterion = Column(String, nullable=False)
+    full_text = Column(Boolean, nullable=False, default=False, server_default="false")
+    status = Column(String, nullable=False, index=True)
+    fetched = Column(Integer, nullable=False, default=0)
+    stored = Column(Integer, nullable=False, default=0)
+    indexed = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
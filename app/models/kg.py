@@ -0,0 +1,34 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, Integer, String
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.utils.db import Base
+
+
+class KGEntity(Base):
+    """Entity dictionary: every paper and extracted entity gets a small integer id"""
+    __tablename__ = "KGEntity"
+    __table_args__ = (
+        Index("uq_KGEntity_type_name_key", "type", "name_key", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False)
+    name_key = Column(String, nullable=False, index=True)
+    # "paper" for papers, the GLiNER2 label (task, method, ...) otherwise
+    type = Column(String, nullable=False)
+    article_id = Column(UUID(as_uuid=True), ForeignKey("Article.id", ondelete="SET NULL"), nullable=True)
+
+
+class KGEdge(Base):
+    __tablename__ = "KGEdge"
+    __table_args__ = (
+        Index("uq_KGEdge_head_relation_tail", "head_id", "relation", "tail_id", unique=True),
+        Index("ix_KGEdge_tail_relation", "tail_id", "relation"),
+        Index("ix_KGEdge_relation", "relation"),
+    )
+
+    # Increasing id, used as the watermark of incremental graph refreshes
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    head_id = Column(Integer, ForeignKey("KGEntity.id", ondelete="CASCADE"), nullable=False)
+    relation = Column(String, nullable=False)
+    tail_id = Column(Integer, ForeignKey("KGEntity.id", ondelete="CASCADE"), nullable=False)
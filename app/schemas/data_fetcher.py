@@ -1,8 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Literal
 from datetime import datetime
 from uuid import UUID
 
+from app.schemas.rag import IndexingStats
+
 
 class Article(BaseModel):
     """article class
@@ -11,6 +13,8 @@ class Article(BaseModel):
     summary: str
     pdf_url: str
     published: datetime
+    # Date of the latest version, as reported by arXiv; not stored
+    updated: datetime | None = None
     llm_summary: str| None= None
 
 class ArticleInDB(Article):
@@ -20,11 +24,71 @@ class ArticleInDB(Article):
         from_attributes = True 
         
         
+class ArticleFilters(BaseModel):
+    """Filters of the stored articles listing"""
+    published_from: datetime | None = None
+    published_to: datetime | None = None
+    title: str | None = None
+
+
+class ArticlePage(BaseModel):
+    items: List[ArticleInDB]
+    # Pass it back as ``cursor`` to get the next page, None on the last page
+    next_cursor: str | None = None
+
+
+class ArticleStoreStats(BaseModel):
+    """Outcome of a bulk insert of articles"""
+    inserted: int = 0
+    skipped: int = 0
+    inserted_ids: List[UUID] = []
+
+    def add(self, other: "ArticleStoreStats") -> None:
+        self.inserted += other.inserted
+        self.skipped += other.skipped
+        self.inserted_ids.extend(other.inserted_ids)
+
+
 class FetchArxivArticleResponse(BaseModel):
     fetched_articles: List[Article]
+    indexing_stats: IndexingStats | None = None
+    storage_stats: ArticleStoreStats | None = None
     
 class FetchArxivArticleRequest(BaseModel):
     query: str
     max_results: int =10
     sort_criterion: Literal["SubmittedDate", "LastUpdatedDate", "Relevance"] = "SubmittedDate"
-    
\ No newline at end of file
+    # Also download the PDFs and index their text, not only the title and abstract
+    full_text: bool = False
+    
+
+class ArxivSyncTopicRequest(BaseModel):
+    """A query to keep up to date; Relevance has no date order to resume from"""
+    query: str
+    sort_criterion: Literal["SubmittedDate", "LastUpdatedDate"] = "SubmittedDate"
+    max_results: int = Field(default=200, ge=1, le=10000)
+    full_text: bool = False
+    enabled: bool = True
+
+
+class ArxivSyncTopic(ArxivSyncTopicRequest):
+    watermark_date: datetime | None = None
+    watermark_arxiv_id: str | None = None
+    last_synced_at: datetime | None = None
+    last_fetched: int = 0
+    last_error: str | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class ArxivSyncResult(BaseModel):
+    """Outcome of one incremental sync of a query: only articles past the watermark are fetched"""
+    query: str
+    fetched: int = 0
+    watermark_date: datetime | None = None
+    watermark_arxiv_id: str | None = None
+    seconds: float = 0.0
+    indexing_stats: IndexingStats | None = None
+    storage_stats: ArticleStoreStats | None = None
+    error: str | None = None
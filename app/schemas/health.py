@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+from typing import Literal
+
+
+class HealthStatus(BaseModel):
+    status: Literal["ok", "unavailable"]
+    components: dict[str, bool] = {}
@@ -0,0 +1,39 @@
+from pydantic import BaseModel
+from typing import List, Literal
+from datetime import datetime
+from uuid import UUID
+
+from app.schemas.data_fetcher import Article, ArticleStoreStats, FetchArxivArticleRequest
+from app.schemas.rag import IndexingStats
+
+IngestionJobStatus = Literal["queued", "running", "succeeded", "failed", "cancelled"]
+
+
+class IngestionProgress(BaseModel):
+    """Number of articles that went through each ingestion stage"""
+    fetched: int = 0
+    stored: int = 0
+    indexed: int = 0
+
+
+class IngestionJob(BaseModel):
+    id: UUID
+    request: FetchArxivArticleRequest
+    status: IngestionJobStatus = "queued"
+    progress: IngestionProgress = IngestionProgress()
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    articles: List[Article] = []
+    indexing_stats: IndexingStats | None = None
+    storage_stats: ArticleStoreStats | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+
+class SubmitIngestionJobResponse(BaseModel):
+    job_id: UUID
+    status: IngestionJobStatus
+    deduplicated: bool = False
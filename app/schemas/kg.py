@@ -5,10 +5,44 @@ class KG_triple(BaseModel):
     head: str
     relation: str
     tail: str
+    # GLiNER2 label of the tail entity (task, method, dataset, metric, concept)
+    tail_type: str | None = None
 
 class KG_triples(BaseModel):
     triples: list[KG_triple]
     
 class ConstructKBFromArticlesRequest(BaseModel):
     articles: list[Article]
-    
\ No newline at end of file
+    
+
+class KGEntity(BaseModel):
+    id: int
+    name: str
+    type: str
+    degree: int = 0
+
+
+class KGNeighbor(KGEntity):
+    hops: int
+
+
+class KGNeighborhood(BaseModel):
+    center: KGEntity
+    nodes: list[KGNeighbor]
+    edges: list[KG_triple]
+
+
+class KGRelatedPaper(BaseModel):
+    paper: KGEntity
+    score: float
+
+
+class KGCooccurrence(BaseModel):
+    entity: KGEntity
+    shared_papers: int
+
+
+class KGArticleTriples(BaseModel):
+    """One line of the /construct-kb stream"""
+    title: str
+    triples: list[KG_triple]
@@ -1,15 +1,162 @@
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, computed_field
+from datetime import datetime
 from typing import Literal
 import json
 
+class ContextStats(BaseModel):
+    """Token accounting of the context sent to the LLM"""
+    chunks: int = 0
+    used_chunks: int = 0
+    papers: int = 0
+    # Tokens of the chunks formatted one by one with their full metadata
+    raw_tokens: int = 0
+    context_tokens: int = 0
+    budget_tokens: int = 0
+    truncated: bool = False
+
+    @computed_field
+    @property
+    def saved_tokens(self) -> int:
+        return max(self.raw_tokens - self.context_tokens, 0)
+
 class AnswerToQuestion(BaseModel):
     answer: str
     relevant_context: str | None = None
     confidence: Literal["low", "medium", "high"] | None = None
+    retrieval_timings: dict[str, float] | None = None
+    context_stats: ContextStats | None = None
     
+class AnswerSource(BaseModel):
+    """A paper the streamed answer is grounded on"""
+    title: str | None = None
+    url: str | None = None
+    publication_date: str | None = None
+    score: float
+    # "distance" (lower is closer), "bm25", "rrf" or "relevance" (cross-encoder, in (0, 1))
+    score_kind: str = "distance"
+
+class StreamMetrics(BaseModel):
+    """Latency of a streamed answer, in ms from the arrival of the request"""
+    ttfb_ms: float | None = None
+    ttft_ms: float | None = None
+    total_ms: float | None = None
+    output_tokens: int = 0
+    tokens_per_second: float | None = None
+
+class AnswerStreamDone(BaseModel):
+    """Payload of the final ``done`` event of a streamed answer"""
+    cached: bool = False
+    metrics: StreamMetrics
+    # Latency of each stage of the request (embedding, searches, context, prompt, generation)
+    timings: dict[str, float] | None = None
+    context_stats: ContextStats | None = None
+
+class RetrievalFilters(BaseModel):
+    """Metadata the retrieved chunks must match, applied before the vector search"""
+    published_from: datetime | None = None
+    published_to: datetime | None = None
+    # arXiv query the papers were first indexed with, or document name; case and spacing are ignored.
+    # Chunks are addressed by content, so a paper fetched again by another query keeps its first source
+    source: str | None = None
+    # Exact paper title, case and spacing are ignored
+    title: str | None = None
+
 class QuestionForDocs(BaseModel):
     question: str
+    # "graph" adds the chunks and triples of the papers sharing the question entities
+    retrieval_mode: Literal["dense", "sparse", "hybrid", "graph"] = "dense"
+    # Only applies when the cross-encoder is enabled (RERANK_ENABLED)
+    rerank: bool = True
+    filters: RetrievalFilters | None = None
+
+class QuestionsForDocs(BaseModel):
+    """Questions answered together, sharing one embedding pass and one vector search"""
+    questions: list[str] = Field(min_length=1)
+    retrieval_mode: Literal["dense", "sparse", "hybrid", "graph"] = "dense"
+    rerank: bool = True
+    filters: RetrievalFilters | None = None
+
+class BatchAnswer(BaseModel):
+    """One NDJSON line of the batch answer stream, in completion order"""
+    index: int
+    question: str
+    answer: AnswerToQuestion | None = None
+    cached: bool = False
+    error: str | None = None
+    latency_ms: float | None = None
+
+class IndexingStats(BaseModel):
+    """Throughput report of a batched indexing run"""
+    documents: int = 0
+    # Articles indexed with the text of their PDF
+    full_texts: int = 0
+    chunks: int = 0
+    skipped_chunks: int = 0
+    embedding_batches: int = 0
+    upsert_batches: int = 0
+    split_seconds: float = 0.0
+    download_seconds: float = 0.0
+    embedding_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    @computed_field
+    @property
+    def chunks_per_second(self) -> float:
+        return round(self.chunks / self.total_seconds, 2) if self.total_seconds else 0.0
+
+    def add(self, other: "IndexingStats") -> None:
+        """Accumulate the counters and timings of another run"""
+        for field in type(self).model_fields:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+class DocumentIndexingProgress(BaseModel):
+    """One NDJSON line of /index-doc, sent after each group of pages is indexed"""
+    file_name: str
+    pages: int = 0
+    total_pages: int | None = None
+    chunks: int = 0
+    elapsed_seconds: float = 0.0
+    done: bool = False
+    # Set on the last line only
+    stats: IndexingStats | None = None
+
+BulkDocumentStatus = Literal["indexed", "unchanged", "duplicate", "failed"]
+
+class BulkDocumentResult(BaseModel):
+    """One NDJSON line of bulk ingestion per document. ``unchanged`` documents are in the
+    manifest with the same content, ``duplicate`` ones have the content of another document"""
+    path: str
+    status: BulkDocumentStatus
+    content_hash: str | None = None
+    pages: int | None = None
+    chunks: int = 0
+    # Chunks of the previous version of the document, deleted before indexing this one
+    replaced_chunks: int = 0
+    duplicate_of: str | None = None
+    error: str | None = None
+
+class BulkIngestionReport(BaseModel):
+    """Last NDJSON line of bulk ingestion: document counts and throughput of the run"""
+    documents: int = 0
+    indexed: int = 0
+    unchanged: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    pages: int = 0
+    total_seconds: float = 0.0
+    stats: IndexingStats = IndexingStats()
+
+    @computed_field
+    @property
+    def documents_per_second(self) -> float:
+        return round(self.indexed / self.total_seconds, 2) if self.total_seconds else 0.0
+
+    @computed_field
+    @property
+    def chunks_per_second(self) -> float:
+        return round(self.stats.chunks / self.total_seconds, 2) if self.total_seconds else 0.0
 
 def _parse_final_answer(message_content: str) -> AnswerToQuestion:
     try:
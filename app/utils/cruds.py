@@ -1,7 +1,25 @@
+import re
+
+from datetime import datetime
+
+from sqlalchemy import Select, and_, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import  Session
 from typing import List, Optional
 from uuid import UUID
 from app.models.data_fetcher import Article
+from app.schemas.data_fetcher import ArticleFilters, ArticleStoreStats
+from app.schemas.kg import KG_triple
+
+# Rows per INSERT statement, 6 columns keeps it far below the 32767 bind parameters limit
+BULK_INSERT_BATCH_SIZE = 1000
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_title(title: str) -> str:
+    """Dedup key of an article title: case, punctuation and whitespace are ignored."""
+    return " ".join(_WORD_RE.findall(title.casefold()))
 
 # CRUD Operations
 
@@ -40,6 +58,38 @@ class ArticleCRUD:
         
         return db.query(Article).offset(skip).limit(limit).all()
     
+    @staticmethod
+    def articles_query(filters: ArticleFilters, after: tuple[datetime | None, UUID] | None = None) -> Select:
+        """Filtered articles, newest first, starting after the ``(published, id)`` keyset ``after``.
+
+        Articles without a publication date come last, ordered by id.
+        """
+        from app.models.data_fetcher import Article
+
+        query = select(Article).order_by(Article.published.desc().nulls_last(), Article.id.desc())
+        if filters.published_from is not None:
+            query = query.where(Article.published >= filters.published_from)
+        if filters.published_to is not None:
+            query = query.where(Article.published <= filters.published_to)
+        if filters.title:
+            pattern = filters.title.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            query = query.where(Article.title.ilike(f"%{pattern}%"))
+        if after is not None:
+            published, article_id = after
+            if published is None:
+                query = query.where(and_(Article.published.is_(None), Article.id < article_id))
+            else:
+                query = query.where(or_(
+                    tuple_(Article.published, Article.id) < tuple_(published, article_id),
+                    Article.published.is_(None),
+                ))
+        return query
+
+    @staticmethod
+    def get_articles_page(db: Session, filters: ArticleFilters, after: tuple[datetime | None, UUID] | None = None, limit: int = 100) -> List['Article']:
+        """Get one page of filtered articles with keyset pagination"""
+        return db.execute(ArticleCRUD.articles_query(filters, after).limit(limit)).scalars().all()
+
     @staticmethod
     def update_article(db: Session, article_id: UUID, article_data: dict) -> Optional['Article']:
         """Update an existing article"""
@@ -66,28 +116,133 @@ class ArticleCRUD:
         return False
     
     @staticmethod
-    def bulk_create_articles(db: Session, articles_data: List[dict]) -> List['Article']:
-        """Create multiple articles at once"""
+    def bulk_create_articles(db: Session, articles_data: List[dict], batch_size: int = BULK_INSERT_BATCH_SIZE) -> ArticleStoreStats:
+        """Create multiple articles at once, skipping the ones whose normalized title is already stored.
+
+        Each batch is a single ``INSERT ... ON CONFLICT DO NOTHING RETURNING id`` statement,
+        so the database does the duplicate check and only new ids come back.
+        """
         from app.models.data_fetcher import Article
-        
-        db_articles = []
+
+        stats = ArticleStoreStats()
+        rows = [{**article_data, "title_key": normalize_title(article_data["title"])} for article_data in articles_data]
         try:
-            for article_data in articles_data:
-                # Check if article already exists by title
-                existing = db.query(Article).filter(Article.title == article_data.get('title')).first()
-                if not existing:
-                    db_article = Article(**article_data)
-                    db.add(db_article)
-                    db_articles.append(db_article)
-            
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                statement = (
+                    insert(Article)
+                    .values(batch)
+                    .on_conflict_do_nothing(index_elements=[Article.title_key])
+                    .returning(Article.id)
+                )
+                inserted_ids = db.execute(statement).scalars().all()
+                stats.inserted += len(inserted_ids)
+                stats.skipped += len(batch) - len(inserted_ids)
+                stats.inserted_ids.extend(inserted_ids)
             db.commit()
-            for article in db_articles:
-                db.refresh(article)
-            return db_articles
+            return stats
         except Exception as e:
             db.rollback()
             raise e
 
 
+
+def normalize_entity_name(name: str) -> str:
+    """Dictionary key of a KG entity name"""
+    return " ".join(name.casefold().split())
+
+
+class KGCRUD:
+    """CRUD operations for the knowledge graph tables"""
+
+    @staticmethod
+    def _get_or_create_entities(db: Session, entities: dict[tuple[str, str], dict], batch_size: int) -> dict[tuple[str, str], int]:
+        from app.models.kg import KGEntity
+
+        ids: dict[tuple[str, str], int] = {}
+        rows = list(entities.values())
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            db.execute(
+                insert(KGEntity)
+                .values(batch)
+                .on_conflict_do_nothing(index_elements=[KGEntity.type, KGEntity.name_key])
+            )
+            found = db.execute(
+                select(KGEntity.id, KGEntity.type, KGEntity.name_key).where(
+                    tuple_(KGEntity.type, KGEntity.name_key).in_([(row["type"], row["name_key"]) for row in batch])
+                )
+            ).all()
+            ids.update({(entity_type, key): entity_id for entity_id, entity_type, key in found})
+        return ids
+
+    @staticmethod
+    def add_triples(db: Session, triples: List['KG_triple'], batch_size: int = BULK_INSERT_BATCH_SIZE) -> dict[str, int]:
+        """Store triples whose head is a paper title; entities and edges already stored are reused.
+
+        Paper entities are linked to the ``Article`` sharing their normalized title.
+        Returns the number of edges inserted and skipped.
+        """
+        from app.models.data_fetcher import Article
+        from app.models.kg import KGEdge, KGEntity
+
+        entities: dict[tuple[str, str], dict] = {}
+        edges = []
+        for triple in triples:
+            head = ("paper", normalize_title(triple.head))
+            tail = (triple.tail_type or "entity", normalize_entity_name(triple.tail))
+            entities.setdefault(head, {"type": "paper", "name_key": head[1], "name": triple.head})
+            entities.setdefault(tail, {"type": tail[0], "name_key": tail[1], "name": triple.tail})
+            edges.append((head, triple.relation, tail))
+
+        try:
+            ids = KGCRUD._get_or_create_entities(db, entities, batch_size)
+            paper_keys = [key for entity_type, key in entities if entity_type == "paper"]
+            if paper_keys:
+                db.execute(
+                    update(KGEntity)
+                    .where(KGEntity.type == "paper", KGEntity.article_id.is_(None), KGEntity.name_key.in_(paper_keys))
+                    .where(Article.title_key == KGEntity.name_key)
+                    .values(article_id=Article.id)
+                )
+            rows = [
+                {"head_id": ids[head], "relation": relation, "tail_id": ids[tail]}
+                for head, relation, tail in dict.fromkeys(edges)
+            ]
+            inserted = 0
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                inserted += len(db.execute(
+                    insert(KGEdge)
+                    .values(batch)
+                    .on_conflict_do_nothing(index_elements=[KGEdge.head_id, KGEdge.relation, KGEdge.tail_id])
+                    .returning(KGEdge.id)
+                ).all())
+            db.commit()
+            return {"inserted_edges": inserted, "skipped_edges": len(rows) - inserted}
+        except Exception as e:
+            db.rollback()
+            raise e
+
+    @staticmethod
+    def get_entities_since(db: Session, after_id: int = 0) -> list[tuple]:
+        """(id, name, type) of the entities created after ``after_id``, by id"""
+        from app.models.kg import KGEntity
+
+        return db.execute(
+            select(KGEntity.id, KGEntity.name, KGEntity.type).where(KGEntity.id > after_id).order_by(KGEntity.id)
+        ).all()
+
+    @staticmethod
+    def get_edges_since(db: Session, after_id: int = 0) -> list[tuple]:
+        """(id, head_id, relation, tail_id) of the edges created after ``after_id``, by id"""
+        from app.models.kg import KGEdge
+
+        return db.execute(
+            select(KGEdge.id, KGEdge.head_id, KGEdge.relation, KGEdge.tail_id).where(KGEdge.id > after_id).order_by(KGEdge.id)
+        ).all()
+
+
 # Create CRUD instance
-article_crud = ArticleCRUD()
\ No newline at end of file
+article_crud = ArticleCRUD()
+kg_crud = KGCRUD()
@@ -1,7 +1,15 @@
-from sqlalchemy import create_engine
-from sqlalchemy.engine import URL
+import threading
+import time
+from contextvars import ContextVar
+
+from loguru import logger
+from sqlalchemy import Connection, create_engine, text
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
 
 url = URL.create(
@@ -13,13 +21,93 @@ url = URL.create(
     password=settings.PG_password
 )
 
-engine = create_engine(url)
+# QueuePool._do_get calls itself again when it loses an overflow race; only the
+# outermost call of a checkout is timed
+_checkout_depth: ContextVar[int] = ContextVar("checkout_depth", default=0)
+
+
+class _InstrumentedPoolMixin:
+    """Records how long checkouts wait for a connection and how many time out."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        depth = _checkout_depth.get()
+        token = _checkout_depth.set(depth + 1)
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            _checkout_depth.reset(token)
+            if depth == 0:
+                waited = time.perf_counter() - started
+                with self._stats_lock:
+                    self.checkouts += 1
+                    self.timeouts += timed_out
+                    self.total_wait_seconds += waited
+                    self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "checked_in": self.checkedin(),
+                "overflow": max(0, self.overflow()),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            }
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def create_db_engine(db_url: URL = url) -> Engine:
+    """Sync engine with the pool sized from the settings."""
+    return create_engine(db_url, poolclass=InstrumentedQueuePool, **_pool_options())
+
+
+def create_async_db_engine(db_url: URL = url) -> AsyncEngine:
+    """asyncpg engine for the async routes, sharing the pool settings of the sync one."""
+    return create_async_engine(db_url.set(drivername="postgresql+asyncpg"), poolclass=InstrumentedAsyncQueuePool, **_pool_options())
+
+
+engine = create_db_engine()
+async_engine = create_async_db_engine()
 
 # Create declarative base for models
 Base = declarative_base()
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 # Database dependency
 def get_db() -> Session: #type: ignore
@@ -31,7 +119,66 @@ def get_db() -> Session: #type: ignore
         db.close()
 
 
+async def get_async_db() -> AsyncSession: #type: ignore
+    """Get async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_stats() -> dict:
+    """Connection pool gauges and checkout wait times of both engines."""
+    return {
+        "sync": engine.pool.stats(),
+        "async": async_engine.pool.stats(),
+    }
+
+
+def upgrade_schema(conn: Connection) -> None:
+    """Bring tables created by older versions up to date; create_all never alters tables."""
+    from app.utils.cruds import normalize_title
+
+    conn.execute(text('ALTER TABLE "Article" ADD COLUMN IF NOT EXISTS title_key VARCHAR'))
+    missing = conn.execute(text('SELECT id, title FROM "Article" WHERE title_key IS NULL')).all()
+    if missing:
+        # Rows that collide on the normalized title keep a NULL key instead of being deleted
+        seen = set(conn.execute(text('SELECT title_key FROM "Article" WHERE title_key IS NOT NULL')).scalars())
+        updates = []
+        for article_id, title in missing:
+            key = normalize_title(title)
+            if key not in seen:
+                seen.add(key)
+                updates.append({"id": article_id, "title_key": key})
+        if updates:
+            conn.execute(text('UPDATE "Article" SET title_key = :title_key WHERE id = :id'), updates)
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS "uq_Article_title_key" ON "Article" (title_key)'))
+    conn.execute(text('ALTER TABLE "IngestionJob" ADD COLUMN IF NOT EXISTS full_text BOOLEAN NOT NULL DEFAULT false'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS "ix_Article_published_id" ON "Article" (published DESC NULLS LAST, id DESC)'))
+
+    # Trigram index for the title search; the extension needs privileges the app user may lack
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text('CREATE INDEX IF NOT EXISTS "ix_Article_title_trgm" ON "Article" USING gin (title gin_trgm_ops)'))
+    except Exception as e:
+        logger.warning(f"Title search will not be indexed, could not set up pg_trgm: {e}")
+
+
 # Initialize database tables
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        upgrade_schema(conn)
+
+
+async def init_async_db():
+    """Initialize database tables over the async engine"""
+    import app.models.arxiv_sync  # noqa: F401  (register models on Base.metadata)
+    import app.models.data_fetcher  # noqa: F401
+    import app.models.documents  # noqa: F401
+    import app.models.jobs  # noqa: F401
+    import app.models.kg  # noqa: F401
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
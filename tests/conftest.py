@@ -0,0 +1,38 @@
+import hashlib
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic unit vectors derived from the text, so tests need no model."""
+
+    def __init__(self, dim: int = 16) -> None:
+        self.dim = dim
+        self.embedded = 0
+
+    def _embed(self, text: str) -> list[float]:
+        rng = np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:8], 16))
+        vector = rng.standard_normal(self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.embedded += len(texts)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+@pytest.fixture
+def embeddings() -> HashEmbeddings:
+    return HashEmbeddings()
+
+
+@pytest.fixture
+def local_store(embeddings, tmp_path):
+    from app.core.local_vector_store import LocalVectorStore
+
+    # Tombstones are kept: the tests that compact do it explicitly
+    return LocalVectorStore(embeddings, path=str(tmp_path / "index"), compact_ratio=2.0)
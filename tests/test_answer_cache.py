@@ -0,0 +1,32 @@
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.vector_db import mark_collection_changed
+
+
+def test_lookup_matches_similar_questions_in_the_same_namespace():
+    cache = SemanticAnswerCache(threshold=0.9, ttl_seconds=60, max_entries=10)
+    assert cache.store("a", [1.0, 0.0], "answer", cache.version())
+    assert cache.lookup("a", [0.99, 0.05]) == "answer"
+    assert cache.lookup("a", [0.0, 1.0]) is None
+    assert cache.lookup("b", [1.0, 0.0]) is None
+
+
+def test_max_entries_caps_the_whole_cache():
+    cache = SemanticAnswerCache(threshold=0.9, ttl_seconds=60, max_entries=3)
+    for i in range(5):
+        cache.store(f"namespace-{i}", [1.0, 0.0], i, cache.version())
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["namespaces"] == 3
+    # The oldest answers were evicted first
+    assert cache.lookup("namespace-1", [1.0, 0.0]) is None
+    assert cache.lookup("namespace-4", [1.0, 0.0]) == 4
+
+
+def test_answers_generated_before_an_invalidation_are_not_stored():
+    cache = SemanticAnswerCache(threshold=0.9, ttl_seconds=60, max_entries=10)
+    version = cache.version()
+    assert cache.lookup("a", [1.0, 0.0]) is None
+    mark_collection_changed()
+    assert not cache.store("a", [1.0, 0.0], "stale", version)
+    assert cache.lookup("a", [1.0, 0.0]) is None
+    assert cache.store("a", [1.0, 0.0], "fresh", cache.version())
+    assert cache.lookup("a", [1.0, 0.0]) == "fresh"
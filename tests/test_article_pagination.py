@@ -0,0 +1,63 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+
+from app.api.routes import data_fetcher as routes
+from app.core.data_fetcher import decode_article_cursor, encode_article_cursor
+from app.models.data_fetcher import Article
+from app.schemas.data_fetcher import ArticleFilters, ArticleInDB
+from app.utils.cruds import article_crud
+
+
+def test_cursor_round_trip():
+    article = ArticleInDB(id=uuid.uuid4(), title="t", summary="", pdf_url="", published=datetime(2024, 5, 1, 12, 30))
+    assert decode_article_cursor(encode_article_cursor(article)) == (article.published, article.id)
+
+
+def test_invalid_cursor_is_a_value_error():
+    with pytest.raises(ValueError):
+        decode_article_cursor("not-a-cursor")
+
+
+def test_keyset_pages_walk_every_article_once():
+    engine = create_engine("sqlite://")
+    # Without the indexes: SQLite does not support NULLS LAST in them
+    with engine.begin() as connection:
+        connection.execute(CreateTable(Article.__table__))
+    start = datetime(2024, 1, 1)
+    with Session(engine) as session:
+        # Equal dates are ordered by id, and undated articles come last
+        session.add_all(
+            Article(id=uuid.uuid4(), title=f"paper {i}", summary="", pdf_url="", published=start + timedelta(days=i // 2))
+            for i in range(11)
+        )
+        session.execute(update(Article).where(Article.published >= start + timedelta(days=4)).values(published=None))
+        session.commit()
+
+        seen: list[uuid.UUID] = []
+        after = None
+        while True:
+            page = article_crud.get_articles_page(session, ArticleFilters(), after=after, limit=3)
+            seen.extend(article.id for article in page)
+            if len(page) < 3:
+                break
+            after = decode_article_cursor(encode_article_cursor(page[-1]))
+
+        expected = [article.id for article in session.execute(article_crud.articles_query(ArticleFilters())).scalars()]
+    assert seen == expected
+    assert len(set(seen)) == 11
+
+
+def test_listing_endpoint_keeps_returning_a_bare_list(monkeypatch):
+    article = ArticleInDB(id=uuid.uuid4(), title="t", summary="", pdf_url="", published=datetime(2024, 5, 1))
+
+    async def stream(filters):
+        yield article
+
+    monkeypatch.setattr(routes, "stream_articles_from_db", stream)
+    assert asyncio.run(routes.api_get_stored_arxiv_articles(ArticleFilters())) == [article]
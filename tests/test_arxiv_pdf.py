@@ -0,0 +1,52 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.arxiv_pdf import ArxivPdfFetcher, parse_arxiv_id
+from app.schemas.data_fetcher import Article
+
+
+@pytest.mark.parametrize(
+    ("url", "expected"),
+    [
+        ("http://arxiv.org/pdf/2401.01234v2", ("2401.01234", "v2")),
+        ("https://arxiv.org/abs/2401.01234", ("2401.01234", "")),
+        ("http://arxiv.org/pdf/2401.01234v1.pdf", ("2401.01234", "v1")),
+        ("http://arxiv.org/abs/hep-th/9901001v3", ("hep-th/9901001", "v3")),
+        ("http://arxiv.org/abs/math.GT/0309136", ("math.GT/0309136", "")),
+        ("https://example.com/paper.pdf", None),
+    ],
+)
+def test_parse_arxiv_id(url, expected):
+    assert parse_arxiv_id(url) == expected
+
+
+def test_latest_pdfs_are_downloaded_again_once_stale(tmp_path):
+    source = tmp_path / "mirror"
+    source.mkdir()
+    (source / "2401.01234.pdf").write_bytes(b"%PDF-1 first")
+    published = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    versioned = Article(title="t", summary="", pdf_url="http://arxiv.org/pdf/2401.01234v1", published=published)
+    latest = Article(title="t", summary="", pdf_url="http://arxiv.org/pdf/2401.01234", published=published)
+
+    async def run():
+        async with ArxivPdfFetcher(cache_dir=str(tmp_path / "cache"), base_url=source.as_uri(), latest_ttl_seconds=3600) as fetcher:
+            path = await fetcher.fetch(latest)
+            assert fetcher.is_cached(path, latest, "")
+            # Revised after the download: the cached copy is an older version
+            revised = latest.model_copy(update={"updated": datetime.now(timezone.utc) + timedelta(minutes=1)})
+            assert not fetcher.is_cached(path, revised, "")
+            (source / "2401.01234.pdf").write_bytes(b"%PDF-1 second")
+            await fetcher.fetch(revised)
+            assert open(path, "rb").read() == b"%PDF-1 second"
+            # A versioned entry never goes stale
+            os.makedirs(os.path.dirname(fetcher.cache_path("2401.01234", "v1")), exist_ok=True)
+            open(fetcher.cache_path("2401.01234", "v1"), "wb").close()
+            os.utime(fetcher.cache_path("2401.01234", "v1"), (0, 0))
+            assert fetcher.is_cached(fetcher.cache_path("2401.01234", "v1"), versioned, "v1")
+            os.utime(path, (0, 0))
+            assert not fetcher.is_cached(path, latest, "")
+
+    asyncio.run(run())
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timezone
+
+import arxiv
+
+from app.core import arxiv_sync
+from app.core.data_fetcher import _is_newer
+from app.schemas.data_fetcher import Article, ArticleStoreStats, ArxivSyncTopic, FetchArxivArticleResponse
+
+WATERMARK = datetime(2024, 1, 10, tzinfo=timezone.utc)
+
+
+def article(arxiv_id: str, published: datetime, updated: datetime | None = None) -> Article:
+    return Article(title=arxiv_id, summary="", pdf_url=f"http://arxiv.org/pdf/{arxiv_id}v1", published=published, updated=updated)
+
+
+def test_is_newer_against_watermark():
+    criterion = arxiv.SortCriterion.SubmittedDate
+    assert _is_newer(article("2401.00002", datetime(2024, 1, 11, tzinfo=timezone.utc)), criterion, (WATERMARK, "2401.00001")) is True
+    # Same date: only the watermark article itself is not newer
+    assert _is_newer(article("2401.00001", WATERMARK), criterion, (WATERMARK, "2401.00001")) is False
+    assert _is_newer(article("2401.00003", WATERMARK), criterion, (WATERMARK, "2401.00001")) is True
+    # Older than the watermark: the newest-first results have gone past it
+    assert _is_newer(article("2401.00000", datetime(2024, 1, 9, tzinfo=timezone.utc)), criterion, (WATERMARK, "2401.00001")) is None
+
+
+def test_is_newer_uses_the_update_date_when_sorting_by_it():
+    updated = article("2301.00001", datetime(2023, 1, 1, tzinfo=timezone.utc), updated=datetime(2024, 2, 1, tzinfo=timezone.utc))
+    assert _is_newer(updated, arxiv.SortCriterion.LastUpdatedDate, (WATERMARK, None)) is True
+    assert _is_newer(updated, arxiv.SortCriterion.SubmittedDate, (WATERMARK, None)) is None
+
+
+class _NoDatabase:
+    async def __aenter__(self):
+        raise ConnectionError("no database in tests")
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+def _sync(monkeypatch, storage_stats: ArticleStoreStats):
+    fetched = [article("2401.00005", datetime(2024, 1, 12, tzinfo=timezone.utc))]
+
+    async def ingest_arxiv_query(*args, **kwargs):
+        return FetchArxivArticleResponse(fetched_articles=fetched, storage_stats=storage_stats)
+
+    monkeypatch.setattr(arxiv_sync, "ingest_arxiv_query", ingest_arxiv_query)
+    monkeypatch.setattr(arxiv_sync, "AsyncSessionLocal", _NoDatabase)
+    topic = ArxivSyncTopic(
+        query="llm", sort_criterion="SubmittedDate", max_results=10, full_text=False, enabled=True,
+        watermark_date=WATERMARK, watermark_arxiv_id="2401.00001", last_fetched=0,
+    )
+    return asyncio.run(arxiv_sync.sync_arxiv_topic(topic, vector_store=None))
+
+
+def test_watermark_moves_once_the_delta_is_stored(monkeypatch):
+    result = _sync(monkeypatch, ArticleStoreStats(inserted=1))
+    assert result.error is None
+    assert result.watermark_arxiv_id == "2401.00005"
+
+
+def test_watermark_stays_when_the_delta_was_not_stored(monkeypatch):
+    result = _sync(monkeypatch, ArticleStoreStats())
+    assert result.error is not None
+    assert result.watermark_date == WATERMARK
+    assert result.watermark_arxiv_id == "2401.00001"
@@ -0,0 +1,136 @@
+import asyncio
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from app.core import bulk_ingestion
+from app.core.bulk_ingestion import ArchiveTooLarge, LocalDocument, _classify, collect_documents, extract_archive, ingest_local_documents, unique_document_name
+from app.core.sparse_index import BM25Index
+from app.schemas.rag import BulkIngestionReport
+
+
+def test_classify_skips_unchanged_and_duplicate_documents():
+    documents = [
+        LocalDocument(path="a.txt", file_path="", content_hash="h1"),
+        LocalDocument(path="b.txt", file_path="", content_hash="h2"),
+        LocalDocument(path="c.txt", file_path="", content_hash="h3"),
+        LocalDocument(path="d.txt", file_path="", content_hash="h3"),
+        LocalDocument(path="e.txt", file_path="", content_hash="h4"),
+    ]
+    by_path = {"a.txt": "h1", "b.txt": "old"}
+    by_hash = {"h1": "a.txt", "old": "b.txt", "h4": "elsewhere.txt"}
+    results = {document.path: result for document, result in _classify(documents, by_path, by_hash, force=False)}
+    assert results["a.txt"].status == "unchanged"
+    assert results["b.txt"] is None
+    assert results["c.txt"] is None
+    assert (results["d.txt"].status, results["d.txt"].duplicate_of) == ("duplicate", "c.txt")
+    assert (results["e.txt"].status, results["e.txt"].duplicate_of) == ("duplicate", "elsewhere.txt")
+
+    forced = {document.path: result for document, result in _classify(documents, by_path, by_hash, force=True)}
+    assert forced["a.txt"] is None and forced["e.txt"] is None
+    assert forced["d.txt"].status == "duplicate"
+
+
+def test_unique_document_name():
+    taken: set[str] = set()
+    assert [unique_document_name(name, taken) for name in ["a.pdf", "a.pdf", "a.pdf", "docs.tar.gz", "docs.tar.gz"]] == [
+        "a.pdf", "a (2).pdf", "a (3).pdf", "docs.tar.gz", "docs (2).tar.gz",
+    ]
+
+
+def test_extract_archive_keeps_documents_inside_the_destination(tmp_path):
+    archive = tmp_path / "docs.zip"
+    with zipfile.ZipFile(archive, "w") as f:
+        f.writestr("notes/a.txt", "a")
+        f.writestr("../escape.txt", "b")
+        f.writestr("image.png", "c")
+        f.writestr("B.TXT", "d")
+    documents = extract_archive(str(archive), str(tmp_path / "out"), prefix="docs.zip")
+    assert sorted(document.path for document in documents) == ["docs.zip/B.TXT", "docs.zip/notes/a.txt"]
+    assert not (tmp_path / "escape.txt").exists()
+
+
+def test_extract_archive_limits_members_and_extracted_bytes(tmp_path):
+    archive = tmp_path / "docs.zip"
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as f:
+        for i in range(3):
+            f.writestr(f"{i}.txt", "x" * 1000)
+    with pytest.raises(ArchiveTooLarge):
+        extract_archive(str(archive), str(tmp_path / "members"), max_members=2)
+    with pytest.raises(ArchiveTooLarge):
+        extract_archive(str(archive), str(tmp_path / "bytes"), max_bytes=2500)
+    assert len(extract_archive(str(archive), str(tmp_path / "fits"), max_members=3, max_bytes=3000)) == 3
+
+
+def test_extract_archive_stops_a_compressed_bomb(tmp_path):
+    archive = tmp_path / "bomb.tar.gz"
+    payload = b"\0" * (4 << 20)
+    with tarfile.open(archive, "w:gz") as f:
+        member = tarfile.TarInfo("bomb.txt")
+        member.size = len(payload)
+        f.addfile(member, io.BytesIO(payload))
+    assert archive.stat().st_size < 64 * 1024
+    with pytest.raises(ArchiveTooLarge):
+        extract_archive(str(archive), str(tmp_path / "out"), max_bytes=1 << 20)
+
+
+def test_collect_documents_names_files_relative_to_the_directory(tmp_path):
+    (tmp_path / "corpus" / "sub").mkdir(parents=True)
+    (tmp_path / "corpus" / "sub" / "a.txt").write_text("a")
+    (tmp_path / "corpus" / "skip.md").write_text("b")
+    extraction = tmp_path / "extracted"
+    extraction.mkdir()
+    documents = collect_documents([str(tmp_path / "corpus")], str(extraction))
+    assert [document.path for document in documents] == ["corpus/sub/a.txt"]
+
+
+@pytest.fixture
+def manifest(monkeypatch):
+    manifest: dict[str, str] = {}
+
+    async def load_manifest(documents):
+        return dict(manifest), {content_hash: path for path, content_hash in manifest.items()}
+
+    async def save_manifest(results):
+        manifest.update((document.path, document.content_hash) for document, _ in results)
+
+    async def run_in_pdf_pool(func, *args):
+        return func(*args)
+
+    monkeypatch.setattr(bulk_ingestion, "load_manifest", load_manifest)
+    monkeypatch.setattr(bulk_ingestion, "save_manifest", save_manifest)
+    monkeypatch.setattr(bulk_ingestion, "run_in_pdf_pool", run_in_pdf_pool)
+    return manifest
+
+
+def _ingest(documents, vector_store, sparse_index):
+    async def run():
+        return [result async for result in ingest_local_documents(documents, vector_store, sparse_index=sparse_index)]
+    return asyncio.run(run())
+
+
+def test_changed_document_replaces_its_previous_chunks(manifest, local_store, tmp_path):
+    sparse_index = BM25Index()
+    path = tmp_path / "notes.txt"
+    path.write_text("the first version talks about transformers")
+    _ingest([LocalDocument(path="notes.txt", file_path=str(path))], local_store, sparse_index)
+    assert len(local_store) == 1
+
+    unchanged = _ingest([LocalDocument(path="notes.txt", file_path=str(path))], local_store, sparse_index)
+    assert unchanged[0].status == "unchanged"
+
+    # A single upload with the same file name is not a version of the bulk document
+    local_store.add_texts(["an unrelated upload about transformers"], metadatas=[{"source": "notes.txt"}], ids=["upload"])
+
+    path.write_text("the second version talks about diffusion models")
+    results = _ingest([LocalDocument(path="notes.txt", file_path=str(path))], local_store, sparse_index)
+    assert (results[0].status, results[0].replaced_chunks) == ("indexed", 1)
+    assert isinstance(results[-1], BulkIngestionReport)
+    assert len(local_store) == 2
+    assert len(sparse_index) == 1
+    local_store.delete(["upload"])
+    hits = local_store.similarity_search("transformers", k=5)
+    assert [doc.page_content for doc in hits] == ["the second version talks about diffusion models"]
+    assert sparse_index.search_documents("transformers", 5) == []
@@ -0,0 +1,60 @@
+import asyncio
+
+import chromadb
+from langchain_core.documents.base import Document
+
+from app.commands.dedup_collection import dedup_collection
+from app.core.rag import index_documents_batched
+from app.core.vector_db import chunk_id, document_chunk_id
+
+
+def test_arxiv_chunks_are_keyed_by_paper_not_query():
+    first = Document(page_content="abstract", metadata={"URL": "http://arxiv.org/abs/1", "source": "llm"})
+    second = Document(page_content="abstract", metadata={"URL": "http://arxiv.org/abs/1", "source": "transformers"})
+    assert document_chunk_id(first) == document_chunk_id(second)
+
+
+def test_chunk_id_depends_on_source_and_content():
+    assert chunk_id("a", "text") != chunk_id("b", "text")
+    assert chunk_id("a", "text") != chunk_id("a", "other text")
+    # The separator keeps "ab" + "c" apart from "a" + "bc"
+    assert chunk_id("ab", "c") != chunk_id("a", "bc")
+
+
+def test_indexing_skips_repeated_and_stored_chunks(local_store, embeddings):
+    documents = [
+        Document(page_content="first", metadata={"source": "doc"}),
+        Document(page_content="first", metadata={"source": "doc"}),
+        Document(page_content="second", metadata={"source": "doc"}),
+    ]
+    stats = asyncio.run(index_documents_batched(documents, local_store))
+    assert len(local_store) == 2
+    assert embeddings.embedded == 2
+
+    stats = asyncio.run(index_documents_batched(documents, local_store))
+    assert len(local_store) == 2
+    assert embeddings.embedded == 2
+    assert stats.skipped_chunks == 3
+
+
+def test_dedup_collection_keeps_one_record_per_content_id():
+    client = chromadb.EphemeralClient()
+    collection = client.get_or_create_collection("dedup-test")
+    metadata = {"URL": "http://arxiv.org/abs/1", "source": "llm"}
+    target = document_chunk_id(Document(page_content="abstract", metadata=metadata))
+    collection.add(
+        ids=["random-1", "random-2", "other"],
+        documents=["abstract", "abstract", "another abstract"],
+        metadatas=[metadata, metadata, metadata],
+        embeddings=[[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]],
+    )
+
+    report = dedup_collection(collection, page_size=2, dry_run=True)
+    assert report == {"records": 3, "unique_chunks": 2, "rekeyed": 2, "deleted": 1}
+    assert collection.count() == 3
+
+    dedup_collection(collection, page_size=2)
+    ids = set(collection.get()["ids"])
+    assert len(ids) == 2
+    assert target in ids
+    client.delete_collection("dedup-test")
@@ -0,0 +1,26 @@
+import asyncio
+
+from langchain_core.documents.base import Document
+
+from app.config import settings
+from app.core import rag
+
+
+def test_embedding_batches_never_exceed_the_upsert_cap(monkeypatch, local_store):
+    monkeypatch.setattr(settings, "CHROMA_MAX_BATCH_SIZE", 3)
+    upserted: list[int] = []
+    upsert = rag.upsert_embedded_documents
+
+    def recording_upsert(vector_store, ids, embeddings, documents):
+        upserted.append(len(ids))
+        upsert(vector_store, ids, embeddings, documents)
+
+    monkeypatch.setattr(rag, "upsert_embedded_documents", recording_upsert)
+    documents = [Document(page_content=f"chunk {i}", metadata={"source": "doc"}) for i in range(10)]
+
+    stats = asyncio.run(rag.index_documents_batched(documents, local_store, batch_size=8))
+
+    assert sum(upserted) == 10
+    assert max(upserted) <= 3
+    assert stats.embedding_batches == 4
+    assert len(local_store) == 10
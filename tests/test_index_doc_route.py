@@ -0,0 +1,37 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import deps
+from app.api.routes import rag as rag_routes
+from app.core.sparse_index import BM25Index
+
+
+@pytest.fixture
+def client(local_store, tmp_path, monkeypatch):
+    spool_upload = rag_routes.spool_upload
+    monkeypatch.setattr(rag_routes, "spool_upload", lambda file, **kwargs: spool_upload(file, directory=str(tmp_path / "uploads"), **kwargs))
+    app = FastAPI()
+    app.include_router(rag_routes.router)
+    app.dependency_overrides[deps.get_vector_store] = lambda: local_store
+    app.dependency_overrides[deps.get_sparse_index] = lambda: BM25Index()
+    return TestClient(app)
+
+
+def test_index_doc_answers_the_chunk_count_by_default(client, local_store):
+    response = client.post("/index-doc", files={"file": ("notes.txt", b"transformers and attention " * 100)})
+    assert response.status_code == 200
+    assert response.json() == len(local_store) > 0
+
+
+def test_index_doc_streams_progress_on_request(client):
+    response = client.post("/index-doc", params={"stream": True}, files={"file": ("notes.txt", b"diffusion models " * 100)})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    updates = [json.loads(line) for line in response.text.splitlines()]
+    assert updates[-1]["done"] and updates[-1]["chunks"] > 0
+
+
+def test_index_doc_rejects_files_without_text(client):
+    assert client.post("/index-doc", files={"file": ("empty.txt", b"")}).status_code == 400
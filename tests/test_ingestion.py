@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config import settings
+from app.core import ingestion
+from app.schemas.data_fetcher import Article, ArticleStoreStats
+from app.schemas.rag import IndexingStats
+
+
+def batch(start: int) -> list[Article]:
+    published = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [Article(title=str(i), summary="", pdf_url=f"http://arxiv.org/pdf/2401.{i:05d}v1", published=published) for i in range(start, start + 2)]
+
+
+def test_arxiv_ingestion_bounds_the_batches_in_flight(monkeypatch):
+    monkeypatch.setattr(settings, "ARXIV_INGESTION_BATCHES_IN_FLIGHT", 2)
+    running = 0
+    peak = 0
+
+    async def batches(*args, **kwargs):
+        for start in range(0, 12, 2):
+            yield batch(start)
+
+    async def store(articles):
+        await asyncio.sleep(0.01)
+        return ArticleStoreStats(inserted=len(articles))
+
+    async def index(articles, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        return IndexingStats(chunks=len(articles))
+
+    monkeypatch.setattr(ingestion, "iter_arxiv_article_batches", batches)
+    monkeypatch.setattr(ingestion, "store_articles_into_db", store)
+    monkeypatch.setattr(ingestion, "index_arxiv_articles", index)
+
+    result = asyncio.run(ingestion.ingest_arxiv_query("llm", 12, "SubmittedDate", vector_store=None))
+
+    assert len(result.fetched_articles) == 12
+    assert result.indexing_stats.chunks == 12
+    assert peak == 2
+
+
+def test_arxiv_ingestion_stops_fetching_after_a_stage_fails(monkeypatch):
+    fetched = 0
+
+    async def batches(*args, **kwargs):
+        nonlocal fetched
+        for start in range(0, 40, 2):
+            fetched += 1
+            await asyncio.sleep(0.01)
+            yield batch(start)
+
+    async def store(articles):
+        raise ConnectionError("database down")
+
+    async def index(articles, **kwargs):
+        await asyncio.sleep(0.001)
+        return IndexingStats(chunks=len(articles))
+
+    monkeypatch.setattr(ingestion, "iter_arxiv_article_batches", batches)
+    monkeypatch.setattr(ingestion, "store_articles_into_db", store)
+    monkeypatch.setattr(ingestion, "index_arxiv_articles", index)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(ingestion.ingest_arxiv_query("llm", 40, "SubmittedDate", vector_store=None))
+    assert fetched < 5
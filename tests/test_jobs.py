@@ -0,0 +1,47 @@
+import uuid
+from datetime import timedelta
+
+from app.config import settings
+from app.core.jobs import IngestionJobManager, _utcnow
+from app.schemas.data_fetcher import Article, FetchArxivArticleRequest
+from app.schemas.jobs import IngestionJob
+
+
+def finished_job(age_seconds: float, status: str = "succeeded") -> IngestionJob:
+    updated = _utcnow() - timedelta(seconds=age_seconds)
+    return IngestionJob(
+        id=uuid.uuid4(),
+        request=FetchArxivArticleRequest(query="llm"),
+        status=status,
+        created_at=updated,
+        updated_at=updated,
+        articles=[Article(title="t", summary="", pdf_url="http://arxiv.org/pdf/2401.00001v1", published=updated)],
+    )
+
+
+def test_prune_evicts_expired_finished_jobs_and_drops_old_articles(monkeypatch):
+    monkeypatch.setattr(settings, "INGESTION_JOB_TTL_SECONDS", 100)
+    monkeypatch.setattr(settings, "INGESTION_JOB_ARTICLES_TTL_SECONDS", 10)
+    manager = IngestionJobManager(resources=None, persist=False)
+    fresh, stale, expired = finished_job(1), finished_job(50), finished_job(500)
+    running = finished_job(500, status="running")
+    for job in (fresh, stale, expired, running):
+        manager.jobs[job.id] = job
+
+    manager._prune()
+
+    assert set(manager.jobs) == {fresh.id, stale.id, running.id}
+    assert fresh.articles and not stale.articles
+    assert running.articles
+
+
+def test_prune_keeps_the_most_recent_finished_jobs(monkeypatch):
+    monkeypatch.setattr(settings, "INGESTION_JOBS_MAX_FINISHED", 2)
+    manager = IngestionJobManager(resources=None, persist=False)
+    jobs = [finished_job(age) for age in (3, 1, 2)]
+    for job in jobs:
+        manager.jobs[job.id] = job
+
+    manager._prune()
+
+    assert set(manager.jobs) == {jobs[1].id, jobs[2].id}
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core import kg_graph as kg_graph_module
+from app.core.kg_graph import KGGraph
+
+# Two papers sharing the "BERT" method, the second also evaluated on "GLUE"
+ENTITIES = [
+    (1, "Paper A", "paper"),
+    (2, "Paper B", "paper"),
+    (3, "BERT", "method"),
+    (4, "GLUE", "dataset"),
+]
+EDGES = [
+    (1, 1, "uses", 3),
+    (2, 2, "uses", 3),
+    (3, 2, "evaluated_on", 4),
+]
+
+
+class FakeKGStore:
+    """Entities and edges of the database, read through a sync session."""
+
+    def __init__(self, entities, edges):
+        self.entities, self.edges = list(entities), list(edges)
+
+    def get_entities_since(self, db, after_id=0):
+        return [entity for entity in self.entities if entity[0] > after_id]
+
+    def get_edges_since(self, db, after_id=0):
+        return [edge for edge in self.edges if edge[0] > after_id]
+
+
+class FakeSession:
+    def __enter__(self):
+        # Give concurrent refreshes in other threads a chance to interleave
+        time.sleep(0.001)
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeKGStore(ENTITIES, EDGES)
+    monkeypatch.setattr(kg_graph_module, "kg_crud", store)
+    monkeypatch.setattr(kg_graph_module, "SessionLocal", FakeSession)
+    return store
+
+
+@pytest.fixture
+def graph(store):
+    graph = KGGraph()
+    asyncio.run(graph.refresh())
+    return graph
+
+
+def test_csr_queries(graph):
+    bert, glue = graph.find("bert")[0], graph.find("GLUE")[0]
+    assert graph.degree(bert) == 2
+    assert {paper for paper, _ in graph.related_papers(bert)} == {1, 2}
+    assert graph.cooccurring(bert) == [(glue, 1)]
+    # Paper B shares both entities, so it ranks first
+    assert [paper for paper, _ in graph.expand_to_papers([bert, glue])] == [2, 1]
+    assert graph.paper_facts([2], focus=[glue])[0] == (2, "evaluated_on", glue)
+    distance, edges = graph.neighborhood(1, hops=2)
+    assert distance == {1: 0, 3: 1, 2: 2}
+    assert (1, "uses", 3) in edges
+
+
+def test_match_entities_skips_stopwords_and_papers(graph):
+    assert graph.match_entities("Which models use BERT on glue?") == [3, 4]
+    assert graph.match_entities("paper a") == []
+
+
+def test_concurrent_refreshes_load_each_edge_once(store):
+    graph = KGGraph()
+
+    async def refresh_concurrently():
+        await asyncio.gather(*(graph.refresh_if_stale(0.0) for _ in range(5)), graph.refresh())
+        assert graph.n_edges == len(EDGES)
+        store.edges.append((4, 1, "evaluated_on", 4))
+        await asyncio.gather(graph.refresh(), graph.refresh(), graph.refresh_if_stale(0.0))
+
+    asyncio.run(refresh_concurrently())
+    assert graph.n_edges == len(EDGES) + 1
+    assert graph.find("BERT") == [3]
+    assert graph.related_papers(4) == [(1, 0.7071), (2, 0.7071)]
+
+
+def test_apply_ignores_rows_already_loaded(graph):
+    graph._apply(ENTITIES, EDGES)
+    assert graph.n_edges == len(EDGES)
+    assert graph.find("Paper A") == [1]
+
+
+def test_query_endpoints_resolve_entities(graph):
+    from fastapi import HTTPException
+
+    from app.api.routes import kg as kg_routes
+
+    neighborhood = asyncio.run(kg_routes.api_kg_neighborhood("bert", graph, hops=1, max_nodes=10))
+    assert neighborhood.center.name == "BERT"
+    assert sorted(node.name for node in neighborhood.nodes) == ["Paper A", "Paper B"]
+    cooccurring = asyncio.run(kg_routes.api_kg_cooccurrence("GLUE", graph, limit=5))
+    assert [(item.entity.name, item.shared_papers) for item in cooccurring] == [("BERT", 1)]
+    with pytest.raises(HTTPException):
+        asyncio.run(kg_routes.api_kg_related_papers("unknown", graph, limit=5))
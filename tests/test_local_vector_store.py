@@ -0,0 +1,55 @@
+from app.core.local_vector_store import LocalVectorStore
+
+
+def _add(store: LocalVectorStore, texts: list[str], source: str = "doc") -> list[str]:
+    return store.add_texts(texts, [{"source": source, "chunk_index": i} for i in range(len(texts))], ids=texts)
+
+
+def test_deleted_chunks_are_never_returned(local_store):
+    _add(local_store, ["alpha", "beta", "gamma"])
+    local_store.delete(["beta"])
+    assert len(local_store) == 2
+    query = local_store.embeddings.embed_query("beta")
+    assert "beta" not in [doc.id for doc, _ in local_store.similarity_search_with_score_by_vector(query, k=3)]
+    assert all("beta" not in [doc.id for doc, _ in hits] for hits in local_store.similarity_search_with_score_by_vectors([query, query], k=3))
+    assert local_store.get_ids_where({"source": "doc"}) == ["alpha", "gamma"]
+    assert [ids for ids, _, _ in local_store.iter_documents(page_size=2)] == [["alpha"], ["gamma"]]
+
+
+def test_deletions_survive_a_reload_and_ids_can_be_stored_again(local_store, embeddings):
+    _add(local_store, ["alpha", "beta"])
+    local_store.delete(["alpha"])
+    reloaded = LocalVectorStore(embeddings, path=str(local_store.path))
+    assert len(reloaded) == 1
+    assert reloaded.get_existing_ids(["alpha", "beta"]) == {"beta"}
+
+    _add(reloaded, ["alpha"], source="new")
+    assert len(reloaded) == 2
+    assert reloaded.similarity_search("alpha", k=1)[0].metadata["source"] == "new"
+
+
+def test_compact_drops_deleted_rows_on_disk(local_store, embeddings):
+    _add(local_store, ["alpha", "beta", "gamma", "delta"])
+    local_store.delete(["beta", "delta"])
+    assert local_store.compact() == 2
+    assert local_store.compact() == 0
+    assert (local_store._size, local_store.ids) == (2, ["alpha", "gamma"])
+    assert local_store.get_ids_where({"source": "doc"}) == ["alpha", "gamma"]
+    assert local_store.similarity_search("gamma", k=1)[0].id == "gamma"
+    # Only the files of the new generation are left
+    assert sorted(path.name for path in local_store.path.iterdir()) == ["documents.1.jsonl", "meta.json", "vectors.1.npy"]
+
+    reloaded = LocalVectorStore(embeddings, path=str(local_store.path))
+    assert reloaded.ids == ["alpha", "gamma"]
+    assert reloaded.similarity_search("alpha", k=1)[0].id == "alpha"
+    _add(reloaded, ["beta"])
+    assert LocalVectorStore(embeddings, path=str(local_store.path)).ids == ["alpha", "gamma", "beta"]
+
+
+def test_deletes_compact_past_the_tombstone_ratio(embeddings, tmp_path):
+    store = LocalVectorStore(embeddings, path=str(tmp_path / "index"), compact_ratio=0.5)
+    _add(store, ["alpha", "beta", "gamma", "delta"])
+    store.delete(["alpha"])
+    assert store._size == 4
+    store.delete(["beta"])
+    assert (store._size, len(store)) == (2, 2)
@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+from app.core.metadata_filters import build_where, combine_where, filter_metadata, normalize_key, to_timestamp
+from app.schemas.rag import RetrievalFilters
+
+
+def test_build_where_without_filters():
+    assert build_where(None) is None
+    assert build_where(RetrievalFilters()) is None
+
+
+def test_build_where_single_clause_is_not_wrapped():
+    assert build_where(RetrievalFilters(source="  Large   Language Models ")) == {"source_key": {"$eq": "large language models"}}
+
+
+def test_build_where_combines_clauses_on_typed_keys():
+    published_from = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    # Naive dates are UTC
+    published_to = datetime(2024, 6, 30)
+    where = build_where(RetrievalFilters(published_from=published_from, published_to=published_to, title="Attention Is All You Need"))
+    assert where == {"$and": [
+        {"published_ts": {"$gte": 1704067200}},
+        {"published_ts": {"$lte": to_timestamp(published_to.replace(tzinfo=timezone.utc))}},
+        {"title_key": {"$eq": "attention is all you need"}},
+    ]}
+
+
+def test_combine_where_drops_empty_clauses():
+    assert combine_where(None, {}) is None
+    assert combine_where({"a": 1}, None) == {"a": 1}
+
+
+def test_filter_metadata_derives_the_typed_keys():
+    typed = filter_metadata({"source": "LLM  Agents", "title": "A Title", "publication_date": "2024-01-01 00:00:00+00:00"})
+    assert typed == {"source_key": normalize_key("llm agents"), "title_key": "a title", "published_ts": 1704067200}
+    assert filter_metadata({"publication_date": "not a date"}) == {}
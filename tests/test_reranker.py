@@ -0,0 +1,46 @@
+from langchain_core.documents.base import Document
+
+from app.core.reranker import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """Scores a pair by how many question words the chunk contains."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def predict(self, pairs, batch_size=16, show_progress_bar=False):
+        self.calls += 1
+        return [float(sum(word in chunk for word in question.split())) - 1.0 for question, chunk in pairs]
+
+
+def _candidates(*texts: str) -> list[tuple[Document, float]]:
+    return [(Document(id=text, page_content=text), 0.1 * i) for i, text in enumerate(texts)]
+
+
+def test_rerank_orders_by_relevance_in_unit_interval():
+    reranker = CrossEncoderReranker(FakeCrossEncoder(), "fake", budget_ms=1000)
+    documents, reranked = reranker.rerank("graph neural nets", _candidates("cooking", "graph nets", "graph neural nets"), top_k=2)
+    assert reranked
+    assert [doc.id for doc, _ in documents] == ["graph neural nets", "graph nets"]
+    assert all(0.0 < score < 1.0 for _, score in documents)
+
+
+def test_rerank_scores_are_cached():
+    model = FakeCrossEncoder()
+    reranker = CrossEncoderReranker(model, "fake", budget_ms=1000)
+    candidates = _candidates("a", "b")
+    reranker.rerank("q", candidates, top_k=2)
+    reranker.rerank("q", candidates, top_k=2)
+    assert model.calls == 1
+    assert reranker.cache_hits == 2
+
+
+def test_reranking_recovers_after_one_slow_batch():
+    reranker = CrossEncoderReranker(FakeCrossEncoder(), "fake", budget_ms=100)
+    # As measured after a cold start: far over the budget for 10 pairs
+    reranker._ms_per_pair = 1000.0
+    outcomes = [reranker.rerank(f"question {i}", _candidates(*map(str, range(10))), top_k=3)[1] for i in range(40)]
+    assert not outcomes[0]
+    assert outcomes[-1]
+    assert reranker.fallbacks < 40
@@ -0,0 +1,69 @@
+import numpy as np
+from langchain_core.documents.base import Document
+
+from app.core.retrieval import reciprocal_rank_fusion
+from app.core.sparse_index import BM25Index, tokenize
+
+TEXTS = [
+    "GPT-4 is a large language model",
+    "BERT_base encodes text with a transformer",
+    "retrieval augmented generation with a language model",
+    "sparse retrieval with BM25",
+    "dense retrieval with a transformer encoder",
+]
+
+
+def build(batches: list[list[int]], path=None) -> BM25Index:
+    index = BM25Index(path=path)
+    for batch in batches:
+        index.add([f"doc{i}" for i in batch], [TEXTS[i] for i in batch], [{"source": f"s{i % 2}"} for i in batch])
+        index._compact()
+    return index
+
+
+def test_tokenize_keeps_model_names():
+    assert tokenize("GPT-4 beats BERT_base, T5.") == ["gpt-4", "beats", "bert_base", "t5"]
+
+
+def test_incremental_merge_matches_a_single_build():
+    once = build([[0, 1, 2, 3, 4]])
+    merged = build([[0], [1, 2], [3, 4]])
+    assert np.array_equal(once.indptr, merged.indptr)
+    assert np.array_equal(once.post_docs, merged.post_docs)
+    assert np.array_equal(once.post_tf, merged.post_tf)
+    for term_id in range(len(merged.vocabulary)):
+        rows = merged.post_docs[merged.indptr[term_id]:merged.indptr[term_id + 1]]
+        assert np.all(np.diff(rows) > 0)
+    assert merged.search("language model", 5) == once.search("language model", 5)
+
+
+def test_search_ranks_deletes_and_filters():
+    index = build([[0, 1, 2, 3, 4]])
+    rows = [row for row, _ in index.search("retrieval transformer", 5)]
+    assert rows[0] == 4
+    assert set(rows) == {1, 2, 3, 4}
+
+    index.delete(["doc4"])
+    assert 4 not in [row for row, _ in index.search("retrieval transformer", 5)]
+    assert [row for row, _ in index.search("retrieval", 5, where={"source": "s1"})] == [3]
+
+
+def test_save_if_dirty_round_trip(tmp_path):
+    index = build([[0, 1]], path=str(tmp_path / "bm25"))
+    assert index.save_if_dirty() is True
+    assert index.save_if_dirty() is False
+    index.add(["doc2"], [TEXTS[2]])
+    assert index.save_if_dirty() is True
+
+    loaded = BM25Index(path=str(tmp_path / "bm25"))
+    assert loaded.load()
+    assert len(loaded) == 3
+    assert loaded.search("language model", 3) == index.search("language model", 3)
+    assert loaded.save_if_dirty() is False
+
+
+def test_reciprocal_rank_fusion_sums_over_rankings():
+    a, b, c = (Document(id=name, page_content=name) for name in "abc")
+    fused = reciprocal_rank_fusion([[(a, 0.1), (b, 0.2)], [(b, 9.0), (c, 8.0)]], top_k=2, k=60)
+    assert [doc.id for doc, _ in fused] == ["b", "a"]
+    assert fused[0][1] == 1 / 62 + 1 / 61
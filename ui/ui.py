@@ -1,12 +1,14 @@
 import streamlit as st
 import requests
+import json
 import pandas as pd
 from datetime import datetime
 import time
 
 API_URL = "http://api:8000"
 FETCH_ARTICLES_URL = "/fetch-arxiv-articles"
-GET_DB_ARTICLES_URL = "/get-db-arxiv-articles"
+INGESTION_JOBS_URL = "/ingestion-jobs"
+GET_DB_ARTICLES_URL = "/get-db-arxiv-articles/stream"
 ANSWER_QUESTION_URL = "/answer-research-question"
 CHAT_URL = "/chat"  # Add your RAG chat endpoint
 
@@ -90,41 +92,74 @@ if 'db_articles' not in st.session_state:
 if 'search_results' not in st.session_state:
     st.session_state.search_results = None
 
-def fetch_articles(keyword, max_articles):
-    """Fetch articles from arXiv, store into pg and index into chroma"""
+def fetch_articles(keyword, max_articles, poll_interval=1.0, max_wait=600):
+    """Submit an ingestion job (fetch from arXiv, store into pg and index into chroma) and wait for it"""
     try:
         response = requests.post(
-            url=f"{API_URL}{FETCH_ARTICLES_URL}",
+            url=f"{API_URL}{INGESTION_JOBS_URL}",
             headers={"Content-Type": "application/json"},
             json={"query": keyword, "max_results": max_articles},
             timeout=30
         )
-        if response.status_code == 200:
-            return response.json()['fetched_articles']
-        else:
+        if response.status_code != 202:
             st.error(f"Failed to fetch articles: {response.status_code}")
             return []
+        job_id = response.json()['job_id']
+
+        progress_bar = st.progress(0.0, text="Queued...")
+        deadline = time.time() + max_wait
+        while time.time() < deadline:
+            job = requests.get(url=f"{API_URL}{INGESTION_JOBS_URL}/{job_id}", timeout=30).json()
+            progress = job['progress']
+            progress_bar.progress(
+                min(progress['indexed'] / max_articles, 1.0),
+                text=f"{job['status']}: fetched {progress['fetched']}, stored {progress['stored']}, indexed {progress['indexed']}"
+            )
+            if job['status'] == "succeeded":
+                progress_bar.empty()
+                return job['articles']
+            if job['status'] in ("failed", "cancelled"):
+                progress_bar.empty()
+                st.error(f"Fetching articles {job['status']}: {job.get('error') or ''}")
+                return []
+            time.sleep(poll_interval)
+
+        st.warning(f"Fetching is still running in the background (job {job_id})")
+        return []
     except Exception as e:
         st.error(f"Error fetching articles: {str(e)}")
         return []
 
 def get_db_articles():
-    """Get articles from database"""
+    """Get articles from database, read line by line from the NDJSON stream"""
     try:
-        response = requests.get(
+        with requests.get(
             url=f"{API_URL}{GET_DB_ARTICLES_URL}",
-            headers={"Content-Type": "application/json"},
+            stream=True,
             timeout=30
-        )
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Failed to get database articles: {response.status_code}")
-            return []
+        ) as response:
+            if response.status_code != 200:
+                st.error(f"Failed to get database articles: {response.status_code}")
+                return []
+            return [json.loads(line) for line in response.iter_lines() if line]
     except Exception as e:
         st.error(f"Error getting database articles: {str(e)}")
         return []
 
+def iter_sse_events(response):
+    """Yield (event, data) pairs from a Server-Sent Events response"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            field, _, value = line.partition(":")
+            if field == "event":
+                event = value.strip()
+            elif field == "data":
+                data_lines.append(value[1:] if value.startswith(" ") else value)
+        elif data_lines:
+            yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+
 def display_article_card(article, index):
     """Display a single article in card format"""
     with st.container():
@@ -262,20 +297,46 @@ def main():
             # Get AI response
             with st.chat_message("assistant"):
                 try:
+                    status = st.empty()
+                    stream_state = {"sources": [], "done": None, "error": None}
+
                     def stream_generator():
                         with requests.post(
                             url=f"{API_URL}{ANSWER_QUESTION_URL}",
-                            headers={"Content-Type": "application/json"},
+                            headers={"Content-Type": "application/json", "Accept": "text/event-stream"},
                             json={"question": user_input},
                             stream=True,
                             timeout=60
                         ) as r:
                             r.raise_for_status()
-                            for chunk in r.iter_content(chunk_size=None, decode_unicode=True):
-                                if chunk:
-                                    yield chunk
+                            for event, data in iter_sse_events(r):
+                                if event == "token":
+                                    status.empty()
+                                    yield data["text"]
+                                elif event == "status":
+                                    status.caption(data["message"])
+                                elif event == "sources":
+                                    stream_state["sources"] = data["sources"]
+                                elif event == "done":
+                                    stream_state["done"] = data
+                                elif event == "error":
+                                    stream_state["error"] = data["detail"]
 
                     full_response = st.write_stream(stream_generator())
+                    status.empty()
+                    if stream_state["error"]:
+                        st.error(f"Error: {stream_state['error']}")
+                    if stream_state["sources"]:
+                        with st.expander(f"📄 Sources ({len(stream_state['sources'])})"):
+                            for source in stream_state["sources"]:
+                                title = source.get("title") or "Untitled"
+                                st.markdown(f"- [{title}]({source['url']})" if source.get("url") else f"- {title}")
+                    if stream_state["done"]:
+                        metrics = stream_state["done"]["metrics"]
+                        st.caption(
+                            f"{'⚡ cached · ' if stream_state['done']['cached'] else ''}"
+                            f"first token {metrics['ttft_ms']} ms · {metrics['tokens_per_second']} tokens/s"
+                        )
                     st.session_state.chat_history.append({"role": "assistant", "content": full_response})
                 except Exception as e:
                     error_msg = f"Error: {str(e)}"